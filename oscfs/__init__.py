@@ -1,4 +1,9 @@
+import importlib.util
 import sys
+import time
+
+# the reference point for measuring the startup time
+start_time = time.monotonic()
 
 try:
     import fuse
@@ -15,8 +20,8 @@ except ImportError:
     print("Failed to import the python fuse module.", file=sys.stderr)
     sys.exit(1)
 
-try:
-    import osc  # noqa: F401
-except ImportError:
+# only check for the osc module here, importing it is expensive and
+# deferred until it is actually needed
+if importlib.util.find_spec("osc") is None:
     print("Failed to import the python osc module.", file=sys.stderr)
     sys.exit(1)
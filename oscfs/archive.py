@@ -0,0 +1,1098 @@
+import base64
+import bisect
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import json
+import lzma
+import os
+import re
+import struct
+import sys
+import zlib
+
+import fuse
+
+import oscfs.link
+import oscfs.misc
+import oscfs.obsfile
+import oscfs.types
+
+# amount of compressed data to receive at once
+_chunk_size = 256 * 1024
+# bump this when the format of persisted indexes changes
+_index_version = 2
+# the maximum distance of deflate back references
+_window_size = 32 * 1024
+
+
+def _readExact(response, amount):
+
+    ret = response.read(amount)
+
+    if len(ret) != amount:
+        raise Exception(f"short read: expected {amount} bytes, got {len(ret)}")
+
+    return ret
+
+
+class _ChunkReader:
+    """Minimal file-like object reading from an iterator of data
+    chunks, as required by tarfile's stream mode."""
+
+    def __init__(self, chunks):
+        self.m_chunks = chunks
+        self.m_pending = b""
+        # read position within m_pending
+        self.m_pos = 0
+
+    def read(self, amount):
+
+        parts = []
+
+        while amount > 0:
+            if self.m_pos >= len(self.m_pending):
+                self.m_pending = next(self.m_chunks, b"")
+                self.m_pos = 0
+                if not self.m_pending:
+                    break
+
+            part = self.m_pending[self.m_pos:self.m_pos + amount]
+            self.m_pos += len(part)
+            amount -= len(part)
+            parts.append(part)
+
+        return parts[0] if len(parts) == 1 else b"".join(parts)
+
+
+class _Cursor:
+    """A read position within the uncompressed data of an archive.
+    Consecutive reads continue decoding where the previous one stopped.
+
+    @chunks is a generator of uncompressed data starting at the
+    uncompressed offset @position."""
+
+    def __init__(self, chunks, position):
+
+        self.m_reader = _ChunkReader(chunks)
+        self.m_chunks = chunks
+        self.m_position = position
+
+    def tell(self):
+        return self.m_position
+
+    def read(self, amount):
+
+        ret = self.m_reader.read(amount)
+        self.m_position += len(ret)
+        return ret
+
+    def skip(self, amount):
+
+        while amount > 0:
+            skipped = len(self.read(min(amount, _chunk_size)))
+            if not skipped:
+                break
+            amount -= skipped
+
+    def close(self):
+        # closes any HTTP response held by the generator
+        self.m_chunks.close()
+
+
+class Decoder:
+    """Base type for random access to the uncompressed content of a
+    remote file. Seek points map uncompressed offsets to compressed
+    offsets where decoding can start. They are learned while scanning
+    the content and can be persisted.
+
+    @open_func needs to accept an optional byte_range keyword argument
+    and return a file-like HTTP response."""
+
+    def __init__(self, open_func, size):
+
+        self.m_open_func = open_func
+        self.m_size = size
+        # sorted list of [uncompressed offset, compressed offset, ...]
+        self.m_points = [[0, 0]]
+
+    def getPoints(self):
+        return self.m_points
+
+    def setPoints(self, points):
+        self.m_points = points
+
+    def _openRange(self, start, end=None):
+        """Returns a response providing the compressed content from
+        start to end."""
+
+        if start == 0 and end is None:
+            return self.m_open_func()
+
+        response = self.m_open_func(byte_range=(start, end))
+
+        if response.status != 206:
+            # the server ignored the range
+            while start > 0:
+                start -= len(_readExact(response, min(start, _chunk_size)))
+
+        return response
+
+    def _fetch(self, start, end):
+
+        response = self._openRange(start, end)
+
+        try:
+            return _readExact(response, end - start)
+        finally:
+            response.close()
+
+    def _findPoint(self, offset):
+        """Returns the index of the last seek point at or before the
+        given uncompressed offset."""
+
+        offsets = [point[0] for point in self.m_points]
+        return bisect.bisect_right(offsets, offset) - 1
+
+    def _addPoint(self, point):
+
+        nr = self._findPoint(point[0])
+
+        if self.m_points[nr][0] != point[0]:
+            self.m_points.insert(nr + 1, point)
+
+    def _decodeFrom(self, nr):
+        """Needs to return a generator of the uncompressed content
+        starting at the seek point of the given index."""
+        pass
+
+    def scan(self):
+        """Returns a generator for the complete uncompressed content."""
+        return self._decodeFrom(0)
+
+    def openCursor(self, offset, end=None):
+        """Returns a _Cursor positioned at the given uncompressed
+        offset. @end is a hint up to which offset data will be read."""
+
+        nr = self._findPoint(offset)
+        point = self.m_points[nr]
+        cursor = _Cursor(self._decodeFrom(nr), point[0])
+        cursor.skip(offset - point[0])
+
+        return cursor
+
+
+class PlainDecoder(Decoder):
+    """Uncompressed archives can be accessed at any offset directly."""
+
+    def _decodeFrom(self, nr):
+        return self._readFrom(self.m_points[nr][0])
+
+    def _readFrom(self, start, end=None):
+
+        response = self._openRange(start, end)
+
+        try:
+            while True:
+                chunk = response.read(_chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            response.close()
+
+    def openCursor(self, offset, end=None):
+        return _Cursor(self._readFrom(offset, end), offset)
+
+
+class StreamDecoder(Decoder):
+    """Base type for formats consisting of a sequence of independently
+    compressed frames, like concatenated gzip members or zstd frames.
+    The start of each frame becomes a seek point, subtypes may add seek
+    points within frames."""
+
+    def _newDecompressor(self):
+        """Needs to return a new decompressor object for a single
+        frame."""
+        pass
+
+    def _openPoint(self, point):
+        """Returns a response and a decompressor for decoding from the
+        given seek point."""
+        return self._openRange(point[1]), self._newDecompressor()
+
+    def _learnPoints(self, decompressor, u_off, c_off):
+        """Adds the seek points found by the given decompressor within
+        the frame starting at the given offsets."""
+        pass
+
+    def _decodeFrom(self, nr):
+
+        point = self.m_points[nr]
+        u_off, c_off = point[:2]
+        response, decompressor = self._openPoint(point)
+        # offsets of the start of the current frame
+        frame = (u_off, c_off)
+
+        try:
+            while True:
+                chunk = response.read(_chunk_size)
+                if not chunk:
+                    break
+
+                c_off += len(chunk)
+
+                while chunk:
+                    data = decompressor.decompress(chunk)
+                    u_off += len(data)
+                    self._learnPoints(decompressor, *frame)
+
+                    if data:
+                        yield data
+
+                    if not decompressor.eof:
+                        break
+
+                    chunk = decompressor.unused_data
+                    decompressor = self._newDecompressor()
+                    # the next frame starts here
+                    frame = (u_off, c_off - len(chunk))
+                    self._addPoint(list(frame))
+        finally:
+            response.close()
+
+
+class _ZStream(ctypes.Structure):
+    """The z_stream structure of the zlib library."""
+
+    _fields_ = [
+        ("next_in", ctypes.c_void_p),
+        ("avail_in", ctypes.c_uint),
+        ("total_in", ctypes.c_ulong),
+        ("next_out", ctypes.c_void_p),
+        ("avail_out", ctypes.c_uint),
+        ("total_out", ctypes.c_ulong),
+        ("msg", ctypes.c_char_p),
+        ("state", ctypes.c_void_p),
+        ("zalloc", ctypes.c_void_p),
+        ("zfree", ctypes.c_void_p),
+        ("opaque", ctypes.c_void_p),
+        ("data_type", ctypes.c_int),
+        ("adler", ctypes.c_ulong),
+        ("reserved", ctypes.c_ulong),
+    ]
+
+
+# zlib library constants not provided by the zlib module
+_Z_OK = 0
+_Z_STREAM_END = 1
+_Z_BLOCK = 5
+_Z_BUF_ERROR = -5
+
+# the zlib library, False if it can't be loaded
+_libz = None
+
+
+def _getLibz():
+    """Returns the zlib library loaded via ctypes or None if it isn't
+    available. Unlike the zlib module it can stop at deflate block
+    boundaries."""
+
+    global _libz
+
+    if _libz is not None:
+        return _libz or None
+
+    try:
+        libz = ctypes.CDLL(ctypes.util.find_library("z") or "libz.so.1")
+    except OSError as e:
+        print(f"Failed to load the zlib library, gzip archives can only be accessed at member starts: {e}", file=sys.stderr)
+        _libz = False
+        return None
+
+    stream_p = ctypes.POINTER(_ZStream)
+    libz.zlibVersion.restype = ctypes.c_char_p
+    libz.inflateInit2_.argtypes = [stream_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+    libz.inflate.argtypes = [stream_p, ctypes.c_int]
+    libz.inflateEnd.argtypes = [stream_p]
+    _libz = libz
+
+    return libz
+
+
+class _BlockInflater:
+    """Decompresses a single gzip member like a zlib.decompressobj()
+    does, but records the first deflate block boundary after every @span
+    bytes of output, like zlib's zran.c example does. Each boundary is a
+    list of [uncompressed offset, compressed offset, unused bits in the
+    preceding byte, window], the offsets are relative to the start of
+    the member. The window contains the last _window_size bytes of
+    output preceding the boundary."""
+
+    def __init__(self, libz, span):
+
+        self.m_libz = libz
+        self.m_span = span
+        self.m_stream = _ZStream()
+        self.m_out = ctypes.create_string_buffer(_chunk_size)
+        self.m_window = b""
+        self.m_last_point = 0
+        self.m_points = []
+        self.eof = False
+        self.unused_data = b""
+
+        res = libz.inflateInit2_(
+            ctypes.byref(self.m_stream), zlib.MAX_WBITS | 16,
+            libz.zlibVersion(), ctypes.sizeof(self.m_stream)
+        )
+
+        if res != _Z_OK:
+            raise Exception(f"failed to initialize zlib: {res}")
+
+    def __del__(self):
+        self.m_libz.inflateEnd(ctypes.byref(self.m_stream))
+
+    def takePoints(self):
+        """Returns the boundaries recorded since the last call."""
+
+        ret = self.m_points
+        self.m_points = []
+        return ret
+
+    def _addPoint(self):
+
+        stream = self.m_stream
+
+        if stream.total_out - self.m_last_point < self.m_span:
+            return
+
+        self.m_last_point = stream.total_out
+        self.m_points.append([
+            stream.total_out, stream.total_in,
+            stream.data_type & 0x07, self.m_window
+        ])
+
+    def decompress(self, data):
+
+        stream = self.m_stream
+        _in = ctypes.create_string_buffer(data, len(data))
+        stream.next_in = ctypes.addressof(_in)
+        stream.avail_in = len(data)
+        ret = []
+
+        while not self.eof:
+            stream.next_out = ctypes.addressof(self.m_out)
+            stream.avail_out = len(self.m_out)
+            res = self.m_libz.inflate(ctypes.byref(stream), _Z_BLOCK)
+
+            if res not in (_Z_OK, _Z_STREAM_END, _Z_BUF_ERROR):
+                raise zlib.error(f"error {res} while decompressing data: {stream.msg}")
+
+            output = ctypes.string_at(self.m_out, len(self.m_out) - stream.avail_out)
+
+            if output:
+                ret.append(output)
+                self.m_window = (self.m_window + output)[-_window_size:]
+
+            if res == _Z_STREAM_END:
+                self.eof = True
+                self.unused_data = data[len(data) - stream.avail_in:]
+            elif stream.data_type & 0xC0 == 0x80:
+                # at the end of a block that isn't the last one
+                self._addPoint()
+
+            if not stream.avail_in and stream.avail_out:
+                break
+
+        return b"".join(ret)
+
+
+def _packBits(fields):
+    """Packs the given (value, bit count) fields into an integer, least
+    significant bit first, as done in deflate streams. Returns the
+    integer and the total bit count."""
+
+    ret = 0
+    length = 0
+
+    for value, bits in fields:
+        ret |= value << length
+        length += bits
+
+    return ret, length
+
+
+# a non-final deflate block with fixed Huffman codes and without data:
+# the block header and the end of block code
+_empty_fixed_block = _packBits([(0b010, 3), (0, 7)])
+
+# a non-final deflate block with dynamic Huffman codes and without data.
+# Only the end of block code is defined. Unlike the fixed one it takes
+# up an odd number of bits.
+_empty_dynamic_block = _packBits(
+    [
+        # block header, 257 literal/length codes, 1 distance code, 19
+        # code length codes
+        (0b100, 3), (0, 5), (0, 5), (15, 4),
+    ] + [
+        # lengths of the code length codes in their storage order,
+        # resulting in the codes 18 -> 0, 0 -> 10 and 1 -> 11
+        ({18: 1, 0: 2, 1: 2}.get(symbol, 0), 3) for symbol in
+        (16, 17, 18, 0, 8, 7, 9, 6, 10, 5, 11, 4, 12, 3, 13, 2, 14, 1, 15)
+    ] + [
+        # Huffman codes are stored most significant bit first.
+        # 138 + 118 literals with length 0, the end of block code with
+        # length 1, no distance code and finally the end of block code.
+        (0b0, 1), (127, 7), (0b0, 1), (107, 7), (0b11, 2), (0b01, 2),
+        (0b0, 1),
+    ]
+)
+
+
+def _getPrimer(bits, byte):
+    """Returns the data to pass to a raw deflate decompressor before
+    the data following @byte, for continuing at a block boundary that
+    leaves @bits unused bits in @byte. This replaces inflatePrime(),
+    which the zlib module lacks: empty blocks are prepended that end
+    exactly at the start of the unused bits."""
+
+    skip = 8 - bits
+    fields = [_empty_dynamic_block] if skip % 2 else []
+    length = sum(field[1] for field in fields)
+
+    while length % 8 != skip:
+        fields.append(_empty_fixed_block)
+        length += _empty_fixed_block[1]
+
+    value, length = _packBits(fields)
+    value |= (byte >> skip) << length
+
+    return value.to_bytes((length + bits) // 8, "little")
+
+
+class _MemberTail:
+    """Decompresses the remainder of a gzip member starting at a deflate
+    block boundary and skips the gzip trailer following it."""
+
+    trailer_size = 8
+
+    def __init__(self, window):
+
+        self.m_decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=window)
+        self.m_trailer = self.trailer_size
+        self.eof = False
+        self.unused_data = b""
+
+    def decompress(self, data):
+
+        ret = b""
+
+        if not self.m_decompressor.eof:
+            ret = self.m_decompressor.decompress(data)
+            if not self.m_decompressor.eof:
+                return ret
+            data = self.m_decompressor.unused_data
+
+        skip = min(self.m_trailer, len(data))
+        self.m_trailer -= skip
+
+        if not self.m_trailer:
+            self.eof = True
+            self.unused_data = data[skip:]
+
+        return ret
+
+
+class GzipDecoder(StreamDecoder):
+    """Besides the start of each gzip member, the first deflate block
+    boundary after every checkpoint_interval bytes becomes a seek point.
+    Such points also contain the data preceding them that following
+    blocks may refer to. Finding block boundaries requires the zlib
+    library to be loadable via ctypes, otherwise only member starts are
+    used."""
+
+    checkpoint_interval = 4 * 1024 * 1024
+
+    def _newDecompressor(self):
+
+        libz = _getLibz()
+
+        if libz:
+            return _BlockInflater(libz, self.checkpoint_interval)
+
+        # expect a gzip header
+        return zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+    def _openPoint(self, point):
+
+        if len(point) == 2:
+            return super(GzipDecoder, self)._openPoint(point)
+
+        _, c_off, bits, window = point
+        decompressor = _MemberTail(zlib.decompress(base64.b64decode(window)))
+
+        if not bits:
+            return self._openRange(c_off), decompressor
+
+        # the block starts within the preceding byte
+        response = self._openRange(c_off - 1)
+
+        try:
+            decompressor.decompress(_getPrimer(bits, _readExact(response, 1)[0]))
+        except Exception:
+            response.close()
+            raise
+
+        return response, decompressor
+
+    def _learnPoints(self, decompressor, u_off, c_off):
+
+        if not isinstance(decompressor, _BlockInflater):
+            return
+
+        for u_rel, c_rel, bits, window in decompressor.takePoints():
+            window = base64.b64encode(zlib.compress(window)).decode()
+            self._addPoint([u_off + u_rel, c_off + c_rel, bits, window])
+
+
+class ZstdDecoder(StreamDecoder):
+    """Requires the optional zstandard module. Only frame starts serve
+    as seek points, archives compressed as a single frame need to be
+    decoded from the start."""
+
+    def __init__(self, open_func, size):
+
+        try:
+            import zstandard
+        except ImportError:
+            raise Exception("the zstandard python module is required for zstd archives")
+
+        super(ZstdDecoder, self).__init__(open_func, size)
+        self.m_zstd = zstandard.ZstdDecompressor()
+
+    def _newDecompressor(self):
+        return self.m_zstd.decompressobj()
+
+
+class XzDecoder(Decoder):
+    """Each block of an xz file can be decoded independently. The
+    location of the blocks is obtained from the index at the end of each
+    xz stream, without decoding anything. Archives compressed as a
+    single block need to be decoded from the start."""
+
+    # filter IDs of branch/call/jump filters
+    bcj_filters = {
+        0x04: lzma.FILTER_X86,
+        0x05: lzma.FILTER_POWERPC,
+        0x06: lzma.FILTER_IA64,
+        0x07: lzma.FILTER_ARM,
+        0x08: lzma.FILTER_ARMTHUMB,
+        0x09: lzma.FILTER_SPARC,
+    }
+
+    @staticmethod
+    def _readVarint(buf, pos):
+
+        ret = 0
+        shift = 0
+
+        while True:
+            byte = buf[pos]
+            pos += 1
+            ret |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return ret, pos
+            shift += 7
+
+    @staticmethod
+    def _pad4(size):
+        return (size + 3) & ~3
+
+    @staticmethod
+    def _getCheckSize(check):
+        if check == 0:
+            return 0
+        return 4 << ((check - 1) // 3)
+
+    def _loadBlocks(self):
+        """Determines the seek points from the indexes of all streams
+        found in the file. Each point consists of [uncompressed offset,
+        compressed offset, unpadded size, check size]."""
+
+        blocks = []
+        pos = self.m_size
+
+        while pos > 0:
+            footer = self._fetch(pos - 12, pos)
+
+            if footer[8:] == b"\0\0\0\0":
+                # stream padding between concatenated streams
+                pos -= 4
+                continue
+            elif footer[10:] != b"YZ":
+                raise Exception("no xz stream footer found")
+
+            backward_size = (struct.unpack("<I", footer[4:8])[0] + 1) * 4
+            check_size = self._getCheckSize(footer[9] & 0x0F)
+            index_start = pos - 12 - backward_size
+            index = self._fetch(index_start, pos - 12)
+
+            if index[0] != 0:
+                raise Exception("invalid xz index")
+
+            count, ipos = self._readVarint(index, 1)
+            records = []
+
+            for _ in range(count):
+                unpadded, ipos = self._readVarint(index, ipos)
+                uncompressed, ipos = self._readVarint(index, ipos)
+                records.append((unpadded, uncompressed))
+
+            stream_start = index_start - 12 - sum(
+                self._pad4(unpadded) for unpadded, _ in records
+            )
+            c_off = stream_start + 12
+            stream_blocks = []
+
+            for unpadded, uncompressed in records:
+                stream_blocks.append((c_off, unpadded, uncompressed, check_size))
+                c_off += self._pad4(unpadded)
+
+            blocks = stream_blocks + blocks
+            pos = stream_start
+
+        points = []
+        u_off = 0
+
+        for c_off, unpadded, uncompressed, check_size in blocks:
+            points.append([u_off, c_off, unpadded, check_size])
+            u_off += uncompressed
+
+        self.m_points = points
+
+    def _getFilters(self, header):
+        """Returns the lzma filter chain described in an xz block
+        header."""
+
+        flags = header[1]
+        pos = 2
+
+        if flags & 0x40:
+            # compressed size
+            _, pos = self._readVarint(header, pos)
+        if flags & 0x80:
+            # uncompressed size
+            _, pos = self._readVarint(header, pos)
+
+        ret = []
+
+        for _ in range((flags & 0x03) + 1):
+            filter_id, pos = self._readVarint(header, pos)
+            props_size, pos = self._readVarint(header, pos)
+            props = header[pos:pos + props_size]
+            pos += props_size
+
+            if filter_id == 0x21:
+                bits = props[0] & 0x3F
+                if bits == 40:
+                    dict_size = 0xFFFFFFFF
+                else:
+                    dict_size = (2 | (bits & 1)) << (bits // 2 + 11)
+                ret.append({"id": lzma.FILTER_LZMA2, "dict_size": dict_size})
+            elif filter_id == 0x03:
+                ret.append({"id": lzma.FILTER_DELTA, "dist": props[0] + 1})
+            elif filter_id in self.bcj_filters:
+                bcj = {"id": self.bcj_filters[filter_id]}
+                if props_size == 4:
+                    bcj["start_offset"] = struct.unpack("<I", props)[0]
+                ret.append(bcj)
+            else:
+                raise Exception(f"unsupported xz filter {filter_id:#x}")
+
+        return ret
+
+    def _decodeBlock(self, response, unpadded, check_size):
+        """Decodes the block the response is positioned at."""
+
+        header = _readExact(response, 1)
+        header_size = (header[0] + 1) * 4
+        header += _readExact(response, header_size - 1)
+        decompressor = lzma.LZMADecompressor(
+            lzma.FORMAT_RAW, filters=self._getFilters(header)
+        )
+        remaining = unpadded - header_size - check_size
+
+        while remaining > 0:
+            chunk = _readExact(response, min(_chunk_size, remaining))
+            remaining -= len(chunk)
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+
+        # the check isn't verified
+        _readExact(response, check_size)
+
+    def _decodeFrom(self, nr):
+
+        if len(self.m_points[0]) < 4:
+            self._loadBlocks()
+
+        points = self.m_points[nr:]
+
+        if not points:
+            return
+
+        pos = points[0][1]
+        response = self._openRange(pos)
+
+        try:
+            for _, c_off, unpadded, check_size in points:
+                # skip block padding as well as the index and headers
+                # of streams in between
+                while pos < c_off:
+                    pos += len(_readExact(response, min(c_off - pos, _chunk_size)))
+
+                yield from self._decodeBlock(response, unpadded, check_size)
+                pos += unpadded
+        finally:
+            response.close()
+
+
+# maps archive file name suffixes to Decoder types
+_decoders = (
+    (".tar", PlainDecoder),
+    (".tar.gz", GzipDecoder),
+    (".tgz", GzipDecoder),
+    (".tar.xz", XzDecoder),
+    (".txz", XzDecoder),
+    (".tar.zst", ZstdDecoder),
+    (".tar.zstd", ZstdDecoder),
+    (".tzst", ZstdDecoder),
+)
+
+
+def getDecoderType(name):
+    """Returns the Decoder type for the given archive file name or None
+    if it is no supported archive."""
+
+    for suffix, _type in _decoders:
+        if name.endswith(suffix):
+            return _type
+
+    return None
+
+
+def getIndexDir():
+    """Returns the default directory for persisted archive indexes."""
+
+    cache_home = os.environ.get("XDG_CACHE_HOME", "")
+    if not cache_home:
+        cache_home = os.path.expanduser("~/.cache")
+
+    return os.path.join(cache_home, "oscfs", "archives")
+
+
+# file names of persisted indexes
+_index_name_re = re.compile(r"[0-9a-f]{64}\.json")
+
+
+def pruneIndexDir(index_dir, max_size):
+    """Removes the least recently used indexes from @index_dir until the
+    total size of the remaining ones is at most @max_size bytes. Other
+    files are left alone."""
+
+    indexes = []
+
+    try:
+        with os.scandir(index_dir) as entries:
+            for entry in entries:
+                if _index_name_re.fullmatch(entry.name):
+                    stat = entry.stat()
+                    indexes.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError as e:
+        print(f"Failed to prune archive indexes in {index_dir}: {e}", file=sys.stderr)
+        return
+
+    total = sum(index[1] for index in indexes)
+
+    for _, size, path in sorted(indexes):
+        if total <= max_size:
+            break
+
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # removed concurrently by another mount
+            pass
+        except OSError as e:
+            print(f"Failed to remove archive index {path}: {e}", file=sys.stderr)
+            continue
+
+        total -= size
+
+
+class ArchiveIndex:
+    """The list of members of a tar archive along with the seek points
+    of its compressed content. Each member is a list of [name, type,
+    size, mtime, mode, data offset, link target], where type is one of
+    "f", "d", "l" (symlink) or "h" (hardlink)."""
+
+    def __init__(self, decoder):
+
+        self.m_decoder = decoder
+        self.m_members = []
+
+    def getMembers(self):
+        return self.m_members
+
+    def scan(self):
+        """Builds the index by decoding the complete archive once."""
+
+        # only needed here, don't slow down startup
+        import tarfile
+
+        reader = _ChunkReader(self.m_decoder.scan())
+        members = []
+
+        with tarfile.open(fileobj=reader, mode="r|") as tar:
+            for info in tar:
+                if info.isfile():
+                    _type = "f"
+                elif info.isdir():
+                    _type = "d"
+                elif info.issym():
+                    _type = "l"
+                elif info.islnk():
+                    _type = "h"
+                else:
+                    # devices and such
+                    continue
+
+                members.append([
+                    info.name, _type, info.size, info.mtime,
+                    info.mode & 0o777, info.offset_data, info.linkname
+                ])
+
+        self.m_members = members
+
+    def load(self, path):
+        """Loads a persisted index, returns whether this succeeded. The
+        modification time of the index is updated, which determines the
+        order in which indexes are pruned."""
+
+        try:
+            with open(path, 'r') as fd:
+                data = json.load(fd)
+        except (OSError, ValueError):
+            return False
+
+        if data.get("version") != _index_version:
+            return False
+
+        self.m_members = data["members"]
+        self.m_decoder.setPoints(data["points"])
+
+        try:
+            os.utime(path)
+        except OSError:
+            # it is only used for pruning
+            pass
+
+        return True
+
+    def store(self, path):
+
+        data = {
+            "version": _index_version,
+            "points": self.m_decoder.getPoints(),
+            "members": self.m_members
+        }
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w') as fd:
+                json.dump(data, fd)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Failed to store archive index {path}: {e}", file=sys.stderr)
+
+
+class ArchivesDir(oscfs.types.DirNode):
+    """This type provides a directory for each tar archive found in the
+    package, allowing to browse the archive members."""
+
+    def __init__(self, parent, package, name):
+
+        super(ArchivesDir, self).__init__(parent, name)
+        self.m_package = package
+
+    def update(self):
+        package = self.getPackage()
+        package.updateIfNeeded()
+
+        for name, node in package.getEntries().items():
+            if not isinstance(node, oscfs.obsfile.ObsFile):
+                continue
+            elif getDecoderType(name) is None:
+                continue
+
+            self.m_entries[name] = ArchiveDir(self, node)
+
+
+class ArchiveDir(oscfs.types.DirNode):
+    """Represents the members of a tar archive. Upon first access the
+    member index is built by decoding the archive once, it is persisted
+    so later mounts only need to access the required parts of the
+    archive."""
+
+    def __init__(self, parent, archive_file):
+
+        super(ArchiveDir, self).__init__(parent, archive_file.getName())
+        self._setAutoClearOnUpdate(False)
+        self.m_file = archive_file
+        self.m_decoder = None
+        self.getStat().setModTime(archive_file.getStat().st_mtime)
+
+    def _getIndexPath(self):
+
+        index_dir = self.getRoot().getArgs().archive_index_dir
+
+        if index_dir is None:
+            index_dir = getIndexDir()
+        elif not index_dir:
+            return None
+
+        md5 = self.m_file.getMd5()
+
+        if not md5:
+            # the content can't be identified
+            return None
+
+        # identical archives, e.g. in branched packages, share the index
+        key = "\0".join([getDecoderType(self.getName()).__name__, md5])
+
+        return os.path.join(index_dir, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+    def isCacheStale(self):
+        # the archive file node is replaced if its content changes
+        return not self.wasEverUpdated()
+
+    def update(self):
+        self.clearEntries()
+
+        _type = getDecoderType(self.getName())
+        self.m_decoder = _type(self.m_file.openContent, self.m_file.getStat().st_size)
+        index = ArchiveIndex(self.m_decoder)
+        path = self._getIndexPath()
+
+        if not path or not index.load(path):
+            index.scan()
+            if path:
+                index.store(path)
+                max_size = self.getRoot().getArgs().archive_index_size * 1024 * 1024
+                pruneIndexDir(os.path.dirname(path), max_size)
+
+        self._addMembers(index.getMembers())
+
+    def _addMembers(self, members):
+
+        # name -> member, for resolving hardlinks
+        by_name = {}
+
+        for member in members:
+            name, _type, size, mtime, mode, offset, target = member
+            parts = [part for part in name.split('/') if part not in ("", ".")]
+
+            if not parts or ".." in parts:
+                continue
+
+            parent = self._getDir(parts[:-1])
+            name = parts[-1]
+            by_name['/'.join(parts)] = member
+
+            if _type == "d":
+                node = self._getDir(parts)
+            elif _type == "l":
+                node = oscfs.link.Link(parent, name, target, root_relative=False)
+                parent.m_entries[name] = node
+            else:
+                if _type == "h":
+                    linked = by_name.get(target.strip('/'), None)
+                    if linked is None or linked[1] != "f":
+                        continue
+                    size, offset = linked[2], linked[5]
+                node = ArchiveMemberNode(parent, name, self, offset, size)
+                parent.m_entries[name] = node
+
+            stat = node.getStat()
+            stat.setModTime(mtime)
+
+    def _getDir(self, parts):
+
+        ret = self
+
+        for part in parts:
+            node = ret.m_entries.get(part)
+            if node is None or not node.isDirectory():
+                node = oscfs.types.PlainDirNode(ret, part)
+                ret.m_entries[part] = node
+            ret = node
+
+        return ret
+
+    def openCursor(self, offset, end):
+
+        self.updateIfNeeded()
+        return self.m_decoder.openCursor(offset, end)
+
+
+class ArchiveMemberNode(oscfs.types.Node):
+    """A regular file within a tar archive. Reads decode only the part of
+    the archive that starts at the closest seek point before the data.
+    Sequential reads on an open file continue decoding where its previous
+    read stopped."""
+
+    def __init__(self, parent, name, archive, offset, size):
+
+        super(ArchiveMemberNode, self).__init__(parent, name)
+        self.m_archive = archive
+        # offset of the member data in the uncompressed archive
+        self.m_offset = offset
+        self.getStat().setSize(size)
+
+    def read(self, length, offset, handle=None):
+
+        size = self.getStat().st_size
+        length = min(length, size - offset)
+
+        if length <= 0:
+            return b""
+
+        start = self.m_offset + offset
+        # the cursor is kept per open file, so that interleaved readers
+        # don't force each other to decode again from a seek point
+        cursor = handle.getCursor() if handle else None
+
+        try:
+            if not cursor or cursor.tell() != start:
+                cursor = self.m_archive.openCursor(start, self.m_offset + size)
+                if handle:
+                    handle.setCursor(cursor)
+
+            ret = cursor.read(length)
+        except Exception as e:
+            print("Failed to read {} from archive:\n{}".format(
+                self.getName(),
+                oscfs.misc.getExceptionTrace(e),
+            ), file=sys.stderr)
+            if handle:
+                handle.setCursor(None)
+            raise fuse.FuseOSError(errno.EIO)
+
+        if not handle:
+            cursor.close()
+
+        return ret
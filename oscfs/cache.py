@@ -0,0 +1,71 @@
+import collections
+import time
+
+
+class LruCache:
+    """A bounded mapping of keys to values that evicts the least recently
+    used entries once max_entries is exceeded. Entries optionally expire
+    after max_age seconds.
+
+    A max_entries or max_age of zero disables the respective limit."""
+
+    def __init__(self, max_entries, max_age=0):
+
+        self.m_max_entries = max_entries
+        self.m_max_age = max_age
+        # maps keys to (timestamp, value) tuples in LRU order, the most
+        # recently used entry comes last
+        self.m_entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.m_entries)
+
+    def __contains__(self, key):
+        return self.get(key, None) is not None
+
+    def _isExpired(self, timestamp):
+        if not self.m_max_age:
+            return False
+
+        return time.monotonic() - timestamp > self.m_max_age
+
+    def get(self, key, default=None):
+        """Returns the value stored for key or default if there is no
+        such entry or it expired."""
+
+        entry = self.m_entries.get(key, None)
+
+        if entry is None:
+            return default
+
+        timestamp, value = entry
+
+        if self._isExpired(timestamp):
+            del self.m_entries[key]
+            return default
+
+        self.m_entries.move_to_end(key)
+        return value
+
+    def keys(self):
+        """Returns a list of the keys of all entries that didn't expire
+        yet, without affecting the LRU order."""
+
+        return [
+            key for key, (timestamp, _) in self.m_entries.items()
+            if not self._isExpired(timestamp)
+        ]
+
+    def add(self, key, value=True):
+
+        self.m_entries[key] = (time.monotonic(), value)
+        self.m_entries.move_to_end(key)
+
+        if self.m_max_entries and len(self.m_entries) > self.m_max_entries:
+            self.m_entries.popitem(last=False)
+
+    def remove(self, key):
+        self.m_entries.pop(key, None)
+
+    def clear(self):
+        self.m_entries.clear()
@@ -1,23 +1,82 @@
 import argparse
+import ctypes
 import errno
 import os
+import signal
 import sys
+import threading
+import time
 
 # third party modules
 import fuse
 
-# explicitly parse this option since we need to import the wrapper before
-# oscfs.obs is imported
-if "--no-urlopen-wrapper" not in sys.argv:
-    # urllib2 replacement, needs to be imported before osc.core
-    import oscfs.urlopenwrapper
-
 # local modules
+import oscfs
+import oscfs.handle
 import oscfs.obs
+import oscfs.obsfile
+import oscfs.prefetch
 import oscfs.root
+import oscfs.singleflight
+import oscfs.stream
+import oscfs.trace
 from oscfs.package import BinaryFileNode
 
 
+class OscFuse(fuse.FUSE):
+    """Specialization of the fusepy FUSE glue class that accepts any
+    buffer object like memoryview as result of read operations. The data
+    is copied directly into the kernel supplied buffer, avoiding
+    intermediate copies of large file contents."""
+
+    def read(self, path, buf, size, offset, fip):
+
+        if self.raw_fi:
+            fh = fip.contents
+        else:
+            fh = fip.contents.fh
+
+        ret = self.operations(
+            'read', self._decode_optional_path(path), size, offset, fh
+        )
+
+        if not ret:
+            return 0
+
+        retsize = len(ret)
+        assert retsize <= size, \
+            'actual amount read %d greater than expected %d' % (retsize, size)
+
+        dest = (ctypes.c_ubyte * retsize).from_address(
+            ctypes.addressof(buf.contents)
+        )
+        memoryview(dest).cast('B')[:] = ret
+
+        return retsize
+
+    def readdir(self, path, buf, filler, offset, fip):
+        # the fusepy implementation doesn't pass on the offset and
+        # always needs the complete listing at once. Passing non-zero
+        # offsets to the filler instead allows to return the listing in
+        # parts of the size the kernel requests.
+
+        for name, attrs, next_offset in self.operations(
+            'readdir', self._decode_optional_path(path), fip.contents.fh,
+            offset
+        ):
+            if attrs:
+                st = fuse.c_stat()
+                fuse.set_st_attrs(st, attrs, use_ns=self.use_ns)
+            else:
+                st = None
+
+            if filler(buf, name.encode(self.encoding), st, next_offset) != 0:
+                # the buffer is full
+                break
+
+        return 0
+
+
 class OscFs(fuse.LoggingMixIn, fuse.Operations):
     """The main class implementing the fuse operations and python-fuse
     setup."""
@@ -25,13 +84,24 @@ class OscFs(fuse.LoggingMixIn, fuse.Operations):
     def __init__(self):
 
         self.m_default_url = "https://api.opensuse.org"
+        self.m_default_negative_cache_time = 30
+        self.m_default_search_cache_time = 300
         self.m_obs = oscfs.obs.Obs()
         # stores file handle -> node mappings
         # (file handles need to be integers)
-        self.m_handles = [None] * 1024
-        # unallocated file handles
-        self.m_free_handles = list(range(1024))
+        self.m_handles = oscfs.handle.HandleTable()
+        # records FUSE operations if --record-trace is used
+        self.m_trace = None
+        # warms up the paths passed via --warm
+        self.m_prefetcher = None
+        # set once the osc module has been configured and authentication
+        # has been checked
+        self.m_setup_done = threading.Event()
+        self.m_setup_failed = False
         self._setupParser()
+        # the end of the previous startup phase for --startup-timing
+        self.m_startup_last = oscfs.start_time
+        self.m_imports_done = time.monotonic()
 
     def _setupParser(self):
 
@@ -59,16 +129,64 @@ class OscFs(fuse.LoggingMixIn, fuse.Operations):
             "--ptf", action='store_true',
             help="If set then PTF projects will be included which is not the default"
         )
+        self.m_parser.add_argument(
+            "--include", action='append', metavar="PATTERN",
+            help="Only include projects matching the given shell style wildcard pattern. Can be given multiple times."
+        )
+        self.m_parser.add_argument(
+            "--exclude", action='append', metavar="PATTERN",
+            help="Exclude projects matching the given shell style wildcard pattern. Can be given multiple times."
+        )
         self.m_parser.add_argument(
             "--no-bin-cache", action='store_true',
             help="If set then binary files like RPMs and other build artifacts will not be cached. This prevents linearly increasing memory usage in case a lot of these files are accessed over time."
         )
+        self.m_parser.add_argument(
+            "--download-workers", type=int, default=4,
+            help="Number of parallel connections used for downloading large files in chunks. Set to 1 to disable chunked downloads. Default: %(default)s"
+        )
+        self.m_parser.add_argument(
+            "--chunk-size", type=int, default=oscfs.obsfile.StreamedFile.chunk_size // 1024 // 1024,
+            help="Size of the chunks in MiB used for downloading large files in parallel. Files smaller than two chunks are downloaded via a single connection. Default: %(default)s"
+        )
+        self.m_parser.add_argument(
+            "--parallel-requests", type=int, default=8,
+            help="Maximum number of concurrent requests for directories that combine many independent listings, like the binaries of all repositories of a package. Default: %(default)s"
+        )
+        self.m_parser.add_argument(
+            "--binary-index", action='store_true',
+            help="If set then the binaries of each package are listed via a project wide index per repository and architecture instead of individually. The index needs to be transferred completely once, which can be many megabytes for large projects, but is shared by all packages. Indexes that are already present due to the project's .oscfs/binaries directory are always used."
+        )
+        self.m_parser.add_argument(
+            "--index-maintainers", action='append', metavar="PROJECT",
+            help="Bulk load the maintainers and bugowners of the given project and all its packages into the /.oscfs-by-maintainer index upon first access. Can be specified multiple times."
+        )
+        self.m_parser.add_argument(
+            "--warm", action='append', metavar="PATH",
+            help="Load the listing and meta data of the given project, or the files, meta data and commit history of the given PROJECT/PACKAGE in the background after mounting. Can be specified multiple times."
+        )
+        self.m_parser.add_argument(
+            "--warm-workers", type=int, default=2,
+            help="Number of concurrent requests used for warming up the paths passed via --warm. Default: %(default)s"
+        )
+        self.m_parser.add_argument(
+            "--archive-index-dir", type=str, default=None, metavar="DIR",
+            help="Directory where the member indexes of source archives from .oscfs/archives are stored, to avoid decoding archives again in later mounts. Pass an empty string to disable. Default: $XDG_CACHE_HOME/oscfs/archives"
+        )
+        self.m_parser.add_argument(
+            "--archive-index-size", type=int, default=256, metavar="MIB",
+            help="Maximum total size in MiB of the member indexes in the --archive-index-dir. The least recently used indexes are removed when it is exceeded. Default: %(default)s"
+        )
         self.m_parser.add_argument(
             "--no-urlopen-wrapper", action='store_true',
             help="Disable use of a hack to replace urllib's urlopen function to improve performance."
         )
         self.m_parser.add_argument(
             "--use-logfile", nargs='?', const=f'/run/user/{os.getuid()}/oscfs.log.{os.getpid()}')
+        self.m_parser.add_argument(
+            "--record-trace", type=str, default=None, metavar="FILE",
+            help="Record all file system operations including timing information into FILE. The trace can be replayed via tests/replay.py."
+        )
         self.m_parser.add_argument(
             "mountpoint", type=str,
             help="Path where to mount the file system"
@@ -83,17 +201,75 @@ class OscFs(fuse.LoggingMixIn, fuse.Operations):
                 of the file system will be cached. Default: {CACHE_SECS}
                 seconds. Set to zero to disable caching."""
         )
+        self.m_parser.add_argument(
+            "--negative-cache-time", type=int,
+            default=None,
+            help=f"""Specifies the time in seconds lookups of nonexistent
+                paths will be cached, also in the kernel. Default:
+                {self.m_default_negative_cache_time} seconds, but at most
+                the --cache-time. Set to zero to disable."""
+        )
+        self.m_parser.add_argument(
+            "--negative-cache-size", type=int,
+            default=4096,
+            help="""Specifies the maximum number of nonexistent paths
+                that will be cached. Default: %(default)s"""
+        )
+        self.m_parser.add_argument(
+            "--search-cache-time", type=int,
+            default=None,
+            help=f"""Specifies the time in seconds the results of queries
+                in the /.oscfs-search directory will be cached. Default:
+                {self.m_default_search_cache_time} seconds, but at most
+                the --cache-time. Set to zero to disable."""
+        )
+        self.m_parser.add_argument(
+            "--search-cache-size", type=int,
+            default=64,
+            help="""Specifies the maximum number of search queries whose
+                results will be cached. Default: %(default)s"""
+        )
+
+        self.m_parser.add_argument(
+            "--evict-time", type=int,
+            default=None,
+            help="""Specifies the time in seconds after which cached
+                projects, packages and other directories that haven't
+                been accessed are dropped from memory. Default: the
+                --cache-time, after which their contents would be fetched
+                again anyway. Set to zero to disable."""
+        )
+
+        self.m_parser.add_argument(
+            "--diff-cache-size", type=int,
+            default=32,
+            help="""Specifies the maximum number of revision diffs from
+                .oscfs/diffs that will be cached. Default: %(default)s"""
+        )
+
+        self.m_parser.add_argument(
+            "--startup-timing", action='store_true',
+            help="Print the time spent in the individual startup phases to stderr"
+        )
+
+        self.m_parser.add_argument(
+            "--rpm-header-cache-size", type=int,
+            default=256,
+            help="""Specifies the maximum number of parsed RPM headers
+                from .oscfs/rpminfo that will be cached. Default: %(default)s"""
+        )
 
     def _checkAuth(self):
-        """Check for correct authentication at the remote server."""
-        # simply fetch the root entries, this will also benefit the
-        # initial access at least. On HTTP 401 this will throw an
+        """Check for correct authentication at the remote server. Returns
+        whether the remote server can be used."""
+        # this only requests the user's own small person record, which
+        # exists on any OBS instance. On HTTP 401 this will throw an
         # exception.
-        import urllib.request
+        import urllib.error
         try:
-            _ = self.m_obs.getProjectInfo("openSUSE:Factory")
-            return
-        except urllib.request.HTTPError as e:
+            self.m_obs.checkAuth()
+            return True
+        except urllib.error.HTTPError as e:
             if e.code == 401:
                 print(
                     "Authorization at the remote server failed. Please check your ~/.oscrc user/pass settings for API url {}.".format(
@@ -102,24 +278,77 @@ class OscFs(fuse.LoggingMixIn, fuse.Operations):
                     file=sys.stderr
                 )
             elif e.code == 404:
-                # authorization worked but the project is not there, also fine
-                return
+                # authorization worked but the person is not visible,
+                # also fine
+                return True
             else:
-                print("HTTP error occured trying to access the remote server:")
-                print(e)
+                print("HTTP error occured trying to access the remote server:", file=sys.stderr)
+                print(e, file=sys.stderr)
         except Exception as e:
-            if str(e).find("unknown_project") != -1:
-                # 404 on XML level
-                return
             print("Accessing the remote server failed:", e, file=sys.stderr)
-            raise
 
-        sys.exit(1)
+        return False
+
+    def _setupObs(self):
+        """Configures the osc module and checks authentication. Returns
+        whether the remote server can be used."""
+
+        if not self.m_args.no_urlopen_wrapper:
+            # urllib replacement, needs to be imported before osc.core
+            import oscfs.urlopenwrapper  # noqa: F401
+
+        self.m_obs.configure(self.m_args.apiurl)
+        self._markStartup("osc setup")
+        ret = self._checkAuth()
+        self._markStartup("authentication")
+
+        return ret
+
+    def _setupObsInBackground(self):
+
+        try:
+            ok = self._setupObs()
+        except Exception as e:
+            print("Setting up access to the remote server failed:", e, file=sys.stderr)
+            ok = False
+
+        self.m_setup_failed = not ok
+        self.m_setup_done.set()
+
+        if not ok:
+            # let libfuse unmount and leave the main loop
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    def _waitForSetup(self):
+
+        self.m_setup_done.wait()
+
+        if self.m_setup_failed:
+            raise fuse.FuseOSError(errno.EIO)
+
+    def _isSetupOk(self):
+
+        self.m_setup_done.wait()
+        return not self.m_setup_failed
+
+    def _markStartup(self, phase, now=None):
+        """Records the end of a startup phase for --startup-timing."""
+
+        if now is None:
+            now = time.monotonic()
+
+        if self.m_args.startup_timing:
+            print("startup: {} took {:.3f}s, {:.3f}s since start".format(
+                phase, now - self.m_startup_last, now - oscfs.start_time
+            ), file=sys.stderr)
+            sys.stderr.flush()
+
+        self.m_startup_last = now
 
     def _getNode(self, path, fh=None):
 
         if fh is not None:
-            return self._getFileHandle(fh)
+            return self._getFileHandle(fh).getNode()
         else:
             try:
                 return self.m_root.getNode(path)
@@ -139,33 +368,111 @@ class OscFs(fuse.LoggingMixIn, fuse.Operations):
         sys.stdout = lf
         sys.stderr = lf
 
+    def _getLimitedCacheTime(self, value, default):
+        """Returns the value of a secondary cache time option. If it
+        isn't set then the default is used, but at most the general
+        --cache-time."""
+
+        args = self.m_args
+
+        if value is not None:
+            return value
+        elif args.cache_time is not None:
+            # don't keep derived information longer than the entries
+            # it refers to are cached
+            return min(default, args.cache_time)
+
+        return default
+
+    def _setupCacheTimes(self):
+
+        args = self.m_args
+
+        args.negative_cache_time = self._getLimitedCacheTime(
+            args.negative_cache_time, self.m_default_negative_cache_time
+        )
+        args.search_cache_time = self._getLimitedCacheTime(
+            args.search_cache_time, self.m_default_search_cache_time
+        )
+
+        if args.evict_time is None:
+            if args.cache_time is not None:
+                args.evict_time = args.cache_time
+            else:
+                args.evict_time = oscfs.types.Node.max_cache_time.total_seconds()
+
     def run(self):
 
         self.m_args = self.m_parser.parse_args()
+        self._markStartup("imports", self.m_imports_done)
+        self._setupCacheTimes()
         self._setupLogfile()
-        self.m_obs.configure(self.m_args.apiurl)
         self.m_root = oscfs.root.Root(self.m_obs, self.m_args)
         if self.m_args.cache_time is not None:
             oscfs.types.Node.setMaxCacheTime(self.m_args.cache_time)
         if self.m_args.no_bin_cache:
             BinaryFileNode.cache_binaries = False
-
-        self._checkAuth()
-
-        fuse.FUSE(
+        oscfs.obsfile.StreamedFile.chunk_size = self.m_args.chunk_size * 1024 * 1024
+        oscfs.stream.setDownloadWorkers(self.m_args.download_workers)
+        self.m_obs.setParallelRequests(self.m_args.parallel_requests)
+        # one more for concurrent requests from the main thread
+        self.m_obs.setMaxConnections(self.m_args.download_workers + 1)
+        if self.m_args.record_trace:
+            self.m_trace = oscfs.trace.TraceRecorder(self.m_args.record_trace)
+        if self.m_args.warm:
+            # keep warmed up results for as long as the nodes would
+            # cache them
+            oscfs.singleflight.setStashLimits(
+                256, oscfs.types.Node.max_cache_time.total_seconds()
+            )
+            self.m_prefetcher = oscfs.prefetch.Prefetcher(
+                self.m_root, self.m_args.warm, self.m_args.warm_workers
+            )
+
+        if not self.m_args.f:
+            # after detaching from the terminal errors wouldn't be
+            # visible anymore, and the forked daemon process wouldn't
+            # inherit a thread performing the setup
+            if not self._setupObs():
+                sys.exit(1)
+            self.m_setup_done.set()
+
+        self._markStartup("preparation")
+
+        OscFuse(
             self,
             self.m_args.mountpoint,
             foreground=self.m_args.f,
+            # the node tree isn't thread safe. OBS calls are only issued
+            # concurrently by worker threads, see oscfs/singleflight.py.
             nothreads=True,
             # direct_io is necessary in our use case to avoid
             # caching in the kernel and support dynamically
             # determined file contents
             direct_io=True,
-            nonempty=True
+            nonempty=True,
+            # let the kernel also cache failed lookups
+            negative_timeout=self.m_args.negative_cache_time
         )
 
+        if self.m_setup_failed:
+            sys.exit(1)
+
     def init(self, path):
         """This is called upon file system initialization."""
+
+        self._markStartup("mount")
+
+        if not self.m_setup_done.is_set():
+            # importing and configuring osc takes a noticeable amount of
+            # time, do this in parallel. Operations wait for it to
+            # complete.
+            threading.Thread(target=self._setupObsInBackground, daemon=True).start()
+
+        if self.m_prefetcher:
+            # threads don't survive daemonizing, so start only now
+            self.m_prefetcher.start(self._isSetupOk)
+
         if self.m_args.f:
             # print a status message that allows e.g. the regtest
             # program to determine when the file system is
@@ -173,6 +480,44 @@ class OscFs(fuse.LoggingMixIn, fuse.Operations):
             print("file system initialized")
             sys.stdout.flush()
 
+    def destroy(self, path):
+        """This is called upon file system shutdown."""
+        if self.m_trace:
+            self.m_trace.close()
+
+    def __call__(self, op, *args):
+
+        if op not in ("init", "destroy"):
+            self._waitForSetup()
+
+        if not self.m_prefetcher:
+            return self._call(op, *args)
+        elif op == "readdir":
+            # the listing is produced while OscFuse consumes the
+            # generator, which needs to happen within the bracket
+            return self._consumeListing(*args)
+
+        self.m_prefetcher.beginOperation()
+        try:
+            return self._call(op, *args)
+        finally:
+            self.m_prefetcher.endOperation()
+
+    def _consumeListing(self, *args):
+
+        self.m_prefetcher.beginOperation()
+        try:
+            yield from self._call("readdir", *args)
+        finally:
+            self.m_prefetcher.endOperation()
+
+    def _call(self, op, *args):
+
+        if self.m_trace:
+            return self.m_trace.call(super().__call__, op, *args)
+
+        return super().__call__(op, *args)
+
     # global file system methods
 
     def getattr(self, path, fh=None):
@@ -183,13 +528,29 @@ class OscFs(fuse.LoggingMixIn, fuse.Operations):
 
         return ret.toDict()
 
-    def readdir(self, path, fh=None):
+    def readdir(self, path, fh=None, offset=0):
+        """Returns the directory entries starting at the given offset as
+        (name, attrs, next offset) tuples. The listing is taken once per
+        open directory handle and continued on later calls, so that it
+        stays consistent while it is transferred in multiple parts.
+        Attributes are only produced for entries that are actually
+        consumed."""
 
-        node = self._getNode(path, fh)
+        if fh is None:
+            listing = self._getNode(path).getListing()
+        else:
+            handle = self._getFileHandle(fh)
+            listing = handle.getSnapshot()
 
-        ret = node.getNames()
+            if listing is None or offset == 0:
+                # offset zero is also seen after rewinddir()
+                listing = handle.getNode().getListing()
+                handle.setSnapshot(listing)
 
-        return ret
+        for nr in range(offset, len(listing)):
+            name, node = listing[nr]
+            attrs = node.getStat().toDict() if node else None
+            yield name, attrs, nr + 1
 
     def readlink(self, path):
         node = self._getNode(path)
@@ -199,29 +560,15 @@ class OscFs(fuse.LoggingMixIn, fuse.Operations):
 
     def _allocFileHandle(self, node):
 
-        if not self.m_free_handles:
-            raise fuse.FuseOSError(errno.EMFILE)
-
-        fd = self.m_free_handles.pop(0)
-
-        if self.m_handles[fd] is not None:
-            raise Exception("Handle allocation inconsistency")
-
-        self.m_handles[fd] = node
-
-        node.incUsers()
-
-        return fd
+        return self.m_handles.alloc(node).getFh()
 
     def _freeFileHandle(self, fh):
 
-        self.m_handles[fh].decUsers()
-        self.m_handles[fh] = None
-        self.m_free_handles.append(fh)
+        self.m_handles.free(fh)
 
     def _getFileHandle(self, fh):
 
-        return self.m_handles[fh]
+        return self.m_handles.get(fh)
 
     def opendir(self, path):
 
@@ -263,12 +610,15 @@ class OscFs(fuse.LoggingMixIn, fuse.Operations):
 
     def read(self, path, length, offset, fh):
 
-        node = self._getNode(path, fh)
+        handle = self._getFileHandle(fh)
+        node = handle.getNode()
 
         if not node.getStat().isReadable():
             raise fuse.FuseOSError(errno.EBADF)
 
-        return node.read(length, offset)
+        handle.noteRead(offset, length)
+
+        return node.read(length, offset, handle)
 
     def write(self, path, data, offset, fh):
 
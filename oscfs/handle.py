@@ -0,0 +1,105 @@
+class FileHandle:
+    """Represents an open file or directory description. Besides the node
+    it refers to, a handle can carry state that is specific to the open
+    file, like a snapshot of the content or information about the access
+    pattern."""
+
+    def __init__(self, fh, node):
+
+        self.m_fh = fh
+        self.m_node = node
+        # content kept consistent for the lifetime of the handle
+        self.m_snapshot = None
+        # offset right after the last read on this handle
+        self.m_next_offset = 0
+        # whether all reads so far continued the previous one, starting
+        # at the beginning of the file
+        self.m_sequential = True
+        # read position within decoded content, e.g. of an archive
+        # member, continued by the next read on this handle
+        self.m_cursor = None
+
+    def getFh(self):
+        return self.m_fh
+
+    def getNode(self):
+        return self.m_node
+
+    def getSnapshot(self):
+        return self.m_snapshot
+
+    def setSnapshot(self, snapshot):
+        self.m_snapshot = snapshot
+
+    def getCursor(self):
+        return self.m_cursor
+
+    def setCursor(self, cursor):
+        """Replaces the cursor of this handle, closing the previous one.
+        Cursors need to provide a close() method."""
+
+        if self.m_cursor:
+            self.m_cursor.close()
+
+        self.m_cursor = cursor
+
+    def close(self):
+        self.setCursor(None)
+
+    def noteRead(self, offset, length):
+        """Records a read access of length bytes at offset for access
+        pattern detection."""
+
+        if offset != self.m_next_offset:
+            self.m_sequential = False
+
+        self.m_next_offset = offset + length
+
+    def isSequential(self):
+        """Returns whether the file has been read sequentially from the
+        start so far."""
+        return self.m_sequential
+
+
+class HandleTable:
+    """Manages the integer file handles passed to FUSE. The table grows
+    dynamically and allocating or freeing a handle is an O(1)
+    operation. Freed handle numbers are reused."""
+
+    def __init__(self):
+
+        # maps file handle numbers to FileHandle objects
+        self.m_handles = {}
+        # previously freed handle numbers, used as a stack
+        self.m_free = []
+        # next handle number that was never handed out yet
+        self.m_next = 0
+
+    def __len__(self):
+        return len(self.m_handles)
+
+    def alloc(self, node):
+        """Allocates a new handle for the given node and returns the
+        FileHandle object."""
+
+        if self.m_free:
+            fh = self.m_free.pop()
+        else:
+            fh = self.m_next
+            self.m_next += 1
+
+        handle = FileHandle(fh, node)
+        self.m_handles[fh] = handle
+        node.incUsers()
+
+        return handle
+
+    def free(self, fh):
+
+        handle = self.m_handles.pop(fh)
+        self.m_free.append(fh)
+        handle.close()
+        handle.getNode().decUsers()
+
+    def get(self, fh):
+        return self.m_handles[fh]
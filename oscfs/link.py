@@ -5,14 +5,20 @@ import oscfs.types
 
 class Link(oscfs.types.Node):
     """This type represents a symlink in an OBS package which can
-    return its target via readlink()."""
+    return its target via readlink().
 
-    def __init__(self, parent, name, target):
+    The target is a path relative to the root of the file system unless
+    @root_relative is unset, then it is returned unmodified."""
+
+    def __init__(self, parent, name, target, root_relative=True):
 
         super(Link, self).__init__(parent, name, oscfs.types.FileType.symlink)
-        depth = self.calcDepth()
-        up = "{}/".format(os.path.pardir) * depth
-        self.m_target = up + target
+        if root_relative:
+            depth = self.calcDepth()
+            up = "{}/".format(os.path.pardir) * depth
+            self.m_target = up + target
+        else:
+            self.m_target = target
 
         stat = self.getStat()
         stat.setSize(len(self.m_target))
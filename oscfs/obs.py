@@ -1,11 +1,10 @@
 # standard modules
 from xml.etree import cElementTree as et
 import datetime
-
-# third party modules
-import osc.core
+import sys
 
 from oscfs.retry_decorator import transparent_retry
+from oscfs.singleflight import single_flight
 
 
 class Obs:
@@ -13,15 +12,27 @@ class Obs:
     system."""
 
     def __init__(self):
-        self.makeurl_implements_quote = self.checkMakeurl()
+        # determined in configure(), to avoid importing osc early
+        self.makeurl_implements_quote = True
+        self.m_max_connections = 1
+        # threads for issuing independent requests in parallel
+        self.m_request_pool = None
+        self.m_parallel_requests = 1
+        # whether the project list can be filtered by the remote server,
+        # this is turned off if the search API fails
+        self.m_server_filter = True
 
     def getOscVersionTuple(self):
+        import osc.core
+
         ver_nums = osc.core.get_osc_version().split('.')
         ver_nums = [int(num) for num in ver_nums]
         if len(ver_nums) == 3:
             return ver_nums
 
     def checkMakeurl(self):
+        import osc.core
+
         ver_string = osc.core.get_osc_version()
         from packaging.version import Version
 
@@ -35,6 +46,8 @@ class Obs:
     def configure(self, apiurl):
 
         import osc.conf
+        import osc.oscerr
+        self.makeurl_implements_quote = self.checkMakeurl()
         self.m_apiurl = apiurl
         try:
             osc.conf.get_config(override_apiurl=apiurl)
@@ -44,22 +57,36 @@ class Obs:
             raise Exception(f"No valid configuration found in .oscrc: {e}. Please configure OSC first.")
 
     def getUser(self):
+        import osc.conf
         return osc.conf.config["user"]
 
+    def getApiUrl(self):
+        return self.m_apiurl
+
+    @transparent_retry()
+    def checkAuth(self):
+        """Performs a minimal request that requires authentication.
+        Raises an HTTPError if authentication fails."""
+
+        self._download(['person', self.getUser()])
+
+    @single_flight
     @transparent_retry()
     def getProjectList(self):
         """Returns a list of the top-level projects of the current OBS
         instance. It's a list of plain strings."""
 
+        import osc.core
+
         return osc.core.meta_get_project_list(self.m_apiurl)
 
+    @single_flight
     @transparent_retry(expect_xml=True)
     def getProjectMeta(self, project):
-        """Returns a string consisting of the XML that makes up the
-        specified project's metadata."""
+        """Returns the raw XML bytes that make up the specified
+        project's metadata."""
 
-        xml_lines = osc.core.show_project_meta(self.m_apiurl, project)
-        return ''.join([line.decode() for line in xml_lines])
+        return self._download(['source', project, '_meta'])
 
     def getProjectInfo(self, project):
         """Returns an object of type ProjectInfo for the given
@@ -68,18 +95,24 @@ class Obs:
         xml = self.getProjectMeta(project)
         return ProjectInfo(xml)
 
+    @single_flight
     @transparent_retry()
     def getPackageList(self, project):
         """Returns a list of all the packages within a top-level
         project. It's a list of plain strings."""
 
+        import osc.core
+
         # the deleted=0 parameter changes behaviour in some buggy OSC
         # versions, it makes sure we get a proper result even in e.g.
         # multibuild packages, and some projects, the details are sketchy.
         return osc.core.meta_get_packagelist(self.m_apiurl, project, deleted=0)
 
+    @single_flight
     @transparent_retry(expect_xml=True)
     def _getPackageFileTree(self, project, package, revision=None):
+        import osc.core
+
         return osc.core.show_files_meta(
             self.m_apiurl,
             project,
@@ -90,8 +123,10 @@ class Obs:
 
     def getPackageFileList(self, project, package, revision=None):
         """Returns a list of the files belonging to a package. The
-        list is comprised of tuples of the form (name, size,
-        modtime)."""
+        list is comprised of tuples of the form (type, name, size,
+        modtime, md5, link target)."""
+
+        import osc.core
 
         xml = self._getPackageFileTree(
             project,
@@ -136,11 +171,13 @@ class Obs:
             ft = FileType.symlink if is_link else FileType.regular
             size = int(attrs["size"])
             mtime = int(attrs["mtime"])
+            md5 = attrs.get("md5")
             link = link_target if is_link else None
-            ret.append((ft, name, size, mtime, link))
+            ret.append((ft, name, size, mtime, md5, link))
 
         return ret
 
+    @single_flight
     @transparent_retry()
     def getPackageRequestList(self, project, package, states=None):
         """Returns a list of osc.core.Request instances representing
@@ -150,6 +187,8 @@ class Obs:
         state labels the returned requests should be in. Otherwise all
         requests regardless of state will be returned."""
 
+        import osc.core
+
         return osc.core.get_request_list(
             self.m_apiurl,
             project,
@@ -158,7 +197,7 @@ class Obs:
             withfullhistory=True
         )
 
-    def getSourceFileContent(self, project, package, _file, revision=None):
+    def _getSourceFileQuery(self, revision):
 
         # 'cat' is surprisingly difficult ... approach taken by the
         # 'osc cat' command line logic.
@@ -171,19 +210,119 @@ class Obs:
         if revision:
             query["rev"] = revision
 
+        return query
+
+    def getSourceFileContent(self, project, package, _file, revision=None):
+
         return self._download(
             ['source', project, package, _file],
-            query
+            self._getSourceFileQuery(revision)
+        )
+
+    def openSourceFile(self, project, package, _file, revision=None, byte_range=None):
+        """Returns a file-like HTTP response object for streaming the
+        content of the given source file. The caller is responsible for
+        closing it.
+
+        @byte_range can be a tuple of (start, end) to request only part
+        of the file, an end of None denotes the end of the file. The
+        response status is 206 if the server honored the range."""
+
+        return self._open(
+            ['source', project, package, _file],
+            self._getSourceFileQuery(revision),
+            byte_range=byte_range
         )
 
     def getBinaryFileContent(self, project, package, repo, arch, _file):
         comps = ['build', project, repo, arch, package, _file]
         return self._download(comps)
 
+    def openBinaryFile(self, project, package, repo, arch, _file, byte_range=None):
+        """Like openSourceFile() but for build artifacts."""
+
+        comps = ['build', project, repo, arch, package, _file]
+        return self._open(comps, byte_range=byte_range)
+
+    def setMaxConnections(self, connections):
+        """Sets the number of connections to the remote server that are
+        kept open for reuse. This is relevant for parallel downloads."""
+        self.m_max_connections = max(connections, self.m_parallel_requests)
+
+    def setParallelRequests(self, requests):
+        """Sets the maximum number of requests mapParallel() issues at
+        the same time."""
+        self.m_parallel_requests = requests
+        self.m_max_connections = max(self.m_max_connections, requests)
+
+    def mapParallel(self, func, calls):
+        """Calls func for each tuple of arguments in @calls using a
+        bounded pool of threads. Returns the list of results in the
+        order of @calls. If any call fails then its exception is raised
+        once all calls finished."""
+
+        if self.m_parallel_requests <= 1 or len(calls) <= 1:
+            return [func(*args) for args in calls]
+
+        if not self.m_request_pool:
+            import concurrent.futures
+            self.m_request_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.m_parallel_requests,
+                thread_name_prefix="request"
+            )
+
+        self._growConnectionPool()
+        futures = [self.m_request_pool.submit(func, *args) for args in calls]
+        # wait for all of them, so no requests are left running
+        errors = [future.exception() for future in futures]
+
+        for error in errors:
+            if error:
+                raise error
+
+        return [future.result() for future in futures]
+
+    def _growConnectionPool(self):
+        # OSC keeps only a single idle connection per server for reuse,
+        # additional parallel connections would be closed after each
+        # request. There's no API for this, so we enlarge the urllib3
+        # pool queue OSC creates for our API URL.
+        try:
+            import osc.connection
+            pool = osc.connection.CONNECTION_POOLS.get(self.m_apiurl, None)
+        except (ImportError, AttributeError):
+            # older OSC versions don't use urllib3
+            return
+
+        if pool is None or pool.pool is None:
+            return
+
+        old = pool.pool
+        if old.maxsize >= self.m_max_connections:
+            return
+
+        import queue
+        new = queue.LifoQueue(self.m_max_connections)
+        for _ in range(self.m_max_connections - old.qsize()):
+            new.put(None)
+        while not old.empty():
+            new.put(old.get_nowait())
+        pool.pool = new
+
+    @single_flight
     @transparent_retry()
     def _download(self, urlcomps, query=dict()):
 
+        f = self._open(urlcomps, query)
+
+        return f.read()
+
+    @transparent_retry()
+    def _open(self, urlcomps, query=dict(), byte_range=None):
+
+        import urllib.error
         import urllib.parse
+        import osc.core
         # makeurl below, in versions older than OSC 1.6.1, doesn't urlencode
         # the actual url components, only the query parameters. This breaks
         # certain file names that e.g. contain '#'. So let's explicitly
@@ -197,23 +336,45 @@ class Obs:
             query=query
         )
 
-        f = osc.core.http_GET(url)
+        if not byte_range:
+            return osc.core.http_GET(url)
 
-        return f.read()
+        self._growConnectionPool()
+        start, end = byte_range
+        # an end of None requests everything from start on
+        last = "" if end is None else end - 1
+        headers = {"Range": f"bytes={start}-{last}"}
 
+        try:
+            return osc.core.http_GET(url, headers=headers)
+        except urllib.error.HTTPError as e:
+            # OSC considers only exactly 200 a success status. The
+            # HTTPError object still provides the file-like interface of
+            # the partial content response. It needs to be kept instead
+            # of the wrapped response, since it closes the response once
+            # it's garbage collected.
+            if e.code == 206:
+                return e.with_traceback(None)
+            raise
+
+    @single_flight
     @transparent_retry()
     def _getPackageRevisions(self, project, package, fmt):
         """Returns the list of revisions for the given project/package
         path in the given fmt. @fmt can be any of ('text, 'csv',
         'xml'). Each revision will come with date and commit text."""
 
-        return osc.core.get_commitlog(
+        import osc.core
+
+        # this is a generator in recent OSC versions, which can't be
+        # shared between coalesced callers
+        return list(osc.core.get_commitlog(
             self.m_apiurl,
             project,
             package,
             None,
             format=fmt
-        )
+        ))
 
     def getCommitLog(self, project, package):
         """Returns a string containing the commit log of the given
@@ -222,32 +383,41 @@ class Obs:
             self._getPackageRevisions(project, package, "text")
         )
 
+    @single_flight
+    @transparent_retry(expect_xml=True)
+    def _getPackageHistory(self, project, package):
+        """Returns the raw XML revision list of the given package."""
+
+        return self._download(['source', project, package, '_history'])
+
     def getCommitInfos(self, project, package):
         """Returns details about each revision in the commit log as
         a list of instances of CommitInfo objects."""
 
-        xml = self._getPackageRevisions(project, package, "xml")
-        xml = '\n'.join(xml)
+        # parse the revision list directly instead of going through the
+        # OSC commit log, which parses it and serializes it to XML again
+        xml = self._getPackageHistory(project, package)
 
         tree = et.fromstring(xml)
         ret = []
 
-        for entry in tree.iter("logentry"):
-            rev = entry.attrib["revision"]
+        for entry in tree.iter("revision"):
+            rev = entry.attrib["rev"]
             ci = CommitInfo(int(rev))
 
             for child in entry:
-                if child.tag == "author":
+                if child.tag == "user":
                     ci.setAuthor(child.text)
-                elif child.tag == "date":
-                    dt = datetime.datetime.strptime(
-                        child.text,
-                        "%Y-%m-%d %H:%M:%S"
-                    )
+                elif child.tag == "time":
+                    # OSC presents these times in UTC
+                    dt = datetime.datetime.fromtimestamp(
+                        int(child.text),
+                        datetime.timezone.utc
+                    ).replace(tzinfo=None)
                     ci.setDate(dt)
                 elif child.tag == "requestid":
                     ci.setReqId(child.text)
-                elif child.tag == "msg":
+                elif child.tag == "comment":
                     ci.setMessage(child.text)
 
             ret.append(ci)
@@ -257,18 +427,31 @@ class Obs:
             key=lambda r: r.getRevision()
         )
 
-    @transparent_retry(expect_xml=True)
-    def getPackageMeta(self, project, package):
-        """Returns a string consisting of the XML that makes up the
-        specified package's metadata."""
+    @single_flight
+    @transparent_retry()
+    def getSourceDiff(self, project, package, old_revision, new_revision):
+        """Returns the unified diff between two revisions of a package as
+        raw bytes. The diff is computed by the server, which summarizes
+        changes to archives instead of diffing their content."""
+
+        import osc.core
 
-        xml_lines = osc.core.show_package_meta(
+        return osc.core.server_diff(
             self.m_apiurl,
-            project,
-            package
+            project, package, old_revision,
+            project, package, new_revision,
+            unified=True,
+            expand=False,
+            full=False
         )
 
-        return ''.join([line.decode() for line in xml_lines])
+    @single_flight
+    @transparent_retry(expect_xml=True)
+    def getPackageMeta(self, project, package):
+        """Returns the raw XML bytes that make up the specified
+        package's metadata."""
+
+        return self._download(['source', project, package, '_meta'])
 
     def getPackageInfo(self, project, package):
         """Returns an object of type PackageInfo for the given
@@ -276,6 +459,7 @@ class Obs:
         xml = self.getPackageMeta(project, package)
         return PackageInfo(xml)
 
+    @single_flight
     @transparent_retry()
     def getBuildlog(self, project, package, repo, arch):
         """Returns the plaintext build log for the given build
@@ -283,6 +467,8 @@ class Obs:
         configured at all or currently in wait state. It can also be
         partial if building is currently in progress."""
 
+        import osc.core
+
         url = '/'.join([
             self.m_apiurl,
             "build",
@@ -293,13 +479,9 @@ class Obs:
         # NOTE: streamfile supports bufsize="line" to read line wise
         # and supports yield semantics. This breaks with our
         # urlopenwrapper hack, however, so we don't use it.
-        ret = b""
-
-        for line in osc.core.streamfile(url):
-            ret += line
-
-        return ret
+        return b"".join(osc.core.streamfile(url))
 
+    @single_flight
     @transparent_retry(expect_xml=True)
     def getBuildResultsMeta(self, project, package, repo=[], arch=[]):
         """Returns XML data describing the build status of the given
@@ -312,12 +494,17 @@ class Obs:
         if not isinstance(arch, list):
             arch = [arch]
 
+        import osc.core
+
+        # the repeated repository and arch parameters can't be passed to
+        # makeurl() as a dictionary with lists in older OSC versions, but
+        # show_results_meta() knows how to build them for each version
         xml_lines = osc.core.show_results_meta(
             self.m_apiurl, project, package,
             repository=repo, arch=arch
         )
 
-        return '\n'.join([line.decode() for line in xml_lines])
+        return b"".join(xml_lines)
 
     def getBuildResults(self, *args, **kwargs):
         """Like getBuildResultsMeta() but returns a list of
@@ -327,12 +514,15 @@ class Obs:
 
         return BuildResultList(xml)
 
+    @single_flight
     @transparent_retry()
     def getBinaryList(self, project, package, repo, arch):
         """Returns a list of tuples representing the binary
         artifacts of the given build configuration. Each tuple
         consists of (filename, mtime, size)."""
 
+        import osc.core
+
         # when passing Verbose we get File object with metadata back
         ret = osc.core.get_binarylist(
             self.m_apiurl, project, repo, arch, package,
@@ -342,6 +532,164 @@ class Obs:
         # NOTE: this can return None if the size is zero, this is fixing that
         return [(f.name, f.mtime, 0 if f.size is None else f.size) for f in ret]
 
+    @single_flight
+    @transparent_retry(expect_xml=True)
+    def _getBinaryIndexXml(self, project, repo, arch):
+
+        query = {
+            "view": "binarylist",
+            "repository": repo,
+            "arch": arch
+        }
+
+        return self._download(['build', project, '_result'], query)
+
+    def getBinaryIndex(self, project, repo, arch):
+        """Returns a BinaryIndex object covering the binaries of all
+        packages of the given project for the given build
+        configuration."""
+
+        xml = self._getBinaryIndexXml(project, repo, arch)
+        return BinaryIndex(xml)
+
+    @single_flight
+    @transparent_retry(expect_xml=True)
+    def _search(self, kind, xpath, ids_only=True):
+        """Returns the raw XML result of an OBS search for objects of
+        the given kind ("project" or "package") matching the given
+        XPath predicate. Unless @ids_only is set the result contains
+        the complete meta data of each object."""
+
+        urlcomps = ['search', kind, 'id'] if ids_only else ['search', kind]
+        return self._download(urlcomps, {"match": xpath})
+
+    def _parseSearchResult(self, xml, tag):
+
+        tree = et.fromstring(xml)
+
+        if tree.tag != "collection":
+            raise Exception(f"Search failed:\n{xml}")
+
+        return [el.attrib for el in tree.iter(tag)]
+
+    def searchProjects(self, xpath):
+        """Returns a list of the names of the projects matching the
+        given XPath predicate."""
+
+        xml = self._search("project", xpath)
+        return [attrs["name"] for attrs in self._parseSearchResult(xml, "project")]
+
+    def getFilteredProjectList(self, xpath):
+        """Returns the list of project names matching the given XPath
+        predicate, filtered by the remote server. If xpath is None or
+        the server doesn't support filtering then the complete list is
+        returned."""
+
+        if xpath and self.m_server_filter:
+            try:
+                return self.searchProjects(xpath)
+            except Exception as e:
+                print(
+                    "Filtering the project list on the server failed, falling back to the complete list:",
+                    e, file=sys.stderr
+                )
+                self.m_server_filter = False
+
+        return self.getProjectList()
+
+    def searchPackages(self, xpath):
+        """Returns a list of (project, package) tuples for the packages
+        matching the given XPath predicate."""
+
+        xml = self._search("package", xpath)
+        return [
+            (attrs["project"], attrs["name"])
+            for attrs in self._parseSearchResult(xml, "package")
+        ]
+
+    def getPackageInfos(self, project):
+        """Returns a list of PackageInfo objects for all packages of
+        the given project, obtained via a single request."""
+
+        from oscfs.search import xpathLiteral
+
+        xml = self._search("package", f"@project={xpathLiteral(project)}", ids_only=False)
+        tree = et.fromstring(xml)
+
+        if tree.tag != "collection":
+            raise Exception(f"Getting package metadata of {project} failed:\n{xml}")
+
+        ret = []
+
+        for el in tree.iter("package"):
+            info = PackageInfo()
+            info.parseTree(el)
+            ret.append(info)
+
+        return ret
+
+
+class BinaryIndex:
+    """Index of all binary artifacts of a project for a single
+    repository and architecture, built from one repository-wide
+    listing. It allows looking up the binaries of each package as well
+    as the package that produced a given binary."""
+
+    def __init__(self, xml=None):
+
+        if xml:
+            self.parse(xml)
+        else:
+            self.reset()
+
+    def reset(self):
+
+        # package -> list of (filename, mtime, size) tuples
+        self.m_binaries = {}
+        # filename -> package
+        self.m_packages = {}
+
+    def parse(self, xml):
+
+        self.reset()
+
+        # this is a
+        #    <resultlist><result ...><binarylist package="...">
+        #        <binary filename="..." size="..." mtime="..."/>
+        # structure
+        tree = et.fromstring(xml)
+
+        if tree.tag != "resultlist":
+            raise Exception(f"Getting binary index failed:\n{xml}")
+
+        for bl in tree.iter("binarylist"):
+            package = bl.attrib["package"]
+            binaries = self.m_binaries.setdefault(package, [])
+
+            for el in bl:
+                attrs = el.attrib
+                name = attrs["filename"]
+                binaries.append((
+                    name, int(attrs.get("mtime", 0)), int(attrs.get("size", 0))
+                ))
+                # files like _buildenv or _statistics exist for every
+                # package and can't be mapped back
+                if not name.startswith('_'):
+                    self.m_packages.setdefault(name, package)
+
+    def getBinaries(self, package):
+        """Returns the list of (filename, mtime, size) tuples for the
+        given package, which is empty if there are none."""
+        return self.m_binaries.get(package, [])
+
+    def getPackage(self, binary):
+        """Returns the name of the package that produced the given
+        binary filename or None if it is unknown."""
+        return self.m_packages.get(binary, None)
+
+    def getBinaryNames(self):
+        return self.m_packages.keys()
+
 
 class CommitInfo:
 
@@ -499,6 +847,9 @@ class PackageInfo(InfoBase):
         self.m_enabled_builds = []
         self.m_all_disabled = False
         self.m_release_name = ""
+        # the maintenance incident number derived from the package and
+        # release name, if any
+        self.m_incident_nr = None
 
     def getDisabledBuilds(self):
         return self.m_disabled_builds
@@ -530,7 +881,7 @@ class PackageInfo(InfoBase):
     def getReleaseName(self):
         return self.m_release_name
 
-    def getMaintenanceIncident(self, project_info):
+    def _calcIncidentNr(self):
         # I don't whether there's some more programmatic way to
         # determine where the package was built.
         #
@@ -550,11 +901,18 @@ class PackageInfo(InfoBase):
             return None
 
         try:
-            incident = int(incident)
+            return int(incident)
         except ValueError:
             # not an incident number after all?
             return None
 
+    def getMaintenanceIncident(self, project_info):
+
+        incident = self.m_incident_nr
+
+        if incident is None:
+            return None
+
         parts = project_info.getName().split(':')
         if parts[-1] != "Update":
             # we need to be in an update project of some kind
@@ -569,29 +927,19 @@ class PackageInfo(InfoBase):
         the current package building is enabled. @project_info is
         required to calculate this."""
 
-        ret = []
-
-        for repo in project_info.getRepos():
-
-            rt = repo.getReleaseTarget()
-            if rt and rt[2]:
-                # this is a manually triggered repository
-                # e.g. "images" in openSUSE:Factory
-                continue
-
-            archs = repo.getArchs()
-
-            for arch in archs:
-                ret.append((repo.getName(), arch))
-
-        return ret
+        return project_info.getActiveRepos()
 
     def parse(self, meta_xml):
         """Parses a package meta XML string and fills the object's
         values from it."""
 
+        self.parseTree(et.fromstring(meta_xml))
+
+    def parseTree(self, tree):
+        """Fills the object's values from an already parsed package
+        meta XML element."""
+
         self.reset()
-        tree = et.fromstring(meta_xml)
 
         name = tree.attrib["name"]
         self.setName(name)
@@ -604,6 +952,8 @@ class PackageInfo(InfoBase):
             elif el.tag == "releasename":
                 self.setReleaseName(el.text)
 
+        self.m_incident_nr = self._calcIncidentNr()
+
     def parseBuild(self, el):
         for child in el:
             if child.tag == "disable":
@@ -731,6 +1081,7 @@ class ProjectInfo(InfoBase):
         self.m_debuginfo = None
         self.m_locked = False
         self.m_all_disabled = False
+        self.m_active_repos = []
 
     def parse(self, meta_xml):
         """Parses a project meta XML string and fills the object's
@@ -776,6 +1127,15 @@ class ProjectInfo(InfoBase):
             elif self.getAllDisabled():
                 repo.setEnabled(False)
 
+            rt = repo.getReleaseTarget()
+            if rt and rt[2]:
+                # this is a manually triggered repository
+                # e.g. "images" in openSUSE:Factory
+                continue
+
+            for arch in repo.getArchs():
+                self.m_active_repos.append((repo.getName(), arch))
+
     def parseBuild(self, el):
         for child in el:
             if child.tag in ("disable", "enable"):
@@ -808,6 +1168,11 @@ class ProjectInfo(InfoBase):
     def getRepos(self):
         return self.m_repos
 
+    def getActiveRepos(self):
+        """Returns a list of all (repository, arch) tuples that are
+        not manually triggered."""
+        return self.m_active_repos
+
     def addRepo(self, repo):
         self.m_repos.append(repo)
 
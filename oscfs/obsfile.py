@@ -1,32 +1,110 @@
+import errno
+import sys
+
+import fuse
+
+import oscfs.misc
+import oscfs.stream
 import oscfs.types
 
 
-class ObsFile(oscfs.types.Node):
+class StreamedFile(oscfs.types.Node):
+    """Base type for regular files whose content is streamed from the
+    remote server. Reads are served as soon as the requested data
+    arrived. All open file handles share the same stream.
+
+    Derived classes need to implement openContent()."""
+
+    # files of at least two chunks of this size are downloaded in
+    # parallel chunks, if enabled
+    chunk_size = 8 * 1024 * 1024
+
+    def __init__(self, parent, name):
+
+        super(StreamedFile, self).__init__(parent, name)
+        self.m_stream = None
+
+    def openContent(self, byte_range=None):
+        """Needs to return a file-like HTTP response for the file
+        content, or the given (start, end) byte range of it."""
+        pass
+
+    def cacheContent(self):
+        """Returns whether the content should be kept after the last
+        open file handle is gone."""
+        return True
+
+    def update(self):
+
+        self._closeStream()
+
+        self.m_stream = oscfs.stream.openStream(
+            self.openContent,
+            self.getStat().st_size,
+            self.chunk_size
+        )
+
+    def _closeStream(self):
+
+        if self.m_stream:
+            self.m_stream.close()
+            self.m_stream = None
+
+    def read(self, length, offset, handle=None):
+
+        self.updateIfNeeded()
+
+        try:
+            return self.m_stream.read(length, offset)
+        except Exception as e:
+            print("Failed to receive {}:\n{}".format(
+                self.getName(),
+                oscfs.misc.getExceptionTrace(e),
+            ), file=sys.stderr)
+            # start over on the next read
+            self._closeStream()
+            self.setCacheStale()
+            raise fuse.FuseOSError(errno.EIO)
+
+    def noUsersLeft(self):
+
+        if not self.m_stream:
+            return
+
+        if not self.m_stream.isComplete() or not self.cacheContent():
+            # don't keep the connection busy for data nobody waits for,
+            # or memory for data that shouldn't be cached
+            self._closeStream()
+            self.setCacheStale()
+
+
+class ObsFile(StreamedFile):
     """This type represents a regular file in an OBS package which can
     return actual file content via read()."""
 
-    def __init__(self, parent, name, size, mtime, revision=None):
+    def __init__(self, parent, name, size, mtime, md5, revision=None):
 
         super(ObsFile, self).__init__(parent, name)
         self.m_revision = revision
+        self.m_md5 = md5
 
         stat = self.getStat()
         stat.setModTime(mtime)
         stat.setSize(size)
 
-    def update(self):
+    def getMd5(self):
+        """Returns the md5 sum of the file content as reported by OBS,
+        or None if it is unknown."""
+        return self.m_md5
+
+    def openContent(self, byte_range=None):
 
         obs = self.getRoot().getObs()
 
-        self.m_data = obs.getSourceFileContent(
+        return obs.openSourceFile(
             self.getProject().getName(),
             self.getPackage().getName(),
             self.getName(),
-            revision=self.m_revision
+            revision=self.m_revision,
+            byte_range=byte_range
         )
-
-    def read(self, length, offset):
-
-        self.updateIfNeeded()
-
-        return self.m_data[offset:offset + length]
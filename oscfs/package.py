@@ -1,8 +1,12 @@
+import re
+
+import oscfs.archive
 import oscfs.types
 import oscfs.obs
 import oscfs.obsfile
 import oscfs.link
 import oscfs.refreshtrigger
+import oscfs.rpm
 
 
 class Package(oscfs.types.DirNode):
@@ -60,13 +64,13 @@ class Package(oscfs.types.DirNode):
 
         types = oscfs.types.FileType
 
-        for ft, name, size, mtime, target in obs.getPackageFileList(
+        for ft, name, size, mtime, md5, target in obs.getPackageFileList(
             self.getProject().getName(), self.m_package,
             revision=self.m_revision
         ):
             if ft == types.regular:
                 node = oscfs.obsfile.ObsFile(
-                    self, name, size, mtime,
+                    self, name, size, mtime, md5,
                     revision=self.m_revision
                 )
             elif ft == types.symlink:
@@ -88,6 +92,10 @@ class Package(oscfs.types.DirNode):
         # to update anything
         return self.m_revision is None
 
+    def isFoldable(self):
+        # update() starts from scratch if we never were updated
+        return True
+
     def update(self):
         if self._existsNewRevision():
             self.clearEntries()
@@ -115,13 +123,17 @@ class PkgApiDir(oscfs.types.DirNode):
         self.m_num_revs_name = "num_revisions"
         self.m_commits_dir_name = "commits"
         self.m_rev_dir_name = "revisions"
+        self.m_diffs_dir_name = "diffs"
+        self.m_archives_dir_name = "archives"
         self.m_req_dir_name = "requests"
         self.m_refresh_trigger = "refresh"
         self.m_buildlogs_name = "buildlogs"
         self.m_buildresults_name = "buildresults"
         self.m_binaries_dir_name = "binaries"
+        self.m_rpminfo_dir_name = "rpminfo"
         self.m_commit_infos = None
         self.m_pkg_meta = None
+        self.m_pkg_info = None
 
     def getCachedCommitInfos(self):
         # centrally keep the commit infos for the package here to
@@ -144,8 +156,18 @@ class PkgApiDir(oscfs.types.DirNode):
         return self.m_pkg_meta
 
     def getPkgInfo(self):
+        # centrally keep the parsed meta data here to avoid parsing it
+        # again for each child node
 
-        return oscfs.obs.PackageInfo(self.getPkgMeta())
+        if self.m_pkg_info is None:
+            self.m_pkg_info = oscfs.obs.PackageInfo(self.getPkgMeta())
+            self.getRoot().getRoleIndex().setRoles(
+                self.getProject().getName(),
+                self.getPackage().getName(),
+                self.m_pkg_info
+            )
+
+        return self.m_pkg_info
 
     def getNumRevsNode(self):
 
@@ -154,12 +176,15 @@ class PkgApiDir(oscfs.types.DirNode):
     def update(self):
         self.m_commit_infos = None
         self.m_pkg_meta = None
+        self.m_pkg_info = None
 
         for name, _type in (
             (self.m_log_name, LogNode),
             (self.m_num_revs_name, NumRevisionsNode),
             (self.m_commits_dir_name, CommitsDir),
             (self.m_rev_dir_name, RevisionsDir),
+            (self.m_diffs_dir_name, DiffsDir),
+            (self.m_archives_dir_name, oscfs.archive.ArchivesDir),
             (self.m_req_dir_name, RequestsDir),
             (self.m_meta_name, MetaNode),
             (self.m_desc_name, DescriptionNode),
@@ -169,7 +194,8 @@ class PkgApiDir(oscfs.types.DirNode):
                 oscfs.refreshtrigger.RefreshTrigger),
             (self.m_buildlogs_name, BuildlogsDir),
             (self.m_buildresults_name, BuildresultsNode),
-            (self.m_binaries_dir_name, BinariesDir)
+            (self.m_binaries_dir_name, BinariesDir),
+            (self.m_rpminfo_dir_name, RpmInfosDir)
         ):
             try:
                 node = _type(self, self.m_parent, name)
@@ -177,14 +203,15 @@ class PkgApiDir(oscfs.types.DirNode):
             except Exception as e:
                 print("Failed to add", name, "entry:", e)
 
-        devel_proj = self.getPkgInfo().getDevelProject()
+        pkg_info = self.getPkgInfo()
+        devel_proj = pkg_info.getDevelProject()
         if devel_proj:
             devel_link = "develproject"
             target = f"{devel_proj}/{self.getPackage().getName()}"
             self.m_entries[devel_link] = oscfs.link.Link(self, devel_link, target)
 
         prj_info = self.getProject().getApiDir().getPrjInfo()
-        incident = self.getPkgInfo().getMaintenanceIncident(prj_info)
+        incident = pkg_info.getMaintenanceIncident(prj_info)
 
         if incident:
             # add a symlink to the maintenance indicent where this
@@ -234,6 +261,78 @@ class RevisionsDir(oscfs.types.DirNode):
             )
 
 
+class DiffsDir(oscfs.types.DirNode):
+    """This type provides diffs between revisions of a package, computed
+    by the server. Files named "<a>..<b>" contain the diff from revision
+    a to revision b. The diffs between consecutive revisions are listed,
+    any other combination can be looked up directly."""
+
+    name_re = re.compile(r"^([0-9]+)\.\.([0-9]+)$")
+
+    def __init__(self, parent, package, name):
+
+        super(DiffsDir, self).__init__(parent, name)
+        self.m_package = package
+
+    def update(self):
+        num_revs = len(self.m_parent.getCachedCommitInfos())
+
+        for rev in range(2, num_revs + 1):
+            name = f"{rev - 1}..{rev}"
+            self.m_entries[name] = DiffNode(self, rev - 1, rev)
+
+    def getEntry(self, name):
+
+        try:
+            return self.m_entries[name]
+        except KeyError:
+            pass
+
+        match = self.name_re.match(name)
+
+        if not match:
+            raise KeyError(name)
+
+        old, new = [int(rev) for rev in match.groups()]
+
+        if old == new or not old or not new:
+            raise KeyError(name)
+
+        return DiffNode(self, old, new)
+
+
+class DiffNode(oscfs.types.FileNode):
+    """This node contains the diff between two revisions of a package.
+    Since revisions are immutable the diff is kept in a cache shared by
+    all packages, which survives refreshes of the package."""
+
+    def __init__(self, parent, old, new):
+
+        super(DiffNode, self).__init__(parent, f"{old}..{new}")
+        self.m_old = old
+        self.m_new = new
+        # the shared cache bounds the memory used for diffs
+        self.setUseCache(False)
+        self.setUseSnapshot(True)
+
+    def fetchContent(self):
+        project = self.getProject().getName()
+        package = self.getPackage().getName()
+        key = (project, package, self.m_old, self.m_new)
+        cache = self.getRoot().getDiffCache()
+
+        diff = cache.get(key)
+
+        if diff is None:
+            obs = self.getRoot().getObs()
+            diff = obs.getSourceDiff(
+                project, package, str(self.m_old), str(self.m_new)
+            )
+            cache.add(key, diff)
+
+        self.setContent(diff)
+
+
 class LogNode(oscfs.types.FileNode):
     """This node type contains the commit log for the package it resides
     in."""
@@ -437,6 +536,7 @@ class BuildresultsNode(oscfs.types.FileNode):
         self.m_package = package
         # always fetch fresh build results without caching
         self.setUseCache(False)
+        self.setUseSnapshot(True)
 
     def fetchContent(self):
         obs = self.getRoot().getObs()
@@ -461,6 +561,7 @@ class BuildlogNode(oscfs.types.FileNode):
         self.m_repo = repo
         self.m_arch = arch
         self.m_last_checksum = ""
+        # no snapshot, so that e.g. `tail -f` sees the log growing
         self.setUseCache(False)
 
     def fetchContent(self):
@@ -520,7 +621,7 @@ class BuildlogsDir(oscfs.types.DirNode):
             )
 
 
-class BinaryFileNode(oscfs.types.FileNode):
+class BinaryFileNode(oscfs.obsfile.StreamedFile):
     """This type returns a certain binary artifact's data upon read."""
 
     cache_binaries = True
@@ -541,21 +642,27 @@ class BinaryFileNode(oscfs.types.FileNode):
         stat.setModTime(self.m_binary[1])
         stat.setSize(self.m_binary[2])
 
-    def fetchContent(self):
+    def openContent(self, byte_range=None):
         obs = self.getRoot().getObs()
 
-        args = (self.m_project, self.m_package, self.m_repo,
-                self.m_arch, self.getName())
+        return obs.openBinaryFile(
+            self.m_project, self.m_package, self.m_repo,
+            self.m_arch, self.getName(),
+            byte_range=byte_range
+        )
 
-        # NOTE: this could become difficult to cache big binary files
-        # this way, need to handle it in chunks probably without
-        # caching.
-        content = obs.getBinaryFileContent(*args)
-        self.setContent(content)
+    def cacheContent(self):
+        return self.cache_binaries
+
+    def getCacheKey(self):
+        """Returns a key identifying this artifact's current content."""
+
+        stat = self.getStat()
 
-    def noUsersLeft(self):
-        if not self.cache_binaries:
-            self.dropCache()
+        return (
+            self.m_project, self.m_package, self.m_repo, self.m_arch,
+            self.getName(), stat.st_size, stat.st_mtime
+        )
 
 
 class BinariesDir(oscfs.types.DirNode):
@@ -574,13 +681,32 @@ class BinariesDir(oscfs.types.DirNode):
 
         active = pkg_info.getAllActiveRepos(prj_info)
 
-        for repo, arch in active:
-            binaries = obs.getBinaryList(
-                prj_info.getName(),
-                self.m_package.getName(),
-                repo,
-                arch
-            )
+        # the project wide indexes are shared between all packages, but
+        # for large projects they are expensive to build just for a
+        # single package
+        indexes = self.getProject().getApiDir().getBinaryIndexes(
+            active,
+            cached_only=not self.getRoot().getArgs().binary_index
+        ) or {}
+        missing = [repo_arch for repo_arch in active if repo_arch not in indexes]
+
+        # there can be dozens of repository/arch combinations, fetch
+        # their listings concurrently
+        fetched = dict(zip(missing, obs.mapParallel(
+            obs.getBinaryList,
+            [
+                (prj_info.getName(), self.m_package.getName(), repo, arch)
+                for repo, arch in missing
+            ]
+        )))
+
+        listings = [
+            indexes[repo_arch].getBinaries(self.m_package.getName())
+            if repo_arch in indexes else fetched[repo_arch]
+            for repo_arch in active
+        ]
+
+        for (repo, arch), binaries in zip(active, listings):
 
             if not binaries:
                 continue
@@ -597,12 +723,35 @@ class BinariesDir(oscfs.types.DirNode):
 
             for binary in binaries:
 
-                name = binary[0]
-                archdir.m_entries[name] = BinaryFileNode(
-                    repodir,
-                    prj_info.getName(),
-                    pkg_info.getName(),
-                    repo,
-                    arch,
-                    binary
+                node = self._createNode(
+                    archdir,
+                    BinaryFileNode(
+                        repodir,
+                        prj_info.getName(),
+                        pkg_info.getName(),
+                        repo,
+                        arch,
+                        binary
+                    )
                 )
+
+                if node is not None:
+                    archdir.m_entries[node.getName()] = node
+
+    def _createNode(self, archdir, binary_file):
+        """Returns the node to add to archdir for the given binary, or
+        None to skip it."""
+        return binary_file
+
+
+class RpmInfosDir(BinariesDir):
+    """Provides the same repository/arch hierarchy as BinariesDir, but
+    for each RPM artifact a directory with pseudo files containing its
+    header metadata."""
+
+    def _createNode(self, archdir, binary_file):
+
+        if not binary_file.getName().endswith(".rpm"):
+            return None
+
+        return oscfs.rpm.RpmInfoDir(archdir, binary_file)
@@ -0,0 +1,120 @@
+import sys
+import threading
+import time
+
+import oscfs.singleflight
+
+
+class Prefetcher:
+    """Warms up the projects and packages passed via --warm in the
+    background, so that the first interactive access to them doesn't
+    have to wait for the remote server.
+
+    The node tree is not thread safe, therefore the workers don't touch
+    it, they only use the root node for reading the configuration. They
+    perform the same OBS calls the nodes will perform later on
+    within oscfs.singleflight.stashing(), which keeps the results until
+    the nodes ask for them. Requests are only issued while no file system
+    operation was seen for quiet_time seconds, to not compete with
+    interactive use."""
+
+    def __init__(self, root, paths, workers, quiet_time=0.5):
+
+        self.m_root = root
+        self.m_paths = paths
+        self.m_workers = workers
+        self.m_quiet_time = quiet_time
+        # number of file system operations currently running
+        self.m_active = 0
+        self.m_last_activity = 0
+
+    def beginOperation(self):
+        self.m_active += 1
+
+    def endOperation(self):
+        self.m_active -= 1
+        self.m_last_activity = time.monotonic()
+
+    def start(self, ready):
+        """Starts warming up in a background thread. @ready is a callable
+        that blocks until the remote server is set up and returns whether
+        it can be used."""
+
+        threading.Thread(
+            target=self._run, args=(ready,),
+            name="prefetch", daemon=True
+        ).start()
+
+    def _waitForQuiet(self):
+
+        while True:
+            if self.m_active:
+                delay = self.m_quiet_time
+            else:
+                delay = self.m_last_activity + self.m_quiet_time - time.monotonic()
+
+            if delay <= 0:
+                return
+
+            time.sleep(delay)
+
+    def _call(self, func, *args, **kwargs):
+
+        self._waitForQuiet()
+
+        with oscfs.singleflight.stashing():
+            return func(*args, **kwargs)
+
+    def _run(self, ready):
+        import concurrent.futures
+
+        if not ready():
+            return
+
+        try:
+            # every path lookup starts with the list of projects
+            obs = self.m_root.getObs()
+            self._call(
+                obs.getFilteredProjectList,
+                self.m_root.getProjectFilterXpath()
+            )
+        except Exception as e:
+            print("Warming up the project list failed:", e, file=sys.stderr)
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.m_workers,
+            thread_name_prefix="prefetch"
+        ) as pool:
+            for path in self.m_paths:
+                pool.submit(self._warmPath, path)
+
+    def _warmPath(self, path):
+
+        parts = path.strip('/').split('/')
+
+        try:
+            if len(parts) == 1:
+                self._warmProject(*parts)
+            elif len(parts) == 2:
+                self._warmPackage(*parts)
+            else:
+                print("Ignoring invalid --warm path", path, file=sys.stderr)
+        except Exception as e:
+            print("Warming up", path, "failed:", e, file=sys.stderr)
+
+    def _warmProject(self, project):
+        # these need to be called with exactly the same arguments as in
+        # the nodes, otherwise the stashed results won't be found
+        obs = self.m_root.getObs()
+
+        self._call(obs.getPackageList, project)
+        self._call(obs.getProjectMeta, project)
+
+    def _warmPackage(self, project, package):
+        obs = self.m_root.getObs()
+
+        self._warmProject(project)
+        self._call(obs.getPackageFileList, project, package, revision=None)
+        self._call(obs.getPackageMeta, project, package)
+        self._call(obs.getCommitInfos, project, package)
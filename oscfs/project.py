@@ -1,3 +1,7 @@
+import sys
+
+import oscfs.cache
+import oscfs.link
 import oscfs.types
 import oscfs.obs
 import oscfs.package
@@ -57,9 +61,18 @@ class PrjApiDir(oscfs.types.DirNode):
         self.m_locked_name = "locked"
         self.m_readers_name = "readers"
         self.m_refresh_trigger = "refresh"
+        self.m_binaries_dir_name = "binaries"
         self.m_prj_meta = None
+        self.m_prj_info = None
+        # (repo, arch) -> BinaryIndex, shared by all packages
+        self.m_binary_indexes = oscfs.cache.LruCache(
+            0, max_age=oscfs.types.Node.max_cache_time.total_seconds()
+        )
 
     def update(self):
+        self.m_prj_meta = None
+        self.m_prj_info = None
+
         for name, _type in (
             (self.m_meta_name, MetaNode),
             (self.m_maintainers_name, MaintainersNode),
@@ -69,7 +82,8 @@ class PrjApiDir(oscfs.types.DirNode):
             (self.m_locked_name, LockedNode),
             (self.m_readers_name, ReadersNode),
             (self.m_refresh_trigger,
-                oscfs.refreshtrigger.RefreshTrigger)
+                oscfs.refreshtrigger.RefreshTrigger),
+            (self.m_binaries_dir_name, BinariesDir)
         ):
             try:
                 node = _type(self, self.m_parent, name)
@@ -88,8 +102,61 @@ class PrjApiDir(oscfs.types.DirNode):
         return self.m_prj_meta
 
     def getPrjInfo(self):
+        # centrally keep the parsed meta data here to avoid parsing it
+        # again for each child node
+
+        if self.m_prj_info is None:
+            self.m_prj_info = oscfs.obs.ProjectInfo(self.getPrjMeta())
+            self.getRoot().getRoleIndex().setRoles(
+                self.getProject().getName(), None, self.m_prj_info
+            )
+
+        return self.m_prj_info
+
+    def setCacheStale(self):
+
+        super(PrjApiDir, self).setCacheStale()
+        self.m_binary_indexes.clear()
+
+    def getBinaryIndexes(self, repo_archs, cached_only=False):
+        """Returns a dictionary mapping each of the given (repo, arch)
+        tuples to a BinaryIndex object for this project. Returns None
+        if the indexes are not supported by the server. If cached_only
+        is set then only the indexes that are already present are
+        returned, nothing is fetched."""
+
+        ret = {}
+        missing = []
+
+        for repo_arch in repo_archs:
+            index = self.m_binary_indexes.get(repo_arch)
+            if index is None:
+                missing.append(repo_arch)
+            else:
+                ret[repo_arch] = index
+
+        if cached_only or not missing:
+            return ret
+
+        obs = self.getRoot().getObs()
+        project = self.getProject().getName()
+
+        try:
+            indexes = obs.mapParallel(
+                obs.getBinaryIndex,
+                [(project, repo, arch) for repo, arch in missing]
+            )
+        except Exception as e:
+            print(f"Failed to get binary index of {project}: {e}", file=sys.stderr)
+            return None
+
+        for repo_arch, index in zip(missing, indexes):
+            ret[repo_arch] = index
+            if not oscfs.types.Node.max_cache_time:
+                continue
+            self.m_binary_indexes.add(repo_arch, index)
 
-        return oscfs.obs.ProjectInfo(self.getPrjMeta())
+        return ret
 
 
 class MetaNode(oscfs.types.FileNode):
@@ -100,6 +167,7 @@ class MetaNode(oscfs.types.FileNode):
         super(MetaNode, self).__init__(parent, name)
         self.m_project = project
 
+    def fetchContent(self):
         meta = self.m_parent.getPrjMeta()
         self.setContent(meta)
 
@@ -112,6 +180,7 @@ class ReadersNode(oscfs.types.FileNode):
         super(ReadersNode, self).__init__(parent, name)
         self.m_project = project
 
+    def fetchContent(self):
         prj_info = self.m_parent.getPrjInfo()
         readers = '\n'.join(prj_info.getReaders())
         self.setContent(readers)
@@ -125,6 +194,7 @@ class MaintainersNode(oscfs.types.FileNode):
         super(MaintainersNode, self).__init__(parent, name)
         self.m_project = project
 
+    def fetchContent(self):
         prj_info = self.m_parent.getPrjInfo()
         maintainers = '\n'.join(prj_info.getMaintainers())
         self.setContent(maintainers)
@@ -138,6 +208,7 @@ class BugownersNode(oscfs.types.FileNode):
         super(BugownersNode, self).__init__(parent, name)
         self.m_project = project
 
+    def fetchContent(self):
         prj_info = self.m_parent.getPrjInfo()
         bugowners = '\n'.join(prj_info.getBugowners())
         self.setContent(bugowners)
@@ -151,6 +222,7 @@ class DebuginfoNode(oscfs.types.FileNode):
 
         super(DebuginfoNode, self).__init__(parent, name)
 
+    def fetchContent(self):
         prj_info = self.m_parent.getPrjInfo()
         self.setBoolean(prj_info.getDebuginfoEnabled())
 
@@ -163,6 +235,7 @@ class LockedNode(oscfs.types.FileNode):
 
         super(LockedNode, self).__init__(parent, name)
 
+    def fetchContent(self):
         prj_info = self.m_parent.getPrjInfo()
         self.setBoolean(prj_info.getLocked())
 
@@ -175,6 +248,7 @@ class RepositoriesNode(oscfs.types.FileNode):
 
         super(RepositoriesNode, self).__init__(parent, name)
 
+    def fetchContent(self):
         prj_info = self.m_parent.getPrjInfo()
 
         content = ""
@@ -212,3 +286,54 @@ class RepositoriesNode(oscfs.types.FileNode):
                 content += "\n"
 
         self.setContent(content)
+
+
+class BinariesDir(oscfs.types.DirNode):
+    """This type provides a repository/arch hierarchy containing all the
+    binary artifacts built in the project. Each binary is a symlink to
+    the package that produced it, which allows reverse lookups."""
+
+    def __init__(self, parent, project, name):
+
+        super(BinariesDir, self).__init__(parent, name)
+        self.m_project = project
+
+    def update(self):
+        prj_info = self.m_parent.getPrjInfo()
+
+        for repo, arch in prj_info.getActiveRepos():
+            repodir = self.m_entries.setdefault(
+                repo,
+                oscfs.types.PlainDirNode(self, repo)
+            )
+
+            repodir.m_entries[arch] = BinaryIndexDir(repodir, repo, arch)
+
+
+class BinaryIndexDir(oscfs.types.DirNode):
+    """Contains symlinks for each binary of a single repository/arch of
+    the project, pointing to the binary in the producing package."""
+
+    def __init__(self, parent, repo, arch):
+
+        super(BinaryIndexDir, self).__init__(parent, arch)
+        self.m_repo = repo
+
+    def update(self):
+        repo_arch = (self.m_repo, self.getName())
+        api_dir = self.getProject().getApiDir()
+        indexes = api_dir.getBinaryIndexes([repo_arch])
+
+        if indexes is None:
+            return
+
+        index = indexes[repo_arch]
+        project = self.getProject().getName()
+
+        for binary in index.getBinaryNames():
+            package = index.getPackage(binary)
+            target = "/".join([
+                project, package, ".oscfs", "binaries",
+                self.m_repo, self.getName(), binary
+            ])
+            self.m_entries[binary] = oscfs.link.Link(self, binary, target)
@@ -1,3 +1,4 @@
+import oscfs.singleflight
 import oscfs.types
 
 
@@ -15,3 +16,7 @@ class RefreshTrigger(oscfs.types.TriggerNode):
         # this invalidates the cache of the package or project in a
         # recursive fashion
         self.m_parent.m_parent.setCacheStale()
+        # previously missing entries might show up after the refresh
+        self.getRoot().clearNegativeCache()
+        # and warmed up results may be older than the user expects
+        oscfs.singleflight.clearStash()
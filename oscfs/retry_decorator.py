@@ -1,6 +1,10 @@
 import urllib
 
 
+# number of bytes to search for the 503 error document title
+_error_head_len = 512
+
+
 def _logRetry(ex):
     from oscfs.misc import getExceptionTrace
     from sys import stderr
@@ -37,14 +41,19 @@ def transparent_retry(expect_xml=False):
                     raise
 
                 if expect_xml:
-                    try:
-                        text = ret.decode()
-                    except Exception:
-                        text = ret
-
                     # heuristic to detect this, the osc module seems to fail to
                     # detect the error status, or there is none sent by the server.
-                    if text.lower().find("503 service unavailable") != -1:
+                    #
+                    # the error document is short and mentions the status in
+                    # its title, so only look at the head of the data. This
+                    # avoids copying large documents.
+                    head = ret[:_error_head_len].lower()
+                    if isinstance(head, bytes):
+                        marker = b"503 service unavailable"
+                    else:
+                        marker = "503 service unavailable"
+
+                    if head.find(marker) != -1:
                         try:
                             raise Exception("503 transparent retry (xml)")
                         except Exception as e:
@@ -0,0 +1,210 @@
+import sys
+
+import oscfs.link
+import oscfs.types
+
+
+class RoleIndex:
+    """Inverted index of the roles users and groups have in projects and
+    packages. It is filled incrementally from the meta data that has
+    been fetched anyway, or that has been bulk loaded for whole
+    projects. Group names are prefixed with '@' like in the maintainers
+    pseudo files."""
+
+    def __init__(self):
+
+        # subject -> {(project, package): set of roles}, package is
+        # None for roles in the project itself
+        self.m_subjects = {}
+        # (project, package) -> set of subjects with a role in it
+        self.m_objects = {}
+        # subject -> counter increased upon each change of its roles
+        self.m_versions = {}
+
+    def setRoles(self, project, package, info):
+        """Replaces the roles recorded for the given project or package
+        by the ones found in the given InfoBase object."""
+
+        key = (project, package)
+        roles = {}
+
+        for role, subjects in (
+            ("maintainer", info.getMaintainers()),
+            ("bugowner", info.getBugowners())
+        ):
+            for subject in subjects:
+                roles.setdefault(subject, set()).add(role)
+
+        for subject in self.m_objects.get(key, set()) - set(roles):
+            objects = self.m_subjects[subject]
+            del objects[key]
+            if not objects:
+                del self.m_subjects[subject]
+            self._changed(subject)
+
+        for subject, subject_roles in roles.items():
+            objects = self.m_subjects.setdefault(subject, {})
+            if objects.get(key) != subject_roles:
+                objects[key] = subject_roles
+                self._changed(subject)
+
+        if roles:
+            self.m_objects[key] = set(roles)
+        else:
+            self.m_objects.pop(key, None)
+
+    def _changed(self, subject):
+        self.m_versions[subject] = self.m_versions.get(subject, 0) + 1
+
+    def getVersion(self, subject):
+        """Returns a counter that changes whenever the roles of the
+        given subject change."""
+        return self.m_versions.get(subject, 0)
+
+    def getSubjects(self):
+        return list(self.m_subjects.keys())
+
+    def hasSubject(self, subject):
+        return subject in self.m_subjects
+
+    def getRoles(self, subject):
+        """Returns a list of (project, package, role) tuples for the
+        given subject. package is None for project roles."""
+
+        ret = []
+
+        for (project, package), roles in self.m_subjects.get(subject, {}).items():
+            for role in roles:
+                ret.append((project, package, role))
+
+        return ret
+
+
+class RoleIndexDir(oscfs.types.DirNode):
+    """This type represents the top-level directory of the role index.
+    It contains a directory for each user or group that is known to have
+    a role in a project or package. Looking up unknown users results in
+    empty directories, since the index is only a partial view of the
+    remote server.
+
+    Upon update the meta data of the projects passed via
+    --index-maintainers is bulk loaded into the index."""
+
+    def __init__(self, parent, name):
+
+        super(RoleIndexDir, self).__init__(parent, name)
+        self._setAutoClearOnUpdate(False)
+        # subject -> SubjectDir
+        self.m_subject_dirs = {}
+
+    def update(self):
+        root = self.getRoot()
+        obs = root.getObs()
+        index = root.getRoleIndex()
+        projects = root.getArgs().index_maintainers or []
+
+        def load(project):
+            # a single missing or forbidden project shouldn't prevent
+            # indexing the others
+            try:
+                return obs.getProjectInfo(project), obs.getPackageInfos(project)
+            except Exception as e:
+                print(f"Failed to index the roles in {project}: {e}", file=sys.stderr)
+                return None
+
+        results = obs.mapParallel(load, [(prj,) for prj in projects])
+
+        for project, result in zip(projects, results):
+            if result is None:
+                continue
+
+            prj_info, infos = result
+            index.setRoles(project, None, prj_info)
+            for pkg_info in infos:
+                index.setRoles(project, pkg_info.getName(), pkg_info)
+
+    def getNames(self):
+
+        self.updateIfNeeded()
+
+        return self.getRoot().getRoleIndex().getSubjects() + [".", ".."]
+
+    def getEntry(self, name):
+
+        ret = self.m_subject_dirs.get(name)
+
+        if ret is not None:
+            return ret
+
+        ret = SubjectDir(self, name)
+
+        # don't keep directories for arbitrary lookups of unknown names
+        if self.getRoot().getRoleIndex().hasSubject(name):
+            self.m_subject_dirs[name] = ret
+
+        return ret
+
+    def setCacheStale(self):
+
+        super(RoleIndexDir, self).setCacheStale()
+        self.m_subject_dirs = {}
+
+
+class SubjectDir(oscfs.types.DirNode):
+    """Contains the roles of a single user or group as a directory per
+    role, each containing a "projects" directory with symlinks to the
+    projects and a "packages" directory with a project/package hierarchy
+    of symlinks. The entries are rebuilt whenever the index changes."""
+
+    def __init__(self, parent, subject):
+
+        super(SubjectDir, self).__init__(parent, subject)
+        self.m_projects_name = "projects"
+        self.m_packages_name = "packages"
+        self.m_version = None
+
+    def isCacheStale(self):
+
+        index = self.getRoot().getRoleIndex()
+
+        if self.m_version != index.getVersion(self.getName()):
+            return True
+
+        return super(SubjectDir, self).isCacheStale()
+
+    def update(self):
+        root = self.getRoot()
+        index = root.getRoleIndex()
+        subject = self.getName()
+        self.m_version = index.getVersion(subject)
+
+        for project, package, role in index.getRoles(subject):
+
+            # don't add dangling links to projects that are filtered
+            if not root.isProjectIncluded(project):
+                continue
+
+            role_dir = self._getSubDir(self, role)
+
+            if package is None:
+                projects_dir = self._getSubDir(role_dir, self.m_projects_name)
+                projects_dir.m_entries[project] = oscfs.link.Link(
+                    projects_dir, project, project
+                )
+                continue
+
+            packages_dir = self._getSubDir(role_dir, self.m_packages_name)
+            prj_dir = self._getSubDir(packages_dir, project)
+            prj_dir.m_entries[package] = oscfs.link.Link(
+                prj_dir, package, f"{project}/{package}"
+            )
+
+    def _getSubDir(self, parent, name):
+
+        ret = parent.m_entries.get(name)
+
+        if ret is None:
+            ret = oscfs.types.PlainDirNode(parent, name)
+            parent.m_entries[name] = ret
+
+        return ret
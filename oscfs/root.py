@@ -1,8 +1,13 @@
+import fnmatch
 import os
+import time
 
+import oscfs.cache
 import oscfs.types
 import oscfs.obs
 import oscfs.project
+import oscfs.roles
+import oscfs.search
 
 
 class Root(oscfs.types.DirNode):
@@ -18,55 +23,208 @@ class Root(oscfs.types.DirNode):
 
         self.m_obs = obs
         self.m_args = args
+        # paths that recently turned out not to exist. Tools constantly
+        # probe for things like .git or *.swp files, these lookups
+        # should neither cause directory updates nor remote requests.
+        self.m_negative_cache = oscfs.cache.LruCache(
+            args.negative_cache_size,
+            max_age=args.negative_cache_time
+        )
+        # diffs between package revisions, which never change
+        self.m_diff_cache = oscfs.cache.LruCache(args.diff_cache_size)
+        # parsed headers of RPM binaries, keyed by their size and mtime
+        self.m_rpm_header_cache = oscfs.cache.LruCache(args.rpm_header_cache_size)
+        self.m_search_name = ".oscfs-search"
+        self.m_search_dir = oscfs.search.SearchDir(self, self.m_search_name)
+        self.m_role_index = oscfs.roles.RoleIndex()
+        self.m_role_index_name = ".oscfs-by-maintainer"
+        self.m_role_index_dir = oscfs.roles.RoleIndexDir(self, self.m_role_index_name)
+        # subtrees not accessed for this many seconds are folded, the
+        # tree is checked for them in intervals of a quarter of it
+        self.m_evict_time = args.evict_time
+        self.m_next_eviction = 0
 
     def getObs(self):
 
         return self.m_obs
 
+    def getArgs(self):
+
+        return self.m_args
+
+    def getDiffCache(self):
+
+        return self.m_diff_cache
+
+    def getRpmHeaderCache(self):
+
+        return self.m_rpm_header_cache
+
+    def getRoleIndex(self):
+
+        return self.m_role_index
+
     def getNode(self, path):
         """Traverses child nodes until the given path is found.
         Returns the corresponding Node object."""
 
+        now = time.monotonic()
+
+        if self.m_evict_time and now >= self.m_next_eviction:
+            if self.m_next_eviction:
+                self.evictIdle(now - self.m_evict_time)
+            self.m_next_eviction = now + self.m_evict_time / 4
+
         if path == self.getName():
             return self
 
+        if self._isKnownMissing(path):
+            raise KeyError(path)
+
         parts = path.split(os.path.sep)[1:]
 
         node = self
 
-        for part in parts:
+        for nr, part in enumerate(parts):
 
             node.updateIfNeeded()
-            entries = node.getEntries()
 
-            node = entries[part]
+            try:
+                node = node.getEntry(part)
+            except KeyError:
+                self._addMissing(parts[:nr + 1])
+                raise
+
+            node.setAccessed(now)
 
         return node
 
-    def update(self):
-        for project in self.m_obs.getProjectList():
+    def _isKnownMissing(self, path):
+        """Returns whether the given path, or one of its parent
+        directories, is recorded in the negative cache."""
 
-            if project in self.m_entries:
-                continue
+        cache = self.m_negative_cache
+
+        if not len(cache):
+            return False
+
+        while path:
+            if path in cache:
+                return True
+            path = path[:path.rfind(os.path.sep)]
+
+        return False
+
+    def _addMissing(self, parts):
+
+        if not self.m_args.negative_cache_time:
+            return
+        elif parts[0] == self.m_role_index_name:
+            # the role index changes with any meta data fetched
+            return
+
+        self.m_negative_cache.add(os.path.sep + os.path.sep.join(parts))
+
+    def clearNegativeCache(self):
+        self.m_negative_cache.clear()
 
-            parts = project.split(':')
+    def setCacheStale(self):
 
-            is_home = "home" in parts
-            is_maintenance = "Maintenance" in parts
-            is_ptf = "PTF" in parts
+        super(Root, self).setCacheStale()
+        self.clearNegativeCache()
 
-            if is_home:
-                # if it's our own home then still keep it
-                is_our_home = self.m_obs.getUser() in parts
-                if not is_our_home and not self.m_args.homes:
-                    continue
-            elif is_maintenance and not self.m_args.maintenance:
+    def isProjectIncluded(self, project):
+        """Returns whether the given project is part of the file system
+        according to the project filter options."""
+
+        parts = project.split(':')
+
+        is_home = "home" in parts
+        is_maintenance = "Maintenance" in parts
+        is_ptf = "PTF" in parts
+
+        if is_home:
+            # if it's our own home then still keep it
+            is_our_home = self.m_obs.getUser() in parts
+            if not is_our_home and not self.m_args.homes:
+                return False
+        elif is_maintenance and not self.m_args.maintenance:
+            return False
+        elif is_ptf and not self.m_args.ptf:
+            return False
+
+        include = self.m_args.include
+        exclude = self.m_args.exclude
+
+        if include and not any(fnmatch.fnmatchcase(project, pattern) for pattern in include):
+            return False
+        elif exclude and any(fnmatch.fnmatchcase(project, pattern) for pattern in exclude):
+            return False
+
+        return True
+
+    def getProjectFilterXpath(self):
+        """Returns an XPath predicate for searching the projects that are
+        accepted by isProjectIncluded(), or None if all projects are
+        accepted. The predicate may match more projects than accepted,
+        e.g. for patterns that have no XPath equivalent, but never
+        less."""
+
+        from oscfs.search import componentXpath, globToXpath
+
+        args = self.m_args
+        home = componentXpath("home")
+        maintenance = componentXpath("Maintenance")
+        ptf = componentXpath("PTF")
+        # the conditions for projects that aren't home projects
+        others = []
+
+        if not args.maintenance:
+            others.append(f"not({maintenance})")
+        if not args.ptf:
+            others.append(f"not({ptf})")
+
+        terms = []
+
+        if args.homes:
+            if others:
+                terms.append("({} or {})".format(home, " and ".join(others)))
+        else:
+            own_home = componentXpath(self.m_obs.getUser())
+            others.insert(0, f"not({home})")
+            terms.append("(({} and {}) or ({}))".format(
+                home, own_home, " and ".join(others)
+            ))
+
+        includes = [globToXpath(pattern) for pattern in args.include or []]
+
+        if includes and None not in includes:
+            terms.append("({})".format(" or ".join(includes)))
+
+        for pattern in args.exclude or []:
+            exclude = globToXpath(pattern)
+            if exclude:
+                terms.append(f"not({exclude})")
+
+        return " and ".join(terms) if terms else None
+
+    def update(self):
+        projects = self.m_obs.getFilteredProjectList(
+            self.getProjectFilterXpath()
+        )
+
+        for project in projects:
+
+            if project in self.m_entries:
                 continue
-            elif is_ptf and not self.m_args.ptf:
+            elif not self.isProjectIncluded(project):
                 continue
 
             self.m_entries[project] = oscfs.project.Project(
                 self, project
             )
 
+        self.m_entries[self.m_search_name] = self.m_search_dir
+        self.m_entries[self.m_role_index_name] = self.m_role_index_dir
+
         self.setCacheFresh()
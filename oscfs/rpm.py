@@ -0,0 +1,418 @@
+import errno
+import struct
+import sys
+import time
+
+import fuse
+
+import oscfs.misc
+import oscfs.types
+
+# amount of data fetched with the first request, this covers the complete
+# headers of most packages, bigger headers are completed by a second
+# request
+_initial_size = 64 * 1024
+
+_lead_size = 96
+_lead_magic = b"\xed\xab\xee\xdb"
+_header_magic = b"\x8e\xad\xe8\x01"
+# magic, reserved bytes, number of index entries, size of the data store
+_header_intro = struct.Struct(">4s4xII")
+# tag, type, offset, count
+_index_entry = struct.Struct(">iIiI")
+
+# header tags
+TAG_NAME = 1000
+TAG_VERSION = 1001
+TAG_RELEASE = 1002
+TAG_EPOCH = 1003
+TAG_SUMMARY = 1004
+TAG_DESCRIPTION = 1005
+TAG_BUILDTIME = 1006
+TAG_BUILDHOST = 1007
+TAG_SIZE = 1009
+TAG_DISTRIBUTION = 1010
+TAG_VENDOR = 1011
+TAG_LICENSE = 1014
+TAG_PACKAGER = 1015
+TAG_GROUP = 1016
+TAG_URL = 1020
+TAG_ARCH = 1022
+TAG_OLDFILENAMES = 1027
+TAG_SOURCERPM = 1044
+TAG_PROVIDENAME = 1047
+TAG_REQUIREFLAGS = 1048
+TAG_REQUIRENAME = 1049
+TAG_REQUIREVERSION = 1050
+TAG_PROVIDEFLAGS = 1112
+TAG_PROVIDEVERSION = 1113
+TAG_DIRINDEXES = 1116
+TAG_BASENAMES = 1117
+TAG_DIRNAMES = 1118
+TAG_LONGSIZE = 5009
+
+# dependency flags
+SENSE_LESS = 0x02
+SENSE_GREATER = 0x04
+SENSE_EQUAL = 0x08
+
+# header data types
+_TYPE_CHAR = 1
+_TYPE_INT8 = 2
+_TYPE_INT16 = 3
+_TYPE_INT32 = 4
+_TYPE_INT64 = 5
+_TYPE_STRING = 6
+_TYPE_BIN = 7
+_TYPE_STRING_ARRAY = 8
+_TYPE_I18NSTRING = 9
+
+_int_formats = {
+    _TYPE_CHAR: "B",
+    _TYPE_INT8: "B",
+    _TYPE_INT16: "H",
+    _TYPE_INT32: "I",
+    _TYPE_INT64: "Q",
+}
+
+# the tags that are kept from the main header, everything else like
+# changelogs or file digests is dropped after parsing to save memory
+_kept_tags = set((
+    TAG_NAME, TAG_VERSION, TAG_RELEASE, TAG_EPOCH, TAG_SUMMARY,
+    TAG_DESCRIPTION, TAG_BUILDTIME, TAG_BUILDHOST, TAG_SIZE,
+    TAG_DISTRIBUTION, TAG_VENDOR, TAG_LICENSE, TAG_PACKAGER, TAG_GROUP,
+    TAG_URL, TAG_ARCH, TAG_OLDFILENAMES, TAG_SOURCERPM, TAG_PROVIDENAME,
+    TAG_REQUIREFLAGS, TAG_REQUIRENAME, TAG_REQUIREVERSION,
+    TAG_PROVIDEFLAGS, TAG_PROVIDEVERSION, TAG_DIRINDEXES, TAG_BASENAMES,
+    TAG_DIRNAMES, TAG_LONGSIZE
+))
+
+
+class _HeaderFetcher:
+    """Receives the beginning of an RPM file up to a given size. Data is
+    read from a ranged response, once it is exhausted another range is
+    requested."""
+
+    def __init__(self, open_func, size):
+
+        self.m_open_func = open_func
+        self.m_size = size
+        self.m_data = bytearray()
+        self.m_response = None
+
+    def _open(self, end):
+
+        start = len(self.m_data)
+        self.m_response = self.m_open_func(byte_range=(start, end))
+
+        if self.m_response.status != 206:
+            # the server ignored the range, skip what we already have
+            while start > 0:
+                chunk = self.m_response.read(start)
+                if not chunk:
+                    raise Exception("unexpected end of RPM data")
+                start -= len(chunk)
+
+    def need(self, amount):
+        """Makes sure that at least amount bytes have been received and
+        returns the data received so far."""
+
+        if amount > self.m_size:
+            raise Exception("RPM header exceeds the file size")
+
+        while len(self.m_data) < amount:
+
+            fresh = self.m_response is None
+
+            if fresh:
+                # fetch a bit more than needed, further parts of the
+                # header will most likely be needed soon
+                self._open(min(self.m_size, max(amount, _initial_size)))
+
+            chunk = self.m_response.read(amount - len(self.m_data))
+
+            if not chunk:
+                self.close()
+                if fresh:
+                    # the file is shorter than expected, e.g. because
+                    # it has been replaced in the meantime. Requesting
+                    # the range again wouldn't help.
+                    raise Exception("unexpected end of RPM data")
+                continue
+
+            self.m_data += chunk
+
+        return self.m_data
+
+    def close(self):
+
+        if self.m_response is not None:
+            self.m_response.close()
+            self.m_response = None
+
+
+def _getHeaderSize(data, offset):
+    """Returns the size of the header structure starting at offset,
+    excluding alignment padding."""
+
+    magic, entries, store_size = _header_intro.unpack_from(data, offset)
+
+    if magic != _header_magic:
+        raise Exception("bad RPM header magic")
+
+    return _header_intro.size + entries * _index_entry.size + store_size
+
+
+def fetchHeader(open_func, size):
+    """Fetches the lead, signature and main header of an RPM file of the
+    given size via byte range requests. @open_func needs to accept a
+    byte_range keyword argument like StreamedFile.openContent(). Returns
+    the raw data of the main header."""
+
+    fetcher = _HeaderFetcher(open_func, size)
+
+    try:
+        data = fetcher.need(_lead_size + _header_intro.size)
+
+        if data[:4] != _lead_magic:
+            raise Exception("not an RPM file")
+
+        sig_size = _getHeaderSize(data, _lead_size)
+        # the signature header is padded to a multiple of eight bytes
+        hdr_offset = _lead_size + sig_size + (-sig_size % 8)
+
+        data = fetcher.need(hdr_offset + _header_intro.size)
+        hdr_size = _getHeaderSize(data, hdr_offset)
+
+        data = fetcher.need(hdr_offset + hdr_size)
+        return bytes(data[hdr_offset:hdr_offset + hdr_size])
+    finally:
+        fetcher.close()
+
+
+def _parseValue(store, _type, offset, count):
+
+    if _type in (_TYPE_STRING, _TYPE_STRING_ARRAY, _TYPE_I18NSTRING):
+        ret = []
+        for _ in range(count):
+            end = store.index(b"\0", offset)
+            ret.append(store[offset:end].decode("utf8", errors="replace"))
+            offset = end + 1
+        return ret[0] if _type == _TYPE_STRING else ret
+    elif _type == _TYPE_BIN:
+        return bytes(store[offset:offset + count])
+
+    fmt = _int_formats.get(_type)
+
+    if fmt is None:
+        return None
+
+    return list(struct.unpack_from(f">{count}{fmt}", store, offset))
+
+
+class RpmHeader:
+    """The parsed main header of an RPM file. Only the tags needed for
+    the pseudo files are kept."""
+
+    def __init__(self, data):
+
+        self.m_tags = {}
+        self._parse(data)
+
+    def _parse(self, data):
+
+        _, entries, store_size = _header_intro.unpack_from(data, 0)
+        store_offset = _header_intro.size + entries * _index_entry.size
+        store = data[store_offset:store_offset + store_size]
+
+        for nr in range(entries):
+            tag, _type, offset, count = _index_entry.unpack_from(
+                data, _header_intro.size + nr * _index_entry.size
+            )
+
+            if tag not in _kept_tags:
+                continue
+
+            self.m_tags[tag] = _parseValue(store, _type, offset, count)
+
+    def getTag(self, tag, default=None):
+
+        return self.m_tags.get(tag, default)
+
+    def _getString(self, tag, default="(none)"):
+
+        ret = self.getTag(tag)
+
+        if isinstance(ret, list):
+            # I18N strings, the first one is the default locale
+            ret = ret[0] if ret else None
+
+        return default if ret is None else ret
+
+    def _getInt(self, tag):
+
+        ret = self.getTag(tag)
+        return ret[0] if ret else None
+
+    def getInfo(self):
+        """Returns a package description similar to `rpm -qi`."""
+
+        epoch = self._getInt(TAG_EPOCH)
+        size = self._getInt(TAG_LONGSIZE)
+
+        if size is None:
+            size = self._getInt(TAG_SIZE)
+
+        buildtime = self._getInt(TAG_BUILDTIME)
+
+        if buildtime is not None:
+            buildtime = time.strftime("%a %d %b %Y %H:%M:%S %Z", time.localtime(buildtime))
+
+        fields = [
+            ("Name", self._getString(TAG_NAME)),
+            ("Epoch", epoch),
+            ("Version", self._getString(TAG_VERSION)),
+            ("Release", self._getString(TAG_RELEASE)),
+            ("Architecture", self._getString(TAG_ARCH)),
+            ("Group", self._getString(TAG_GROUP)),
+            ("Size", size),
+            ("License", self._getString(TAG_LICENSE)),
+            ("Source RPM", self._getString(TAG_SOURCERPM)),
+            ("Build Date", buildtime),
+            ("Build Host", self._getString(TAG_BUILDHOST)),
+            ("Packager", self._getString(TAG_PACKAGER)),
+            ("Vendor", self._getString(TAG_VENDOR)),
+            ("Distribution", self._getString(TAG_DISTRIBUTION)),
+            ("URL", self._getString(TAG_URL)),
+            ("Summary", self._getString(TAG_SUMMARY)),
+        ]
+
+        ret = [
+            f"{label:<12}: {value}" for label, value in fields
+            if value is not None
+        ]
+
+        ret.append("Description :")
+        ret.append(self._getString(TAG_DESCRIPTION, ""))
+
+        return "\n".join(ret) + "\n"
+
+    def _getDependencies(self, name_tag, flags_tag, version_tag):
+
+        names = self.getTag(name_tag, [])
+        flags = self.getTag(flags_tag, [])
+        versions = self.getTag(version_tag, [])
+        ret = []
+
+        for nr, name in enumerate(names):
+            flag = flags[nr] if nr < len(flags) else 0
+            version = versions[nr] if nr < len(versions) else ""
+            op = ""
+
+            if flag & SENSE_LESS:
+                op += "<"
+            if flag & SENSE_GREATER:
+                op += ">"
+            if flag & SENSE_EQUAL:
+                op += "="
+
+            if op and version:
+                ret.append(f"{name} {op} {version}")
+            else:
+                ret.append(name)
+
+        return ret
+
+    def getRequires(self):
+        return self._getDependencies(
+            TAG_REQUIRENAME, TAG_REQUIREFLAGS, TAG_REQUIREVERSION
+        )
+
+    def getProvides(self):
+        return self._getDependencies(
+            TAG_PROVIDENAME, TAG_PROVIDEFLAGS, TAG_PROVIDEVERSION
+        )
+
+    def getFileList(self):
+
+        basenames = self.getTag(TAG_BASENAMES)
+
+        if basenames is None:
+            # packages built with very old rpm versions
+            return self.getTag(TAG_OLDFILENAMES, [])
+
+        dirnames = self.getTag(TAG_DIRNAMES, [])
+        indexes = self.getTag(TAG_DIRINDEXES, [])
+
+        return [
+            dirnames[index] + basename
+            for index, basename in zip(indexes, basenames)
+        ]
+
+
+class RpmInfoDir(oscfs.types.DirNode):
+    """Provides metadata of a single RPM binary artifact as pseudo files.
+    Only the header of the RPM is fetched via byte range requests, the
+    parsed header is kept in a cache shared by all packages."""
+
+    def __init__(self, parent, binary_file):
+
+        super(RpmInfoDir, self).__init__(parent, binary_file.getName())
+        self.m_file = binary_file
+        self.getStat().setModTime(binary_file.getStat().st_mtime)
+
+    def getHeader(self):
+
+        node = self.m_file
+        key = node.getCacheKey()
+        cache = self.getRoot().getRpmHeaderCache()
+
+        ret = cache.get(key)
+
+        if ret is None:
+            data = fetchHeader(node.openContent, node.getStat().st_size)
+            ret = RpmHeader(data)
+            cache.add(key, ret)
+
+        return ret
+
+    def update(self):
+
+        for name, getter in (
+            ("info", RpmHeader.getInfo),
+            ("requires", RpmHeader.getRequires),
+            ("provides", RpmHeader.getProvides),
+            ("filelist", RpmHeader.getFileList),
+        ):
+            self.m_entries[name] = RpmHeaderNode(self, name, getter)
+
+
+class RpmHeaderNode(oscfs.types.FileNode):
+    """A pseudo file returning part of the header of an RPM. List values
+    are returned one item per line."""
+
+    def __init__(self, parent, name, getter):
+
+        super(RpmHeaderNode, self).__init__(parent, name)
+        self.m_getter = getter
+        # the shared header cache bounds the memory used
+        self.setUseCache(False)
+        self.setUseSnapshot(True)
+
+    def fetchContent(self):
+
+        try:
+            header = self.m_parent.getHeader()
+        except Exception as e:
+            print("Failed to fetch RPM header of {}:\n{}".format(
+                self.m_parent.getName(),
+                oscfs.misc.getExceptionTrace(e),
+            ), file=sys.stderr)
+            raise fuse.FuseOSError(errno.EIO)
+
+        content = self.m_getter(header)
+
+        if isinstance(content, list):
+            content = "".join(f"{line}\n" for line in content)
+
+        self.setContent(content)
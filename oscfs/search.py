@@ -0,0 +1,189 @@
+import oscfs.cache
+import oscfs.link
+import oscfs.types
+
+
+def xpathLiteral(value):
+    """Returns the given string as a quoted XPath string literal."""
+
+    if "'" not in value:
+        return f"'{value}'"
+    elif '"' not in value:
+        return f'"{value}"'
+
+    # XPath 1.0 has no escaping, the string needs to be concatenated
+    # from parts quoted differently
+    parts = [f"'{part}'" for part in value.split("'")]
+    return "concat({})".format(", \"'\", ".join(parts))
+
+
+def isValidQuery(query):
+    """Returns whether the given search directory name is a query worth
+    sending to the OBS. Tools and shells constantly probe for names like
+    .git or perform lookups while completing, these are rejected along
+    with queries too short to be useful."""
+
+    min_len = 3
+    attr_prefix = "attribute:"
+
+    if query.startswith('.'):
+        return False
+    elif query.startswith(attr_prefix):
+        query = query[len(attr_prefix):]
+
+    return len(query) >= min_len
+
+
+def queryToXpath(query):
+    """Translates a search directory name into an XPath predicate for
+    the OBS search API. "attribute:<name>" matches objects carrying the
+    given attribute, anything else matches objects whose name contains
+    the query string."""
+
+    attr_prefix = "attribute:"
+
+    if query.startswith(attr_prefix):
+        attribute = query[len(attr_prefix):]
+        return f"attribute/@name={xpathLiteral(attribute)}"
+
+    return f"contains(@name, {xpathLiteral(query)})"
+
+
+def globToXpath(pattern, attr="@name"):
+    """Translates a shell style wildcard pattern into an equivalent
+    XPath predicate on the given attribute. Only patterns that can be
+    expressed exactly are supported: plain names and names with a
+    leading and/or trailing '*'. For anything else None is returned."""
+
+    inner = pattern.strip('*')
+
+    if not inner or any(c in inner for c in "*?[]"):
+        return None
+
+    literal = xpathLiteral(inner)
+    leading = pattern.startswith('*')
+    trailing = pattern.endswith('*')
+
+    if leading and trailing:
+        return f"contains({attr}, {literal})"
+    elif leading:
+        return f"ends-with({attr}, {literal})"
+    elif trailing:
+        return f"starts-with({attr}, {literal})"
+
+    return f"{attr}={literal}"
+
+
+def componentXpath(component, attr="@name"):
+    """Returns an XPath predicate matching colon separated names like
+    project names that contain the given component."""
+
+    literals = [
+        xpathLiteral(value) for value in
+        (component, f"{component}:", f":{component}:", f":{component}")
+    ]
+
+    return "({attr}={} or starts-with({attr}, {}) or contains({attr}, {}) or ends-with({attr}, {}))".format(
+        *literals, attr=attr
+    )
+
+
+class SearchDir(oscfs.types.DirNode):
+    """This type represents the top-level search directory. Each
+    subdirectory is created on demand upon lookup and is named after
+    the search query it represents. Results of recent queries are kept
+    in a bounded cache, they are listed as the directory entries."""
+
+    def __init__(self, parent, name):
+
+        super(SearchDir, self).__init__(parent, name)
+        self._setAutoClearOnUpdate(False)
+        args = self.getRoot().getArgs()
+        # query -> SearchResultDir
+        self.m_results = oscfs.cache.LruCache(
+            args.search_cache_size,
+            max_age=args.search_cache_time
+        )
+
+    def update(self):
+        # entries are created on demand in getEntry()
+        pass
+
+    def getNames(self):
+
+        return self.m_results.keys() + [".", ".."]
+
+    def getEntry(self, name):
+
+        ret = self.m_results.get(name)
+
+        if ret is not None:
+            return ret
+        elif not isValidQuery(name):
+            raise KeyError(name)
+
+        # this is only added to the results once the search ran
+        return SearchResultDir(self, name)
+
+    def addResult(self, result_dir):
+
+        if self.getRoot().getArgs().search_cache_time:
+            self.m_results.add(result_dir.getName(), result_dir)
+
+    def setCacheStale(self):
+
+        super(SearchDir, self).setCacheStale()
+        self.m_results.clear()
+
+
+class SearchResultDir(oscfs.types.DirNode):
+    """Contains the results of a single search query: a "projects"
+    directory with a symlink for each matching project and a "packages"
+    directory containing a project/package hierarchy of symlinks for
+    each matching package."""
+
+    def __init__(self, parent, query):
+
+        super(SearchResultDir, self).__init__(parent, query)
+        self.m_projects_name = "projects"
+        self.m_packages_name = "packages"
+
+    def update(self):
+        root = self.getRoot()
+        obs = root.getObs()
+        xpath = queryToXpath(self.getName())
+
+        projects, packages = obs.mapParallel(
+            lambda search: search(xpath),
+            [(obs.searchProjects,), (obs.searchPackages,)]
+        )
+
+        projects_dir = oscfs.types.PlainDirNode(self, self.m_projects_name)
+        packages_dir = oscfs.types.PlainDirNode(self, self.m_packages_name)
+        self.m_entries[self.m_projects_name] = projects_dir
+        self.m_entries[self.m_packages_name] = packages_dir
+
+        for project in projects:
+            # don't add dangling links to projects that are filtered
+            if not root.isProjectIncluded(project):
+                continue
+
+            projects_dir.m_entries[project] = oscfs.link.Link(
+                projects_dir, project, project
+            )
+
+        for project, package in packages:
+            if not root.isProjectIncluded(project):
+                continue
+
+            prj_dir = packages_dir.m_entries.get(project)
+
+            if prj_dir is None:
+                prj_dir = oscfs.types.PlainDirNode(packages_dir, project)
+                packages_dir.m_entries[project] = prj_dir
+
+            prj_dir.m_entries[package] = oscfs.link.Link(
+                prj_dir, package, f"{project}/{package}"
+            )
+
+        self.m_parent.addResult(self)
@@ -0,0 +1,156 @@
+import contextlib
+import threading
+
+import oscfs.cache
+
+
+class _Call:
+    """Represents a single in-flight call whose result is shared between
+    all concurrent callers."""
+
+    def __init__(self):
+        self.m_done = threading.Event()
+        self.m_result = None
+        self.m_error = None
+        # whether a caller outside of stashing() received the result
+        self.m_shared = False
+
+    def wait(self):
+        self.m_done.wait()
+
+        if self.m_error is not None:
+            raise self.m_error
+
+        return self.m_result
+
+
+_lock = threading.Lock()
+# maps call keys to _Call objects currently in flight
+_in_flight = {}
+# results of calls made within stashing() that no one asked for yet
+_stash = oscfs.cache.LruCache(256)
+# marks threads that currently run within stashing() and counts their
+# nested single_flight calls
+_local = threading.local()
+_missing = object()
+
+
+def setStashLimits(max_entries, max_age):
+    """Sets the maximum number of stashed results and the time in
+    seconds after which they are dropped."""
+
+    global _stash
+
+    with _lock:
+        _stash = oscfs.cache.LruCache(max_entries, max_age=max_age)
+
+
+def clearStash():
+    with _lock:
+        _stash.clear()
+
+
+@contextlib.contextmanager
+def stashing():
+    """Within this context single_flight calls of the current thread put
+    their results aside. The next call with identical arguments from
+    outside of this context receives the stashed result instead of
+    contacting the remote server. This is used for warming up data in the
+    background without touching the node tree, which is not thread safe."""
+
+    _local.stashing = True
+    _local.depth = 0
+    try:
+        yield
+    finally:
+        _local.stashing = False
+
+
+def _makeKey(func, args, kwargs):
+    """Returns a hashable key identifying a call of func with the given
+    arguments, or None if the arguments can't be used as a key."""
+
+    def freeze(value):
+        if isinstance(value, list):
+            return tuple(freeze(item) for item in value)
+        return value
+
+    key = (
+        func,
+        tuple(freeze(arg) for arg in args),
+        tuple(sorted((name, freeze(value)) for name, value in kwargs.items()))
+    )
+
+    try:
+        hash(key)
+    except TypeError:
+        return None
+
+    return key
+
+
+# The FUSE main loop runs single threaded (nothreads=True), so file system
+# operations themselves never issue OBS calls concurrently. Concurrent
+# callers are the worker threads of Obs.mapParallel() and the --warm
+# prefetching, which run next to the main loop. Without coordination they
+# can issue identical requests at the same time, multiplying the load on
+# the remote server for no gain.
+#
+# This is a function decorator that coalesces concurrent calls with
+# identical arguments: the first caller performs the actual call, all
+# others wait for it to finish and receive the same result (or exception).
+# Callers must treat the returned objects as read-only, since they're
+# shared.
+def single_flight(func):
+
+    def coalesce(*args, **kwargs):
+        key = _makeKey(func, args, kwargs)
+
+        if key is None:
+            return func(*args, **kwargs)
+
+        stashing = getattr(_local, "stashing", False)
+        # only results of the outermost calls are stashed, the nodes
+        # never ask for the ones of nested calls like _download()
+        outermost = stashing and not _local.depth
+
+        with _lock:
+            if len(_stash):
+                result = _stash.get(key, _missing)
+                if result is not _missing:
+                    if not stashing:
+                        _stash.remove(key)
+                    return result
+
+            call = _in_flight.get(key, None)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                _in_flight[key] = call
+            elif not stashing:
+                call.m_shared = True
+
+        if not is_leader:
+            return call.wait()
+
+        if stashing:
+            _local.depth += 1
+
+        try:
+            call.m_result = func(*args, **kwargs)
+            return call.m_result
+        except BaseException as e:
+            call.m_error = e
+            raise
+        finally:
+            if stashing:
+                _local.depth -= 1
+            with _lock:
+                del _in_flight[key]
+                if outermost and call.m_error is None and not call.m_shared:
+                    _stash.add(key, call.m_result)
+            call.m_done.set()
+
+    coalesce.__name__ = func.__name__
+    coalesce.__doc__ = func.__doc__
+    return coalesce
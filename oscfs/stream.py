@@ -0,0 +1,234 @@
+import concurrent.futures
+import threading
+
+
+class StreamBuffer:
+    """Buffers the content of a file while it is being received from an
+    HTTP response. Reads are served as soon as the requested range has
+    arrived, so the time to the first byte doesn't depend on the file
+    size. The buffer can be shared by all readers of the same file, the
+    data is only transferred once.
+
+    @response is a file-like object supporting readinto(). @size is the
+    expected size of the content, if known, which allows to preallocate
+    the buffer."""
+
+    # amount of data to receive at once
+    chunk_size = 256 * 1024
+
+    def __init__(self, response, size=None):
+
+        self.m_response = response
+        self.m_buffer = bytearray(size if size else 0)
+        # number of bytes received so far
+        self.m_received = 0
+        self.m_complete = False
+        self.m_lock = threading.Lock()
+
+    def isComplete(self):
+        return self.m_complete
+
+    def getReceived(self):
+        return self.m_received
+
+    def read(self, length, offset):
+        """Returns up to length bytes starting at offset, waiting only
+        for the data required for this."""
+
+        end = offset + length
+        self._receiveUntil(end)
+
+        return memoryview(self.m_buffer)[offset:min(end, self.m_received)]
+
+    def _receiveUntil(self, end):
+        """Receives data until at least end bytes are available or the
+        response is finished."""
+
+        with self.m_lock:
+            while not self.m_complete and self.m_received < end:
+                self._receiveChunk()
+
+    def _receiveChunk(self):
+
+        needed = self.m_received + self.chunk_size
+        if len(self.m_buffer) < needed:
+            # the size was unknown or wrong, grow the buffer. Since
+            # readers might still hold memoryviews of the old buffer it
+            # can't be resized in place.
+            grown = bytearray(max(needed, len(self.m_buffer) * 2))
+            grown[:self.m_received] = memoryview(self.m_buffer)[:self.m_received]
+            self.m_buffer = grown
+
+        view = memoryview(self.m_buffer)[self.m_received:needed]
+        try:
+            amount = self.m_response.readinto(view)
+        finally:
+            view.release()
+
+        if amount:
+            self.m_received += amount
+            return
+
+        self.m_complete = True
+        self.m_response.close()
+
+    def close(self):
+        """Aborts receiving any outstanding data."""
+
+        with self.m_lock:
+            if not self.m_complete:
+                self.m_response.close()
+
+
+class ChunkedStream:
+    """Receives the content of a file of known size via parallel HTTP
+    range requests of chunk_size bytes each, using the threads of
+    @pool. This overcomes per-connection throughput limits for large
+    files. Chunks are requested ahead of the current read position, so
+    sequential readers see the data in order as soon as it arrived.
+
+    @open_range is a callable receiving a (start, end) byte range and
+    returning a file-like HTTP response for it. @first_response is an
+    already opened response for the first chunk."""
+
+    def __init__(self, open_range, size, chunk_size, pool, readahead, first_response=None):
+
+        self.m_open_range = open_range
+        self.m_size = size
+        self.m_chunk_size = chunk_size
+        self.m_pool = pool
+        # number of chunks to request ahead of the read position
+        self.m_readahead = readahead
+        self.m_buffer = bytearray(size)
+        num_chunks = (size + chunk_size - 1) // chunk_size
+        # futures for the chunks that have been requested
+        self.m_chunks = [None] * num_chunks
+        self.m_done_chunks = 0
+        self.m_closed = False
+        self.m_lock = threading.Lock()
+
+        if first_response is not None:
+            self.m_chunks[0] = pool.submit(self._receiveChunk, 0, first_response)
+
+    def isComplete(self):
+        return self.m_done_chunks == len(self.m_chunks)
+
+    def read(self, length, offset):
+
+        end = min(offset + length, self.m_size)
+        if offset >= end:
+            return b''
+
+        first = offset // self.m_chunk_size
+        last = (end - 1) // self.m_chunk_size
+        self._requestChunks(first, last + self.m_readahead)
+
+        for nr in range(first, last + 1):
+            # raises any error that occured while receiving the chunk
+            self.m_chunks[nr].result()
+
+        return memoryview(self.m_buffer)[offset:end]
+
+    def _requestChunks(self, first, last):
+
+        last = min(last, len(self.m_chunks) - 1)
+
+        with self.m_lock:
+            for nr in range(first, last + 1):
+                if self.m_chunks[nr] is None:
+                    self.m_chunks[nr] = self.m_pool.submit(self._receiveChunk, nr)
+
+    def _receiveChunk(self, nr, response=None):
+
+        start = nr * self.m_chunk_size
+        end = min(start + self.m_chunk_size, self.m_size)
+
+        if response is None:
+            response = self.m_open_range((start, end))
+
+        try:
+            if response.status != 206:
+                raise Exception(f"range request failed with HTTP status {response.status}")
+
+            view = memoryview(self.m_buffer)[start:end]
+            received = 0
+            while received < len(view) and not self.m_closed:
+                amount = response.readinto(view[received:])
+                if not amount:
+                    raise Exception(f"short read at offset {start + received}")
+                received += amount
+            view.release()
+        finally:
+            response.close()
+
+        if self.m_closed:
+            return
+
+        with self.m_lock:
+            self.m_done_chunks += 1
+
+    def close(self):
+        """Aborts receiving any outstanding data."""
+
+        self.m_closed = True
+
+        with self.m_lock:
+            for future in self.m_chunks:
+                if future is not None:
+                    future.cancel()
+
+
+# threads used for chunked downloads, see setDownloadWorkers()
+_download_pool = None
+_download_workers = 1
+
+
+def setDownloadWorkers(workers):
+    """Sets the number of parallel connections used for downloading a
+    large file in chunks. A value of 1 disables chunked downloads."""
+
+    global _download_pool, _download_workers
+    _download_workers = workers
+
+    if _download_pool:
+        _download_pool.shutdown(wait=False)
+
+    if workers > 1:
+        _download_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="download"
+        )
+    else:
+        _download_pool = None
+
+
+def openStream(open_func, size, chunk_size):
+    """Returns a stream object for the content of a remote file. Files
+    of at least two chunks are received via parallel range requests if
+    enabled via setDownloadWorkers() and supported by the server,
+    otherwise via a single StreamBuffer.
+
+    @open_func needs to accept an optional byte_range keyword argument
+    and return a file-like HTTP response."""
+
+    if not _download_pool or not size or size < chunk_size * 2:
+        return StreamBuffer(open_func(), size)
+
+    response = open_func(byte_range=(0, chunk_size))
+
+    # "bytes 0-1023/4096"
+    content_range = response.headers.get("Content-Range", "")
+    total = content_range.rpartition('/')[2]
+
+    if response.status != 206 or not total.isdigit():
+        # the server ignored the range, simply stream the full response
+        return StreamBuffer(response, size)
+
+    return ChunkedStream(
+        lambda byte_range: open_func(byte_range=byte_range),
+        int(total),
+        chunk_size,
+        _download_pool,
+        readahead=_download_workers,
+        first_response=response
+    )
@@ -0,0 +1,120 @@
+# std. modules
+import errno
+import json
+import time
+
+
+class TraceRecorder:
+    """Records the sequence of FUSE operations hitting the file system
+    into a file, one JSON object per line. Each record contains the
+    operation name, the path, a relative timestamp and the duration of
+    the operation, as well as operation specific data like offset and
+    length for reads. Such traces can be replayed via tests/replay.py to
+    reproduce real world access patterns."""
+
+    # how often buffered records are written out at most
+    flush_interval = 1.0
+
+    def __init__(self, path):
+
+        self.m_file = open(path, 'a')
+        self.m_start = time.monotonic()
+        self.m_last_flush = self.m_start
+
+    def close(self):
+
+        if self.m_file:
+            self.m_file.close()
+            self.m_file = None
+
+    def _describe(self, record, op, args, ret):
+        """Adds operation specific information to the given record."""
+
+        if op == "read":
+            length, offset, fh = args
+            record["length"] = length
+            record["offset"] = offset
+            record["fh"] = fh
+            if ret is not None:
+                record["result"] = len(ret)
+        elif op == "write":
+            data, offset, fh = args
+            record["length"] = len(data)
+            record["offset"] = offset
+            record["fh"] = fh
+        elif op == "open":
+            record["flags"] = args[0]
+            record["fh"] = ret
+        elif op == "opendir":
+            record["fh"] = ret
+        elif op == "readdir":
+            fh, offset = (list(args) + [None, 0])[:2]
+            if fh is not None:
+                record["fh"] = fh
+            record["offset"] = offset
+            if ret is not None:
+                record["result"] = len(ret)
+        elif op in ("getattr", "truncate", "release", "releasedir"):
+            fh = args[-1] if args else None
+            if op == "truncate":
+                record["length"] = args[0]
+            if fh is not None:
+                record["fh"] = fh
+
+    def call(self, func, op, path, *args):
+        """Invokes func(op, path, *args) and records the operation."""
+
+        start = time.monotonic()
+        ret = None
+        error = None
+
+        try:
+            ret = func(op, path, *args)
+            if op == "readdir" and ret is not None:
+                # make sure the listing is actually produced within the
+                # measured time frame
+                ret = list(ret)
+            return ret
+        except OSError as e:
+            error = e.errno
+            raise
+        except Exception:
+            error = errno.EFAULT
+            raise
+        finally:
+            end = time.monotonic()
+            record = {
+                "t": round(start - self.m_start, 6),
+                "op": op,
+                "path": path,
+                "dur": round(end - start, 6)
+            }
+            self._describe(record, op, args, ret)
+            if error is not None:
+                record["err"] = error
+            self._write(record, end)
+
+    def _write(self, record, now):
+
+        if not self.m_file:
+            return
+
+        self.m_file.write(json.dumps(record) + "\n")
+
+        if now - self.m_last_flush >= self.flush_interval:
+            self.m_file.flush()
+            self.m_last_flush = now
+
+
+def readTrace(path):
+    """Returns a list of the records stored in the given trace file."""
+
+    ret = []
+
+    with open(path, 'r') as trace:
+        for line in trace:
+            line = line.strip()
+            if line:
+                ret.append(json.loads(line))
+
+    return ret
@@ -70,12 +70,13 @@ class Stat:
 
     def toDict(self):
 
-        ret = dict()
-        for attr in dir(self):
-            if attr.startswith("st_"):
-                ret[attr] = getattr(self, attr)
-
-        return ret
+        # this is called for each getattr and directory entry, so avoid
+        # the expensive dir() and getattr() calls. All st_ attributes
+        # are instance attributes.
+        return {
+            attr: value for attr, value in self.__dict__.items()
+            if attr.startswith("st_")
+        }
 
     def setLinks(self, links):
         self.st_nlink = links
@@ -116,6 +117,8 @@ class Node:
         self.m_last_updated = None
         self.m_auto_clear_on_update = True
         self.m_num_users = 0
+        # time.monotonic() of the last path lookup reaching this node
+        self.m_last_accessed = 0
 
     @classmethod
     def setMaxCacheTime(cls, seconds):
@@ -135,6 +138,17 @@ class Node:
         description being gone for this node."""
         pass
 
+    def isInUse(self):
+        """Returns whether there are open file descriptions for this node
+        or any node below it."""
+        return self.m_num_users != 0
+
+    def setAccessed(self, now):
+        self.m_last_accessed = now
+
+    def getLastAccessed(self):
+        return self.m_last_accessed
+
     def getStat(self):
         return self.m_stat
 
@@ -259,6 +273,7 @@ class FileNode(Node):
         super(FileNode, self).__init__(parent, name)
         self.m_content = None
         self.m_use_cache = True
+        self.m_use_snapshot = False
 
     def setContent(self, content, date=None):
         if isinstance(content, str):
@@ -276,14 +291,30 @@ class FileNode(Node):
     def setUseCache(self, on_off):
         self.m_use_cache = on_off
 
+    def setUseSnapshot(self, on_off):
+        """Uncached content is fetched only once per open file if this is
+        set, otherwise consecutive reads could return parts of different
+        versions. Content that is expected to grow while being read,
+        like build logs, should be fetched again on each read instead."""
+        self.m_use_snapshot = on_off
+
     def setBoolean(self, value):
         self.setContent("1" if value else "0")
 
-    def read(self, length, offset):
-        if self.m_content is None or not self.m_use_cache:
-            self.fetchContent()
+    def read(self, length, offset, handle=None):
+        if not self.m_use_cache and self.m_use_snapshot and handle:
+            content = handle.getSnapshot()
+            if content is None:
+                self.fetchContent()
+                content = self.m_content
+                handle.setSnapshot(content)
+        else:
+            if self.m_content is None or not self.m_use_cache:
+                self.fetchContent()
+            content = self.m_content
 
-        ret = self.m_content[offset:offset + length]
+        # avoid copying the data, the FUSE layer accepts memoryviews
+        ret = memoryview(content)[offset:offset + length]
 
         return ret
 
@@ -347,6 +378,28 @@ class DirNode(Node):
 
         return entries + dots
 
+    def getListing(self):
+        """Returns a list of (name, node) tuples for all entries
+        including the dot entries, in the order of getNames(). node is
+        None for entries that can't be resolved."""
+
+        ret = []
+        parent = self.m_parent if self.m_parent else self
+
+        for name in self.getNames():
+            if name == ".":
+                node = self
+            elif name == "..":
+                node = parent
+            else:
+                try:
+                    node = self.getEntry(name)
+                except KeyError:
+                    node = None
+            ret.append((name, node))
+
+        return ret
+
     def clearEntries(self):
 
         self.m_entries = dict()
@@ -355,6 +408,13 @@ class DirNode(Node):
 
         return self.m_entries
 
+    def getEntry(self, name):
+        """Returns the child node of the given name or raises KeyError
+        if there is no such entry. Directories that create their entries
+        on demand can override this."""
+
+        return self.m_entries[name]
+
     def setCacheStale(self):
 
         Node.setCacheStale(self)
@@ -362,6 +422,47 @@ class DirNode(Node):
         for entry in self.m_entries.values():
             entry.setCacheStale()
 
+    def isInUse(self):
+
+        if self.m_num_users:
+            return True
+
+        return any(entry.isInUse() for entry in self.m_entries.values())
+
+    def isFoldable(self):
+        """Returns whether fold() can be used on this directory. This is
+        the case if update() recreates all entries from scratch.
+        Directories with special update logic need to override this."""
+        return self.doAutoClearOnUpdate()
+
+    def fold(self):
+        """Drops all entries and cached data, turning this directory back
+        into the lightweight placeholder it was before its first update.
+        The next access updates it again."""
+
+        self.setCacheStale()
+        self.clearEntries()
+
+    def evictIdle(self, deadline):
+        """Folds all sub directories below this one that haven't been
+        accessed since @deadline and aren't in use. Returns the number of
+        folded directories."""
+
+        ret = 0
+
+        for entry in self.m_entries.values():
+
+            if not entry.isDirectory() or not entry.m_entries:
+                continue
+            elif entry.getLastAccessed() < deadline and \
+                    entry.isFoldable() and not entry.isInUse():
+                entry.fold()
+                ret += 1
+            else:
+                ret += entry.evictIdle(deadline)
+
+        return ret
+
 
 class PlainDirNode(DirNode):
     """Specialized DirNode that doesn't implement its own update logic.
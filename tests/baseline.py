@@ -0,0 +1,80 @@
+# Helpers shared by the benchmark scripts for storing results as JSON
+# baselines and comparing new results against them.
+
+import json
+
+
+def addBaselineArguments(parser, tolerance):
+    """Adds the command line arguments for storing and comparing
+    baselines to the given argparse parser."""
+
+    parser.add_argument(
+        "--save-baseline", type=str, default=None, metavar="FILE",
+        help="Store the results as JSON baseline in FILE"
+    )
+    parser.add_argument(
+        "--compare", type=str, default=None, metavar="FILE",
+        help="Compare the results against the JSON baseline in FILE"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=tolerance,
+        help="Relative increase against the baseline that is considered a regression"
+    )
+
+
+def saveBaseline(path, results, config=None):
+
+    data = {"results": results}
+    if config is not None:
+        data["config"] = config
+
+    with open(path, 'w') as fd:
+        json.dump(data, fd, indent=4)
+
+    print("Stored baseline in", path, flush=True)
+
+
+def compareBaseline(path, results, tolerance, min_deltas={}, higher_is_better=(), tolerances={}):
+    """Compares the given results against the baseline stored in
+    path. results is a dictionary of benchmark name -> {metric: value}.
+    For all metrics an increase of more than the relative tolerance is
+    considered a regression, except for metrics listed in
+    higher_is_better, where a decrease is considered a regression.
+    min_deltas optionally maps metric names to absolute changes below
+    which changes are considered noise. tolerances optionally maps
+    metric names to a relative tolerance that is used instead of the
+    general one, e.g. zero for deterministic metrics. Returns the number
+    of regressions found."""
+
+    with open(path, 'r') as fd:
+        baseline = json.load(fd).get("results", {})
+
+    regressions = 0
+
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+
+        for key, new in result.items():
+            old = base.get(key)
+            if old is None:
+                continue
+
+            delta = new - old
+            key_tolerance = tolerances.get(key, tolerance)
+            if key in higher_is_better:
+                worse = new < old * (1 - key_tolerance) and -delta > min_deltas.get(key, 0)
+            else:
+                worse = new > old * (1 + key_tolerance) and delta > min_deltas.get(key, 0)
+
+            if worse:
+                regressions += 1
+                verdict = "REGRESSION"
+            else:
+                verdict = "ok"
+
+            change = delta / old * 100 if old else 0.0
+            print(f"{name:>22} {key:>14}: {old:16.6f} -> {new:16.6f} ({change:+7.1f}%) {verdict}", flush=True)
+
+    return regressions
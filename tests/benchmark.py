@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+
+import baseline
+import mockobs
+
+
+def eprint(*args, **kwargs):
+    kwargs["file"] = sys.stderr
+    print(*args, **kwargs)
+
+
+def fprint(*args, **kwargs):
+    kwargs['flush'] = True
+    print(*args, **kwargs)
+
+
+class OscFsBenchmark:
+    """This program measures the performance of typical file system
+    workloads against a local mock OBS instance. Each workload is run
+    on a freshly mounted file system (cold) and then repeated (warm).
+    Results can be stored as a baseline and compared against a
+    previously stored baseline to detect performance regressions."""
+
+    def __init__(self):
+
+        self.m_parser = argparse.ArgumentParser(
+            description="Offline performance benchmarks for oscfs"
+        )
+
+        self.m_parser.add_argument(
+            "--rounds", type=int, default=3,
+            help="Number of times each workload is repeated. The median is reported."
+        )
+        self.m_parser.add_argument(
+            "--workloads", type=str, default=None,
+            help="Comma separated list of workloads to run (default: all)"
+        )
+        self.m_parser.add_argument(
+            "--oscfs-arg", action='append', default=[],
+            help="Additional command line argument to pass to oscfs. Can be specified multiple times."
+        )
+        baseline.addBaselineArguments(self.m_parser, tolerance=0.25)
+        mockobs.addObsArguments(self.m_parser)
+
+        self.m_workloads = {
+            "mount": self.benchMount,
+            "ls_root": self.benchLsRoot,
+            "ls": self.benchLs,
+            "ls_l": self.benchLsLong,
+            "cat": self.benchCat,
+            "tail": self.benchTail,
+            "walk": self.benchWalk,
+        }
+
+    def _path(self, *comps):
+        return os.path.join(self.m_mount.getMountDir(), *comps)
+
+    def _testProject(self):
+        return "openSUSE:Factory"
+
+    def _testPackage(self):
+        return self.m_server.m_obs.getPackageNames(self._testProject())[0]
+
+    def _testTarball(self):
+        names = self.m_server.m_obs.getFileNames(self._testPackage())
+        return self._path(self._testProject(), self._testPackage(), names[-1])
+
+    def benchMount(self):
+        # the actual time is taken by mount()
+        pass
+
+    def benchLsRoot(self):
+        os.listdir(self._path())
+
+    def benchLs(self):
+        os.listdir(self._path(self._testProject()))
+
+    def benchLsLong(self):
+        project = self._path(self._testProject())
+        for entry in os.listdir(project):
+            os.lstat(os.path.join(project, entry))
+
+    def benchCat(self):
+        with open(self._testTarball(), 'rb') as fd:
+            while fd.read(128 * 1024):
+                pass
+
+    def benchTail(self):
+        with open(self._testTarball(), 'rb') as fd:
+            fd.seek(-4096, os.SEEK_END)
+            fd.read()
+
+    def benchWalk(self):
+        package = self._path(self._testProject(), self._testPackage())
+        for root, dirs, files in os.walk(package):
+            for name in files:
+                os.lstat(os.path.join(root, name))
+
+    def _fetchRequestStats(self):
+        with urllib.request.urlopen(self.m_server.getUrl() + "/_mock/stats") as resp:
+            return json.loads(resp.read())
+
+    def _timeCall(self, func):
+        start = time.monotonic()
+        func()
+        return time.monotonic() - start
+
+    def runWorkload(self, name):
+        """Runs a single workload cold and warm for the configured
+        number of rounds and returns a dictionary describing the median
+        results."""
+
+        func = self.m_workloads[name]
+        colds = []
+        warms = []
+        requests = []
+
+        for _ in range(self.m_args.rounds):
+            mount_time = self.m_mount.mount(self.m_args.oscfs_arg)
+            self.m_server.resetStats()
+            if name == "mount":
+                colds.append(mount_time)
+                warms.append(mount_time)
+                requests.append(0)
+                continue
+            colds.append(self._timeCall(func))
+            requests.append(sum(self._fetchRequestStats().values()))
+            warms.append(self._timeCall(func))
+
+        def median(values):
+            values = sorted(values)
+            return values[len(values) // 2]
+
+        return {
+            "cold": median(colds),
+            "warm": median(warms),
+            "requests": median(requests),
+        }
+
+    def run(self):
+
+        self.m_args = self.m_parser.parse_args()
+
+        if self.m_args.workloads:
+            workloads = self.m_args.workloads.split(',')
+            for name in workloads:
+                if name not in self.m_workloads:
+                    raise Exception(f"unknown workload '{name}'")
+        else:
+            workloads = list(self.m_workloads.keys())
+
+        self.m_server = mockobs.createServer(self.m_args)
+        self.m_server.start()
+        self.m_mount = mockobs.OscFsMount(self.m_server)
+        fprint("Using mock OBS at", self.m_server.getUrl(), "and mount dir", self.m_mount.getMountDir())
+
+        results = {}
+
+        try:
+            for name in workloads:
+                res = self.runWorkload(name)
+                results[name] = res
+                fprint(f"{name:>10}: cold {res['cold']:9.4f}s warm {res['warm']:9.4f}s requests {res['requests']}")
+        finally:
+            self.m_mount.cleanup()
+            self.m_server.stop()
+
+        if self.m_args.save_baseline:
+            config = {
+                key: value for key, value in vars(self.m_args).items()
+                if key not in ("save_baseline", "compare")
+            }
+            baseline.saveBaseline(self.m_args.save_baseline, results, config)
+
+        if self.m_args.compare:
+            regressions = baseline.compareBaseline(
+                self.m_args.compare, results, self.m_args.tolerance,
+                # ignore noise in the low millisecond range
+                min_deltas={"cold": 0.005, "warm": 0.005},
+                # request counts against the mock server are
+                # deterministic, any increase is a regression
+                tolerances={"requests": 0}
+            )
+            if regressions:
+                raise Exception(f"{regressions} performance regression(s) found")
+
+
+osc_fs_benchmark = OscFsBenchmark()
+try:
+    osc_fs_benchmark.run()
+except Exception as e:
+    eprint("Error:", e)
+    sys.exit(1)
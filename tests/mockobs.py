@@ -0,0 +1,1133 @@
+#!/usr/bin/env python3
+
+# A local stand-in for an OBS API server. It serves synthetic or previously
+# recorded API responses with configurable latency and size. This allows to
+# run oscfs against a reproducible, offline OBS instance e.g. for
+# benchmarking.
+#
+# Recorded responses are looked up in the --record-dir directory by URL
+# path, e.g. a file <record-dir>/source/openSUSE:Factory/_meta is served for
+# GET /source/openSUSE:Factory/_meta. Such files can be captured from a real
+# instance via e.g. `osc api /source/openSUSE:Factory/_meta`. Anything not
+# found there is synthesized.
+
+import argparse
+import hashlib
+import http.server
+import json
+import os
+import re
+import signal
+import ssl
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from xml.sax.saxutils import quoteattr, escape
+
+
+class SyntheticObs:
+    """Generates deterministic OBS API documents of configurable size."""
+
+    def __init__(
+            self,
+            projects=200, packages=500, files=8, file_size=64 * 1024,
+            revisions=50, archs=("x86_64", "i586", "aarch64"),
+            repos=("openSUSE_Tumbleweed", "openSUSE_Factory"),
+            binaries=6, binary_size=256 * 1024, log_size=128 * 1024,
+            user="bench", archives=False):
+
+        self.m_num_projects = projects
+        self.m_num_packages = packages
+        self.m_num_files = files
+        self.m_file_size = file_size
+        self.m_num_revisions = revisions
+        self.m_archs = list(archs)
+        self.m_repos = list(repos)
+        self.m_num_binaries = binaries
+        self.m_binary_size = binary_size
+        self.m_log_size = log_size
+        self.m_user = user
+        # whether to serve real tar archives instead of opaque blobs
+        self.m_archives = archives
+        self.m_base_time = 1500000000
+        self.m_blobs = {}
+        # explicitly added names, e.g. taken from a recorded trace
+        self.m_extra_projects = []
+        self.m_extra_packages = {}
+        self.m_extra_files = {}
+
+    def addProject(self, project):
+        if project not in self.m_extra_projects:
+            self.m_extra_projects.append(project)
+
+    def addPackage(self, project, package):
+        self.addProject(project)
+        packages = self.m_extra_packages.setdefault(project, [])
+        if package not in packages:
+            packages.append(package)
+
+    def addFile(self, package, name):
+        self.m_extra_files.setdefault(package, set()).add(name)
+
+    def getProjectNames(self):
+        ret = [
+            "openSUSE:Factory",
+            "devel:languages:python",
+            f"home:{self.m_user}",
+        ]
+
+        for nr in range(self.m_num_projects):
+            ret.append(f"project:{nr:05d}")
+        # a couple of special projects that oscfs filters by default
+        for nr in range(max(1, self.m_num_projects // 10)):
+            ret.append(f"home:user{nr:05d}")
+            ret.append(f"openSUSE:Maintenance:{nr}")
+            ret.append(f"PTF:{nr}")
+
+        ret.extend([prj for prj in self.m_extra_projects if prj not in ret])
+
+        return ret
+
+    def hasProject(self, project):
+        return project in set(self.getProjectNames())
+
+    def getPackageNames(self, project):
+        ret = [f"package{nr:05d}" for nr in range(self.m_num_packages)]
+        return ret + self.m_extra_packages.get(project, [])
+
+    def hasPackage(self, project, package):
+        if package in self.m_extra_packages.get(project, []):
+            return True
+        elif not package.startswith("package"):
+            return False
+        try:
+            return int(package[7:]) < self.m_num_packages
+        except ValueError:
+            return False
+
+    def getFileNames(self, package):
+        ret = [f"{package}.spec", f"{package}.changes"]
+        suffixes = (".tar.xz", ".tar.gz", ".tar") if self.m_archives else (".tar.xz",)
+        for nr in range(max(0, self.m_num_files - 2)):
+            ret.append(f"{package}-{nr}{suffixes[nr % len(suffixes)]}")
+        ret.extend(sorted(self.m_extra_files.get(package, set()) - set(ret)))
+        return ret
+
+    def getFileSize(self, name):
+        if name.endswith(".spec"):
+            return 4096
+        elif name.endswith(".changes"):
+            return 16384
+        elif self.m_archives and ".tar" in name:
+            return len(self._archive(name))
+        return self.m_file_size
+
+    def _archive(self, name):
+        """Returns a tar archive of about file_size bytes, compressed
+        according to the name suffix. xz archives consist of multiple
+        streams, like produced by parallel compressors."""
+
+        try:
+            return self.m_blobs[name]
+        except KeyError:
+            pass
+
+        import gzip
+        import io
+        import lzma
+        import random
+        import tarfile
+
+        top = name.split(".tar")[0]
+        buf = io.BytesIO()
+        mtime = self.m_base_time
+
+        with tarfile.open(fileobj=buf, mode="w", format=tarfile.GNU_FORMAT) as tar:
+            info = tarfile.TarInfo(top)
+            info.type = tarfile.DIRTYPE
+            info.mtime = mtime
+            tar.addfile(info)
+            nr = 0
+            while buf.tell() < self.m_file_size:
+                # incompressible content for realistic archive sizes
+                data = random.Random(nr).randbytes(nr * 997 % 65536)
+                info = tarfile.TarInfo(f"{top}/src/file{nr:04d}.txt")
+                info.size = len(data)
+                info.mtime = mtime
+                tar.addfile(info, io.BytesIO(data))
+                nr += 1
+            for _type, member, target in (
+                (tarfile.SYMTYPE, "README", "src/file0000.txt"),
+                (tarfile.LNKTYPE, "COPYING", f"{top}/src/file0001.txt"),
+            ):
+                info = tarfile.TarInfo(f"{top}/{member}")
+                info.type = _type
+                info.linkname = target
+                info.mtime = mtime
+                tar.addfile(info)
+
+        data = buf.getvalue()
+
+        if name.endswith(".xz"):
+            part = 256 * 1024
+            ret = b"".join(
+                lzma.compress(data[pos:pos + part]) for pos in range(0, len(data), part)
+            )
+        elif name.endswith(".gz"):
+            ret = gzip.compress(data, mtime=0)
+        else:
+            ret = data
+
+        self.m_blobs[name] = ret
+        return ret
+
+    def _blob(self, size):
+        """Returns deterministic content of the given size. Blobs are
+        cached since large blobs are expensive to generate."""
+
+        try:
+            return self.m_blobs[size]
+        except KeyError:
+            pass
+
+        line = b"0123456789abcdefghijklmnopqrstuvwxyz" * 2 + b"\n"
+        blob = (line * (size // len(line) + 1))[:size]
+        self.m_blobs[size] = blob
+        return blob
+
+    def _md5(self, *parts):
+        return hashlib.md5('/'.join(parts).encode()).hexdigest()
+
+    def _persons(self, seed):
+        return (
+            f'  <person userid="{self.m_user}" role="maintainer"/>\n'
+            f'  <person userid="user{seed % 97:05d}" role="bugowner"/>\n'
+            f'  <group groupid="group{seed % 7}" role="maintainer"/>\n'
+        )
+
+    def projectList(self):
+        names = self.getProjectNames()
+        ret = [f'<directory count="{len(names)}">']
+        for name in names:
+            ret.append(f'  <entry name={quoteattr(name)}/>')
+        ret.append('</directory>\n')
+        return '\n'.join(ret).encode()
+
+    def projectMeta(self, project):
+        ret = [f'<project name={quoteattr(project)}>']
+        ret.append(f'  <title>Synthetic project {escape(project)}</title>')
+        ret.append('  <description>A project generated by mockobs.</description>')
+        ret.append(self._persons(len(project)).rstrip('\n'))
+        for repo in self.m_repos:
+            ret.append(f'  <repository name={quoteattr(repo)}>')
+            ret.append(f'    <path project="openSUSE:Factory" repository={quoteattr(repo)}/>')
+            for arch in self.m_archs:
+                ret.append(f'    <arch>{arch}</arch>')
+            ret.append('  </repository>')
+        ret.append('</project>\n')
+        return '\n'.join(ret).encode()
+
+    def packageList(self, project):
+        names = self.getPackageNames(project)
+        ret = [f'<directory count="{len(names)}">']
+        for name in names:
+            ret.append(f'  <entry name={quoteattr(name)}/>')
+        ret.append('</directory>\n')
+        return '\n'.join(ret).encode()
+
+    def packageMeta(self, project, package):
+        ret = [f'<package name={quoteattr(package)} project={quoteattr(project)}>']
+        ret.append(f'  <title>Synthetic package {escape(package)}</title>')
+        ret.append('  <description>' + escape(
+            f"The {package} package is generated by mockobs. " * 8
+        ) + '</description>')
+        ret.append(self._persons(len(package)).rstrip('\n'))
+        ret.append('</package>\n')
+        return '\n'.join(ret).encode()
+
+    def fileList(self, project, package, rev=None):
+        rev = self.m_num_revisions if rev in (None, "latest") else int(rev)
+        srcmd5 = self._md5(project, package, str(rev))
+        ret = [
+            f'<directory name={quoteattr(package)} rev="{rev}" vrev="{rev}" srcmd5="{srcmd5}">'
+        ]
+        for name in self.getFileNames(package):
+            ret.append('  <entry name={} md5="{}" size="{}" mtime="{}"/>'.format(
+                quoteattr(name),
+                self._md5(project, package, name, str(rev)),
+                self.getFileSize(name),
+                self.m_base_time + rev * 3600
+            ))
+        ret.append('</directory>\n')
+        return '\n'.join(ret).encode()
+
+    def fileContent(self, project, package, name):
+        if self.m_archives and ".tar" in name:
+            return self._archive(name)
+        return self._blob(self.getFileSize(name))
+
+    def history(self, project, package):
+        ret = ['<revisionlist>']
+        for rev in range(1, self.m_num_revisions + 1):
+            ret.append(f'  <revision rev="{rev}" vrev="{rev}">')
+            ret.append(f'    <srcmd5>{self._md5(project, package, str(rev))}</srcmd5>')
+            ret.append(f'    <version>1.{rev}</version>')
+            ret.append(f'    <time>{self.m_base_time + rev * 3600}</time>')
+            ret.append(f'    <user>user{rev % 97:05d}</user>')
+            ret.append(f'    <comment>Update to version 1.{rev}</comment>')
+            ret.append(f'    <requestid>{100000 + rev}</requestid>')
+            ret.append('  </revision>')
+        ret.append('</revisionlist>\n')
+        return '\n'.join(ret).encode()
+
+    def diff(self, project, package, orev, rev):
+        orev = int(orev) if orev else self.m_num_revisions - 1
+        rev = int(rev) if rev else self.m_num_revisions
+        if not 0 < orev <= self.m_num_revisions or not 0 < rev <= self.m_num_revisions:
+            raise KeyError("no_such_revision")
+        spec = f"{package}.spec"
+        ret = [
+            "",
+            "changes files:",
+            "--------------",
+            f"--- {package}.changes",
+            f"+++ {package}.changes",
+            f"@@ -1,{orev} +1,{rev} @@",
+        ]
+        for nr in range(max(orev, rev), min(orev, rev), -1):
+            sign = "+" if rev > orev else "-"
+            ret.append(f"{sign}- Update to version 1.{nr}")
+        ret.extend([
+            "",
+            "spec files:",
+            "-----------",
+            f"--- {spec}",
+            f"+++ {spec}",
+            "@@ -1,1 +1,1 @@",
+            f"-Version: 1.{orev}",
+            f"+Version: 1.{rev}",
+            "",
+            "other changes:",
+            "--------------",
+            "",
+            f"++++++ {package}-0.tar.xz: archive changed, content not shown",
+            ""
+        ])
+        return '\n'.join(ret).encode()
+
+    def results(self, project, package=None, repos=[], archs=[]):
+        packages = [package] if package else self.getPackageNames(project)
+        state = self._md5(project, package or "", *repos, *archs, str(self.m_log_size))
+        ret = [f'<resultlist state="{state}">']
+        for repo in self.m_repos:
+            if repos and repo not in repos:
+                continue
+            for arch in self.m_archs:
+                if archs and arch not in archs:
+                    continue
+                ret.append(
+                    f'  <result project={quoteattr(project)} repository="{repo}" arch="{arch}" code="published" state="published">'
+                )
+                for pkg in packages:
+                    ret.append(f'    <status package={quoteattr(pkg)} code="succeeded"/>')
+                ret.append('  </result>')
+        ret.append('</resultlist>\n')
+        return '\n'.join(ret).encode()
+
+    def getBinaryNames(self, package, arch):
+        ret = ["_buildenv", "_statistics", f"{package}.rpmlintlog"]
+        for nr in range(max(0, self.m_num_binaries - 3)):
+            ret.append(f"{package}-sub{nr}-1.0-1.1.{arch}.rpm")
+        return ret
+
+    def getBinarySize(self, name):
+        if name.endswith(".rpm"):
+            return self.m_binary_size
+        return 4096
+
+    def binaryList(self, project, repo, arch, package):
+        ret = ['<binarylist>']
+        for name in self.getBinaryNames(package, arch):
+            ret.append('  <binary filename={} size="{}" mtime="{}"/>'.format(
+                quoteattr(name),
+                self.getBinarySize(name),
+                self.m_base_time
+            ))
+        ret.append('</binarylist>\n')
+        return '\n'.join(ret).encode()
+
+    def binaryIndex(self, project, repos=[], archs=[]):
+        ret = ['<resultlist>']
+        for repo in self.m_repos:
+            if repos and repo not in repos:
+                continue
+            for arch in self.m_archs:
+                if archs and arch not in archs:
+                    continue
+                ret.append(
+                    f'  <result project={quoteattr(project)} repository="{repo}" arch="{arch}" code="published" state="published">'
+                )
+                for package in self.getPackageNames(project):
+                    ret.append(f'    <binarylist package={quoteattr(package)}>')
+                    for name in self.getBinaryNames(package, arch):
+                        ret.append('      <binary filename={} size="{}" mtime="{}"/>'.format(
+                            quoteattr(name),
+                            self.getBinarySize(name),
+                            self.m_base_time
+                        ))
+                    ret.append('    </binarylist>')
+                ret.append('  </result>')
+        ret.append('</resultlist>\n')
+        return '\n'.join(ret).encode()
+
+    def binaryContent(self, name):
+        size = self.getBinarySize(name)
+
+        if not name.endswith(".rpm"):
+            return self._blob(size)
+
+        head = self._rpmHead(name)
+        return (head + self._blob(max(0, size - len(head))))[:size]
+
+    @staticmethod
+    def _rpmHeader(entries):
+        """Returns an RPM header structure containing the given (tag,
+        type, values) entries."""
+
+        int_types = {3: ">H", 4: ">I", 5: ">Q"}
+        index = []
+        store = b""
+
+        for tag, _type, values in sorted(entries):
+            if _type in int_types:
+                fmt = int_types[_type]
+                # integers are aligned to their natural size
+                store += b"\0" * (-len(store) % struct.calcsize(fmt))
+                data = b"".join(struct.pack(fmt, value) for value in values)
+                count = len(values)
+            elif _type == 7:
+                data = values
+                count = len(values)
+            else:
+                if _type == 6:
+                    values = [values]
+                data = b"".join(value.encode() + b"\0" for value in values)
+                count = len(values)
+            index.append(struct.pack(">iIiI", tag, _type, len(store), count))
+            store += data
+
+        intro = b"\x8e\xad\xe8\x01" + b"\0" * 4 + struct.pack(">II", len(index), len(store))
+        return intro + b"".join(index) + store
+
+    def _rpmHead(self, name):
+        """Returns the lead, signature and main header of a synthetic
+        RPM. The first sub-package carries a large file list, which
+        exceeds typical initial header fetches."""
+
+        stem = name[:-len(".rpm")]
+        rpm_name, version, release, arch = re.match(
+            r"^(.+)-([^-]+)-([^-]+)\.([^.]+)$", stem
+        ).groups()
+        nr_files = 6000 if "-sub0-" in name else 30
+        dirs = [f"/usr/share/{rpm_name}/", "/usr/bin/"]
+
+        hdr = self._rpmHeader([
+            (1000, 6, rpm_name),
+            (1001, 6, version),
+            (1002, 6, release),
+            (1004, 9, [f"Summary of {rpm_name}"]),
+            (1005, 9, [f"Description of {rpm_name}.\nSecond line."]),
+            (1006, 4, [self.m_base_time]),
+            (1007, 6, "build01"),
+            (1009, 4, [nr_files * 1000]),
+            (1014, 6, "MIT"),
+            (1016, 6, "Development/Tools"),
+            (1020, 6, "https://example.org"),
+            (1022, 6, arch),
+            (1044, 6, f"{rpm_name}-{version}-{release}.src.rpm"),
+            (1047, 8, [rpm_name, f"{rpm_name}({arch})"]),
+            (1112, 4, [8, 8]),
+            (1113, 8, [f"{version}-{release}", f"{version}-{release}"]),
+            (1048, 4, [0, 12, 16777226]),
+            (1049, 8, ["/bin/sh", "libc.so.6", "rpmlib(PayloadIsXz)"]),
+            (1050, 8, ["", "2.0", "5.2-1"]),
+            (1116, 4, [nr % len(dirs) for nr in range(nr_files)]),
+            (1117, 8, [f"file{nr:05d}" for nr in range(nr_files)]),
+            (1118, 8, dirs),
+        ])
+
+        # the size of the signature header is no multiple of eight, to
+        # require alignment padding
+        sig = self._rpmHeader([
+            (1000, 4, [len(hdr)]),
+            (1004, 7, hashlib.md5(hdr).digest()),
+        ])
+
+        lead = b"\xed\xab\xee\xdb\x03\x00" + b"\0" * 4 + stem.encode()[:65].ljust(66, b"\0")
+        lead += b"\0\x01\0\x05" + b"\0" * 16
+
+        return lead + sig + b"\0" * (-len(sig) % 8) + hdr
+
+    def buildLog(self):
+        return self._blob(self.m_log_size)
+
+    def growBuildLog(self, amount):
+        """Makes all build logs grow like during a running build. The
+        build results change accordingly."""
+        self.m_log_size += amount
+
+    def requests(self):
+        return b'<collection matches="0">\n</collection>\n'
+
+    def person(self, login):
+        return (
+            f'<person>\n  <login>{escape(login)}</login>\n'
+            f'  <email>{escape(login)}@example.org</email>\n'
+            f'  <realname>{escape(login)}</realname>\n</person>\n'
+        ).encode()
+
+    def getAttributes(self, project, package=None):
+        """Returns the names of the OBS attributes set for the given
+        project or package."""
+        if package is None:
+            return ["OBS:Maintained"] if project == "openSUSE:Factory" else []
+        elif package.startswith("package") and package[7:].isdigit():
+            return ["OBS:Maintained"] if int(package[7:]) % 10 == 0 else []
+        return []
+
+    def searchProjects(self, xpath):
+        match = XPathPredicate(xpath)
+        ret = []
+        for project in self.getProjectNames():
+            if match({"@name": [project], "attribute/@name": self.getAttributes(project)}):
+                ret.append(f'  <project name={quoteattr(project)}/>')
+        ret.insert(0, f'<collection matches="{len(ret)}">')
+        ret.append('</collection>\n')
+        return '\n'.join(ret).encode()
+
+    def searchPackages(self, xpath, full=False):
+        match = XPathPredicate(xpath)
+        ret = []
+        for project in self.getProjectNames():
+            for package in self.getPackageNames(project):
+                attrs = {
+                    "@name": [package],
+                    "@project": [project],
+                    "attribute/@name": self.getAttributes(project, package)
+                }
+                if not match(attrs):
+                    continue
+                elif full:
+                    ret.append(self.packageMeta(project, package).decode().rstrip('\n'))
+                else:
+                    ret.append(f'  <package name={quoteattr(package)} project={quoteattr(project)}/>')
+        ret.insert(0, f'<collection matches="{len(ret)}">')
+        ret.append('</collection>\n')
+        return '\n'.join(ret).encode()
+
+
+class XPathPredicate:
+    """Evaluates the small subset of XPath predicates used for OBS
+    searches: comparisons via = and !=, contains(), starts-with() and
+    ends-with() on attribute paths, combined via and, or, not() and
+    parentheses. Objects are passed as dictionaries mapping paths like
+    "@name" to lists of values. Raises KeyError for unsupported
+    expressions."""
+
+    token_re = re.compile(r"""\s*(!=|=|\(|\)|,|'[^']*'|"[^"]*"|[\w@][\w@/:.-]*)""")
+
+    def __init__(self, xpath):
+        self.m_tokens = []
+        pos = 0
+        xpath = xpath.strip()
+        while pos < len(xpath):
+            m = self.token_re.match(xpath, pos)
+            if not m:
+                raise KeyError("illegal_xpath")
+            self.m_tokens.append(m.group(1))
+            pos = m.end()
+        self.m_pos = 0
+        self.m_func = self._parseOr()
+        if self.m_pos != len(self.m_tokens):
+            raise KeyError("illegal_xpath")
+
+    def __call__(self, attrs):
+        return self.m_func(attrs)
+
+    def _peek(self):
+        return self.m_tokens[self.m_pos] if self.m_pos < len(self.m_tokens) else None
+
+    def _next(self, expected=None):
+        token = self._peek()
+        if token is None or (expected and token != expected):
+            raise KeyError("illegal_xpath")
+        self.m_pos += 1
+        return token
+
+    def _parseOr(self):
+        terms = [self._parseAnd()]
+        while self._peek() == "or":
+            self._next()
+            terms.append(self._parseAnd())
+        return lambda attrs: any(term(attrs) for term in terms)
+
+    def _parseAnd(self):
+        terms = [self._parseUnary()]
+        while self._peek() == "and":
+            self._next()
+            terms.append(self._parseUnary())
+        return lambda attrs: all(term(attrs) for term in terms)
+
+    def _parseUnary(self):
+        token = self._next()
+
+        if token == "(":
+            ret = self._parseOr()
+            self._next(")")
+            return ret
+        elif token == "not":
+            self._next("(")
+            inner = self._parseOr()
+            self._next(")")
+            return lambda attrs: not inner(attrs)
+        elif token in ("contains", "starts-with", "ends-with"):
+            self._next("(")
+            left = self._parseOperand(self._next())
+            self._next(",")
+            right = self._parseOperand(self._next())
+            self._next(")")
+            if token == "contains":
+                test = str.__contains__
+            elif token == "ends-with":
+                test = str.endswith
+            else:
+                test = str.startswith
+            return lambda attrs: any(
+                test(a, b) for a in left(attrs) for b in right(attrs)
+            )
+
+        left = self._parseOperand(token)
+        op = self._next()
+        right = self._parseOperand(self._next())
+        if op == "=":
+            return lambda attrs: bool(set(left(attrs)) & set(right(attrs)))
+        elif op == "!=":
+            return lambda attrs: any(
+                a != b for a in left(attrs) for b in right(attrs)
+            )
+        raise KeyError("illegal_xpath")
+
+    def _parseOperand(self, token):
+        if token[0] in "'\"":
+            return lambda attrs: [token[1:-1]]
+        elif token[0] == "@" or "/@" in token:
+            return lambda attrs: attrs.get(token, [])
+        raise KeyError("illegal_xpath")
+
+
+class MockObsHandler(http.server.BaseHTTPRequestHandler):
+    """Serves OBS API GET and POST requests from a SyntheticObs instance or from
+    recorded responses."""
+
+    # required for connection reuse via keep-alive
+    protocol_version = "HTTP/1.1"
+
+    def handle_one_request(self):
+        try:
+            super().handle_one_request()
+        except ConnectionError:
+            # the client dropped the connection, e.g. after aborting a
+            # transfer
+            self.close_connection = True
+
+    def log_message(self, fmt, *args):
+        if self.server.m_verbose:
+            super().log_message(fmt, *args)
+
+    def _sendStatus(self, code, status, summary):
+        body = '<status code={}>\n  <summary>{}</summary>\n</status>\n'.format(
+            quoteattr(status), escape(summary)
+        ).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("X-Opensuse-Errorcode", status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _parseRange(self, size):
+        """Returns a tuple of (start, end) for a "Range: bytes=a-b"
+        request header or None if there is none or it is unsupported."""
+
+        value = self.headers.get("Range", "")
+        if not value.startswith("bytes=") or ',' in value:
+            return None
+
+        start, _, end = value[len("bytes="):].partition('-')
+        try:
+            start = int(start)
+            end = min(int(end) + 1, size) if end else size
+        except ValueError:
+            return None
+
+        if start >= end:
+            return None
+
+        return start, end
+
+    def _sendData(self, data, ctype="application/xml"):
+        byte_range = self._parseRange(len(data))
+
+        if byte_range:
+            start, end = byte_range
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(data)}")
+            data = memoryview(data)[start:end]
+        else:
+            self.send_response(200)
+
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+
+        bandwidth = self.server.m_bandwidth
+        view = memoryview(data)
+        # throttle output to the configured bandwidth
+        chunk = max(1, bandwidth // 50) if bandwidth else len(view)
+
+        try:
+            for pos in range(0, len(view), chunk):
+                self.wfile.write(view[pos:pos + chunk])
+                if bandwidth:
+                    time.sleep(chunk / bandwidth)
+        except ConnectionError:
+            # the client aborted the transfer, e.g. a streaming reader
+            # closing the file early
+            self.close_connection = True
+
+    def _lookupRecorded(self, path):
+        record_dir = self.server.m_record_dir
+        if not record_dir:
+            return None
+
+        rel = os.path.normpath(path.lstrip('/'))
+        if rel.startswith(".."):
+            return None
+        recorded = os.path.join(record_dir, rel)
+
+        if not os.path.isfile(recorded):
+            return None
+
+        with open(recorded, 'rb') as fd:
+            return fd.read()
+
+    def do_POST(self):
+        # only commands without request body like cmd=diff are supported
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+        self.do_GET()
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        path = urllib.parse.unquote(url.path)
+        comps = [comp for comp in path.split('/') if comp]
+
+        if comps == ["_mock", "stats"]:
+            self._sendData(self.server.getStats(), "application/json")
+            return
+
+        if self.server.m_latency:
+            time.sleep(self.server.m_latency)
+
+        recorded = self._lookupRecorded(path)
+        if recorded is not None:
+            self.server.countRequest("recorded")
+            self._sendData(recorded)
+            return
+
+        try:
+            label, data, ctype = self._synthesize(comps, query)
+        except KeyError as e:
+            self.server.countRequest("error")
+            self._sendStatus(404, e.args[0], f"not found: {path}")
+            return
+
+        self.server.countRequest(label)
+        self._sendData(data, ctype)
+
+    def _synthesize(self, comps, query):
+        """Returns a tuple of (label, data, content-type) for the given
+        API path components. The label classifies the request for
+        statistics. Raises KeyError with an OBS error code if the path
+        doesn't exist."""
+
+        obs = self.server.m_obs
+
+        def checkProject(project):
+            if not obs.hasProject(project):
+                raise KeyError("unknown_project")
+
+        def checkPackage(project, package):
+            checkProject(project)
+            if not obs.hasPackage(project, package):
+                raise KeyError("unknown_package")
+
+        def single(key, default=None):
+            return query.get(key, [default])[0]
+
+        def multi(key):
+            # osc encodes lists in Ruby on Rails style as key[]=value
+            return query.get(key, []) + query.get(f"{key}[]", [])
+
+        xml = "application/xml"
+        octet = "application/octet-stream"
+
+        if not comps:
+            raise KeyError("not_found")
+        elif comps == ["source"]:
+            return "projects", obs.projectList(), xml
+        elif comps in (["request"], ["search", "request"]):
+            return "requests", obs.requests(), xml
+        elif comps[0] == "person" and len(comps) == 2:
+            return "person", obs.person(comps[1]), xml
+        elif comps in (["search", "project", "id"], ["search", "project"]):
+            return "search", obs.searchProjects(single("match", "")), xml
+        elif comps == ["search", "package", "id"]:
+            return "search", obs.searchPackages(single("match", "")), xml
+        elif comps == ["search", "package"]:
+            return "search", obs.searchPackages(single("match", ""), full=True), xml
+        elif comps[0] == "source" and len(comps) == 2:
+            checkProject(comps[1])
+            return "packages", obs.packageList(comps[1]), xml
+        elif comps[0] == "source" and len(comps) == 3 and comps[2] == "_meta":
+            checkProject(comps[1])
+            return "project_meta", obs.projectMeta(comps[1]), xml
+        elif comps[0] == "source" and len(comps) == 3 and self.command == "POST":
+            checkPackage(comps[1], comps[2])
+            if single("cmd") != "diff":
+                raise KeyError("illegal_request")
+            diff = obs.diff(comps[1], comps[2], single("orev"), single("rev"))
+            return "diff", diff, "text/plain"
+        elif comps[0] == "source" and len(comps) == 3:
+            checkPackage(comps[1], comps[2])
+            return "filelist", obs.fileList(comps[1], comps[2], single("rev")), xml
+        elif comps[0] == "source" and len(comps) == 4:
+            checkPackage(comps[1], comps[2])
+            if comps[3] == "_meta":
+                return "package_meta", obs.packageMeta(comps[1], comps[2]), xml
+            elif comps[3] == "_history":
+                return "history", obs.history(comps[1], comps[2]), xml
+            elif comps[3] in obs.getFileNames(comps[2]):
+                return "file", obs.fileContent(comps[1], comps[2], comps[3]), octet
+            raise KeyError("unknown_file")
+        elif comps[0] == "build" and len(comps) == 3 and comps[2] == "_result":
+            checkProject(comps[1])
+            if single("view") == "binarylist":
+                index = obs.binaryIndex(comps[1], multi("repository"), multi("arch"))
+                return "binaryindex", index, xml
+            results = obs.results(
+                comps[1], single("package"), multi("repository"), multi("arch")
+            )
+            return "results", results, xml
+        elif comps[0] == "build" and len(comps) in (5, 6):
+            project, repo, arch, package = comps[1:5]
+            checkPackage(project, package)
+            if repo not in obs.m_repos or arch not in obs.m_archs:
+                raise KeyError("unknown_repository")
+            if len(comps) == 5:
+                return "binarylist", obs.binaryList(project, repo, arch, package), xml
+            elif comps[5] == "_log":
+                return "log", obs.buildLog(), "text/plain"
+            elif comps[5] in obs.getBinaryNames(package, arch):
+                return "binary", obs.binaryContent(comps[5]), octet
+            raise KeyError("unknown_file")
+
+        raise KeyError("not_found")
+
+
+class MockObsServer(http.server.ThreadingHTTPServer):
+    """A threaded HTTP(S) server serving the mock OBS API."""
+
+    daemon_threads = True
+
+    def __init__(
+            self, obs, address=("127.0.0.1", 0), latency=0.0, bandwidth=0,
+            record_dir=None, certfile=None, keyfile=None, verbose=False):
+
+        super().__init__(address, MockObsHandler)
+        self.m_obs = obs
+        self.m_latency = latency
+        self.m_bandwidth = bandwidth
+        self.m_record_dir = record_dir
+        self.m_verbose = verbose
+        self.m_stats_lock = threading.Lock()
+        self.m_stats = {}
+        self.m_thread = None
+
+        if certfile:
+            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            ctx.load_cert_chain(certfile, keyfile)
+            self.socket = ctx.wrap_socket(self.socket, server_side=True)
+            self.m_proto = "https"
+        else:
+            self.m_proto = "http"
+
+    def getUrl(self):
+        host, port = self.server_address[:2]
+        return f"{self.m_proto}://{host}:{port}"
+
+    def countRequest(self, label):
+        with self.m_stats_lock:
+            self.m_stats[label] = self.m_stats.get(label, 0) + 1
+
+    def getStats(self):
+        with self.m_stats_lock:
+            return json.dumps(self.m_stats).encode()
+
+    def resetStats(self):
+        with self.m_stats_lock:
+            self.m_stats = {}
+
+    def start(self):
+        """Serves requests in a background thread."""
+        self.m_thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.m_thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self.m_thread:
+            self.m_thread.join()
+            self.m_thread = None
+
+
+class OscFsMount:
+    """Runs an oscfs instance against a local mock OBS server in a
+    private osc configuration environment."""
+
+    def __init__(self, server):
+
+        self.m_server = server
+        self.m_proc = None
+        self.m_tmp_dir = tempfile.mkdtemp(prefix="oscfs-bench-")
+        self.m_mnt_dir = os.path.join(self.m_tmp_dir, "mnt")
+        os.mkdir(self.m_mnt_dir)
+        self._lookupOscFsBin()
+        self._writeOscConfig()
+
+    def _lookupOscFsBin(self):
+
+        dn = os.path.dirname
+
+        oscfs_root_dir = dn(dn(os.path.realpath(__file__)))
+        oscfs_bin = os.path.join(oscfs_root_dir, "bin", "oscfs")
+
+        if not os.path.isfile(oscfs_bin):
+            raise Exception(f"Failed to find oscfs executable at {oscfs_bin}")
+
+        self.m_oscfs_bin = oscfs_bin
+
+    def _writeOscConfig(self):
+
+        url = self.m_server.getUrl()
+        self.m_oscrc = os.path.join(self.m_tmp_dir, "oscrc")
+
+        with open(self.m_oscrc, 'w') as oscrc:
+            print(
+                f"""
+[general]
+apiurl = {url}
+
+[{url}]
+user = {self.m_server.m_obs.m_user}
+pass = bench
+sslcertck = 0
+allow_http = 1
+""",
+                file=oscrc)
+
+        self.m_env = dict(os.environ)
+        self.m_env["OSC_CONFIG"] = self.m_oscrc
+        # keep cookie jars and such out of the user's home
+        self.m_env["XDG_STATE_HOME"] = self.m_tmp_dir
+        self.m_env["XDG_CACHE_HOME"] = self.m_tmp_dir
+
+    def getMountDir(self):
+        return self.m_mnt_dir
+
+    def mount(self, args=[]):
+        """Mounts oscfs in the foreground and returns the number of
+        seconds it took until the file system was ready."""
+
+        self.umount()
+
+        start = time.monotonic()
+
+        cmdline = [self.m_oscfs_bin, "-f", "--apiurl", self.m_server.getUrl()]
+        cmdline.extend(args)
+        cmdline.append(self.m_mnt_dir)
+
+        self.m_proc = subprocess.Popen(
+            cmdline,
+            stdout=subprocess.PIPE,
+            env=self.m_env
+        )
+
+        for line in self.m_proc.stdout:
+
+            line = line.decode('utf8').strip()
+
+            if line == "file system initialized":
+                return time.monotonic() - start
+
+        raise Exception("Mounting file system failed")
+
+    def umount(self):
+
+        if not self.m_proc:
+            return
+
+        if self.m_proc.poll() is None:
+            self.m_proc.terminate()
+            rc = self.m_proc.wait()
+            if rc not in (0, -signal.SIGTERM):
+                print("oscfs exited with exit status", rc, file=sys.stderr)
+
+        self.m_proc = None
+
+    def cleanup(self):
+
+        self.umount()
+        import shutil
+        shutil.rmtree(self.m_tmp_dir, ignore_errors=True)
+
+
+def addObsArguments(parser):
+    """Adds the command line arguments for configuring a SyntheticObs
+    and a MockObsServer to the given argparse parser."""
+
+    parser.add_argument(
+        "--latency", type=float, default=0.0,
+        help="Artificial latency in seconds added to each request"
+    )
+    parser.add_argument(
+        "--bandwidth", type=int, default=0,
+        help="Limit response data rate to the given bytes per second (default: unlimited)"
+    )
+    parser.add_argument(
+        "--projects", type=int, default=200,
+        help="Number of synthetic projects"
+    )
+    parser.add_argument(
+        "--packages", type=int, default=500,
+        help="Number of synthetic packages per project"
+    )
+    parser.add_argument(
+        "--files", type=int, default=8,
+        help="Number of synthetic files per package"
+    )
+    parser.add_argument(
+        "--file-size", type=int, default=1024 * 1024,
+        help="Size of synthetic source tarballs in bytes"
+    )
+    parser.add_argument(
+        "--revisions", type=int, default=50,
+        help="Number of synthetic revisions per package"
+    )
+    parser.add_argument(
+        "--binaries", type=int, default=6,
+        help="Number of synthetic build artifacts per package and repository/arch"
+    )
+    parser.add_argument(
+        "--binary-size", type=int, default=1024 * 1024,
+        help="Size of synthetic RPM artifacts in bytes"
+    )
+    parser.add_argument(
+        "--log-size", type=int, default=128 * 1024,
+        help="Size of synthetic build logs in bytes"
+    )
+    parser.add_argument(
+        "--archives", action='store_true',
+        help="Serve real tar archives as source tarballs instead of opaque data"
+    )
+    parser.add_argument(
+        "--record-dir", type=str, default=None,
+        help="Directory containing recorded API responses which take precedence over synthetic ones"
+    )
+    parser.add_argument(
+        "--certfile", type=str, default=None,
+        help="PEM certificate to serve HTTPS instead of HTTP"
+    )
+    parser.add_argument(
+        "--keyfile", type=str, default=None,
+        help="PEM private key belonging to --certfile"
+    )
+
+
+def createServer(args, address=("127.0.0.1", 0), verbose=False):
+    """Creates a MockObsServer from arguments added via
+    addObsArguments()."""
+
+    obs = SyntheticObs(
+        projects=args.projects,
+        packages=args.packages,
+        files=args.files,
+        file_size=args.file_size,
+        revisions=args.revisions,
+        binaries=args.binaries,
+        binary_size=args.binary_size,
+        log_size=args.log_size,
+        archives=args.archives
+    )
+
+    return MockObsServer(
+        obs,
+        address=address,
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        record_dir=args.record_dir,
+        certfile=args.certfile,
+        keyfile=args.keyfile,
+        verbose=verbose
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local mock OBS API server serving synthetic or recorded responses"
+    )
+    parser.add_argument(
+        "--address", type=str, default="127.0.0.1",
+        help="Address to listen on"
+    )
+    parser.add_argument(
+        "--port", type=int, default=8080,
+        help="Port to listen on"
+    )
+    parser.add_argument(
+        "-v", "--verbose", action='store_true',
+        help="Log each request"
+    )
+    addObsArguments(parser)
+    args = parser.parse_args()
+
+    server = createServer(args, (args.address, args.port), args.verbose)
+    print("Serving mock OBS API on", server.getUrl())
+    sys.stdout.flush()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+
+import argparse
+import gc
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+import baseline
+import mockobs
+
+# make the oscfs modules of this source tree available
+dn = os.path.dirname
+sys.path.insert(0, dn(dn(os.path.realpath(__file__))))
+
+import oscfs.obs  # noqa: E402
+
+
+def eprint(*args, **kwargs):
+    kwargs["file"] = sys.stderr
+    print(*args, **kwargs)
+
+
+def fprint(*args, **kwargs):
+    kwargs['flush'] = True
+    print(*args, **kwargs)
+
+
+class FixtureObs(oscfs.obs.Obs):
+    """An Obs instance that returns fixture documents instead of talking
+    to a remote server, to benchmark the parsing logic in isolation."""
+
+    def __init__(self, fixtures):
+        super().__init__()
+        self.m_fixtures = fixtures
+
+    def _getPackageFileTree(self, project, package, revision=None):
+        return self.m_fixtures["filelist"]
+
+    def _getPackageHistory(self, project, package):
+        return self.m_fixtures["history"]
+
+
+class Fixtures:
+    """Provides large OBS documents for parser benchmarks. Documents are
+    either generated synthetically or loaded from captured files."""
+
+    # maps fixture names to the file names used in --fixtures-dir
+    files = {
+        "project_meta": "project_meta.xml",
+        "package_meta": "package_meta.xml",
+        "results": "result.xml",
+        "history": "history.xml",
+        "filelist": "filelist.xml",
+    }
+
+    def __init__(self, args):
+        self.m_args = args
+        self.m_docs = {}
+
+    def __getitem__(self, name):
+        return self.m_docs[name]
+
+    def load(self):
+        self._generate()
+
+        if not self.m_args.fixtures_dir:
+            return
+
+        for name, fl in self.files.items():
+            path = os.path.join(self.m_args.fixtures_dir, fl)
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as fd:
+                self.m_docs[name] = fd.read()
+            fprint("Using captured fixture", path)
+
+    def _generate(self):
+        args = self.m_args
+
+        # resembles a Factory like project with many repositories and a
+        # lot of maintainers
+        prj_obs = mockobs.SyntheticObs(
+            repos=[f"repo{nr:03d}" for nr in range(args.repos)],
+            archs=["x86_64", "i586", "aarch64", "ppc64le", "s390x", "armv7l"]
+        )
+        meta = prj_obs.projectMeta("openSUSE:Factory").decode()
+        persons = ''.join(
+            f'  <person userid="user{nr:05d}" role="{("maintainer", "bugowner", "reader")[nr % 3]}"/>\n'
+            for nr in range(args.persons)
+        )
+        self.m_docs["project_meta"] = meta.replace("</project>", persons + "</project>")
+
+        pkg_meta = prj_obs.packageMeta("openSUSE:Factory", "package00000").decode()
+        flags = ''.join(
+            f'    <disable repository="repo{nr:03d}" arch="i586"/>\n'
+            for nr in range(args.repos)
+        )
+        self.m_docs["package_meta"] = pkg_meta.replace(
+            "</package>",
+            f"  <build>\n{flags}  </build>\n  <releasename>package</releasename>\n</package>"
+        )
+
+        # a single repository/arch containing all the status entries
+        res_obs = mockobs.SyntheticObs(
+            packages=args.results, repos=["openSUSE_Tumbleweed"], archs=["x86_64"]
+        )
+        self.m_docs["results"] = res_obs.results("openSUSE:Factory").decode()
+
+        # the package revision list with multi-line commit messages
+        hist_obs = mockobs.SyntheticObs(revisions=args.revisions)
+        history = hist_obs.history("openSUSE:Factory", "package00000").decode()
+        self.m_docs["history"] = re.sub(
+            "<comment>(.*)</comment>",
+            lambda match: "<comment>" + escape(f"- {match.group(1)}\n" * 4) + "</comment>",
+            history
+        )
+
+        file_obs = mockobs.SyntheticObs(files=args.files)
+        filelist = file_obs.fileList("openSUSE:Factory", "package00000").decode()
+        # a linked package
+        self.m_docs["filelist"] = filelist.replace(
+            "  <entry ",
+            '  <linkinfo project="openSUSE:Factory" package="base" srcmd5="0" baserev="0" lsrcmd5="0"/>\n  <entry ',
+            1
+        )
+
+        # OBS documents are processed as raw bytes
+        for name, doc in self.m_docs.items():
+            self.m_docs[name] = doc.encode()
+
+
+class OscFsParserBenchmark:
+    """This program measures the parse time and peak memory usage of the
+    XML model classes used by oscfs against large OBS documents."""
+
+    def __init__(self):
+
+        self.m_parser = argparse.ArgumentParser(
+            description="Parser microbenchmarks for the oscfs OBS XML model classes"
+        )
+
+        self.m_parser.add_argument(
+            "--fixtures-dir", type=str, default=None,
+            help="Directory containing captured OBS documents ({}) that replace the synthetic ones".format(
+                ", ".join(Fixtures.files.values())
+            )
+        )
+        self.m_parser.add_argument(
+            "--repeat", type=int, default=5,
+            help="Number of timed repetitions per benchmark. The median is reported."
+        )
+        self.m_parser.add_argument(
+            "--benchmarks", type=str, default=None,
+            help="Comma separated list of benchmarks to run (default: all)"
+        )
+        self.m_parser.add_argument(
+            "--repos", type=int, default=40,
+            help="Number of repositories in the synthetic project meta"
+        )
+        self.m_parser.add_argument(
+            "--persons", type=int, default=500,
+            help="Number of persons in the synthetic project meta"
+        )
+        self.m_parser.add_argument(
+            "--results", type=int, default=20000,
+            help="Number of status entries in the synthetic build results"
+        )
+        self.m_parser.add_argument(
+            "--revisions", type=int, default=10000,
+            help="Number of revisions in the synthetic commit log"
+        )
+        self.m_parser.add_argument(
+            "--files", type=int, default=5000,
+            help="Number of entries in the synthetic package file list"
+        )
+        baseline.addBaselineArguments(self.m_parser, tolerance=0.1)
+
+        self.m_benchmarks = {
+            "ProjectInfo": self.benchProjectInfo,
+            "PackageInfo": self.benchPackageInfo,
+            "Repository": self.benchRepository,
+            "BuildResultList": self.benchBuildResultList,
+            "getCommitInfos": self.benchCommitInfos,
+            "getPackageFileList": self.benchPackageFileList,
+        }
+
+    def benchProjectInfo(self):
+        return oscfs.obs.ProjectInfo(self.m_fixtures["project_meta"])
+
+    def benchPackageInfo(self):
+        return oscfs.obs.PackageInfo(self.m_fixtures["package_meta"])
+
+    def benchRepository(self):
+        return [oscfs.obs.Repository(el) for el in self.m_repo_nodes]
+
+    def benchBuildResultList(self):
+        return oscfs.obs.BuildResultList(self.m_fixtures["results"])
+
+    def benchCommitInfos(self):
+        return self.m_obs.getCommitInfos("openSUSE:Factory", "package")
+
+    def benchPackageFileList(self):
+        return self.m_obs.getPackageFileList("openSUSE:Factory", "package")
+
+    def measure(self, func):
+        """Returns a tuple of (median seconds, peak bytes) for the given
+        benchmark function."""
+
+        timings = []
+
+        for _ in range(self.m_args.repeat):
+            gc.collect()
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+
+        # measure memory separately, tracemalloc distorts timing
+        gc.collect()
+        tracemalloc.start()
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+
+        return statistics.median(timings), peak
+
+    def run(self):
+
+        self.m_args = self.m_parser.parse_args()
+
+        if self.m_args.benchmarks:
+            benchmarks = self.m_args.benchmarks.split(',')
+            for name in benchmarks:
+                if name not in self.m_benchmarks:
+                    raise Exception(f"unknown benchmark '{name}'")
+        else:
+            benchmarks = list(self.m_benchmarks.keys())
+
+        self.m_fixtures = Fixtures(self.m_args)
+        self.m_fixtures.load()
+        self.m_obs = FixtureObs(self.m_fixtures)
+        self.m_repo_nodes = ElementTree.fromstring(
+            self.m_fixtures["project_meta"]
+        ).findall("repository")
+
+        results = {}
+
+        for name in benchmarks:
+            seconds, peak = self.measure(self.m_benchmarks[name])
+            results[name] = {"time": seconds, "peak": peak}
+            fprint(f"{name:>20}: {seconds * 1000:10.3f} ms, peak memory {peak / 1024:10.1f} KiB")
+
+        if self.m_args.save_baseline:
+            baseline.saveBaseline(self.m_args.save_baseline, results)
+
+        if self.m_args.compare:
+            regressions = baseline.compareBaseline(
+                self.m_args.compare, results, self.m_args.tolerance,
+                # ignore timing noise in the sub millisecond range
+                min_deltas={"time": 0.0005}
+            )
+            if regressions:
+                raise Exception(f"{regressions} performance regression(s) found")
+
+
+osc_fs_parser_benchmark = OscFsParserBenchmark()
+try:
+    osc_fs_parser_benchmark.run()
+except Exception as e:
+    eprint("Error:", e)
+    sys.exit(1)
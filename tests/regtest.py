@@ -8,6 +8,8 @@ import subprocess
 import sys
 import tempfile
 
+import mockobs
+
 
 def eprint(*args, **kwargs):
     kwargs["file"] = sys.stderr
@@ -266,6 +268,40 @@ pass=somepass
         finally:
             self._restoreOscConfig()
 
+    def performGrowingBuildlogTest(self):
+        """This test checks whether a build log that grows while it is
+        open, like during a running build, can be followed through a
+        single file handle, like `tail -f` does. It runs against a local
+        mock OBS instance."""
+
+        obs = mockobs.SyntheticObs(projects=1, packages=1, log_size=4096)
+        server = mockobs.MockObsServer(obs)
+        server.start()
+        mount = mockobs.OscFsMount(server)
+
+        try:
+            mount.mount()
+            project = obs.getProjectNames()[0]
+            package = obs.getPackageNames(project)[0]
+            log = os.path.join(
+                mount.getMountDir(), project, package, ".oscfs",
+                "buildlogs", obs.m_repos[0], obs.m_archs[0]
+            )
+
+            with open(log, 'rb') as fd:
+                data = fd.read()
+                if len(data) != 4096:
+                    raise Exception("Unexpected build log size {}".format(len(data)))
+
+                obs.growBuildLog(1024)
+                data += fd.read()
+
+                if data != obs.buildLog():
+                    raise Exception("Growing build log wasn't followed: got {} bytes".format(len(data)))
+        finally:
+            mount.cleanup()
+            server.stop()
+
     def performTests(self):
 
         fprint("Running mount tests")
@@ -274,6 +310,8 @@ pass=somepass
         self.performAuthErrorTest()
         fprint("Running cache tests")
         self.performCacheTests()
+        fprint("Running growing build log test")
+        self.performGrowingBuildlogTest()
 
     def run(self):
 
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+
+import argparse
+import errno
+import json
+import os
+import sys
+import time
+import urllib.request
+
+import mockobs
+
+# make the oscfs modules of this source tree available
+dn = os.path.dirname
+sys.path.insert(0, dn(dn(os.path.realpath(__file__))))
+
+from oscfs.trace import readTrace  # noqa: E402
+
+
+def eprint(*args, **kwargs):
+    kwargs["file"] = sys.stderr
+    print(*args, **kwargs)
+
+
+def fprint(*args, **kwargs):
+    kwargs['flush'] = True
+    print(*args, **kwargs)
+
+
+class OscFsReplay:
+    """This program replays a trace of file system operations recorded
+    via `oscfs --record-trace` against an oscfs mount that is served by
+    a local mock OBS instance. This allows to measure the effect of
+    changes like caching or prefetching against real world access
+    patterns."""
+
+    def __init__(self):
+
+        self.m_parser = argparse.ArgumentParser(
+            description="Replays recorded oscfs operation traces against a mock OBS instance"
+        )
+
+        self.m_parser.add_argument(
+            "trace", type=str,
+            help="The trace file recorded via `oscfs --record-trace`"
+        )
+        self.m_parser.add_argument(
+            "--speed", type=float, default=0.0,
+            help="Replay speed relative to the recorded timing, e.g. 2.0 for twice as fast. 0 replays as fast as possible (default)."
+        )
+        self.m_parser.add_argument(
+            "--output", type=str, default=None, metavar="FILE",
+            help="Store the replay results as JSON in FILE"
+        )
+        self.m_parser.add_argument(
+            "--oscfs-arg", action='append', default=[],
+            help="Additional command line argument to pass to oscfs. Can be specified multiple times."
+        )
+        mockobs.addObsArguments(self.m_parser)
+
+        # maps file handles from the trace to our own open files
+        self.m_fds = {}
+        # per operation list of observed durations
+        self.m_timings = {}
+        # number of operations whose outcome differed from the trace
+        self.m_mismatches = 0
+
+    def _registerNames(self, obs, trace):
+        """Makes the synthetic OBS instance know all project, package
+        and file names appearing in the trace."""
+
+        for record in trace:
+            comps = [comp for comp in record["path"].split('/') if comp]
+
+            if not comps or comps[0].startswith('.'):
+                continue
+            elif len(comps) == 1:
+                obs.addProject(comps[0])
+                continue
+
+            obs.addPackage(comps[0], comps[1])
+
+            if len(comps) == 3 and not comps[2].startswith('.'):
+                obs.addFile(comps[1], comps[2])
+
+    def _path(self, path):
+        return os.path.join(self.m_mount.getMountDir(), path.lstrip('/'))
+
+    def _replayRecord(self, record):
+        op = record["op"]
+        path = self._path(record["path"])
+        fh = record.get("fh")
+
+        if op == "getattr":
+            os.lstat(path)
+        elif op == "readdir":
+            os.listdir(path)
+        elif op == "readlink":
+            os.readlink(path)
+        elif op == "open":
+            flags = record.get("flags", os.O_RDONLY) & (os.O_RDONLY | os.O_WRONLY | os.O_RDWR)
+            self.m_fds[fh] = os.open(path, flags)
+        elif op == "read":
+            fd = self.m_fds.get(fh)
+            if fd is None:
+                # opened before recording started
+                fd = self.m_fds[fh] = os.open(path, os.O_RDONLY)
+            os.pread(fd, record["length"], record["offset"])
+        elif op == "write":
+            fd = self.m_fds.get(fh)
+            if fd is not None:
+                # the only writable files are boolean triggers
+                os.pwrite(fd, b"1", record["offset"])
+        elif op == "release":
+            fd = self.m_fds.pop(fh, None)
+            if fd is not None:
+                os.close(fd)
+        else:
+            # opendir, releasedir and others are implicitly performed by
+            # the operations above
+            return False
+
+        return True
+
+    def replay(self, trace):
+
+        start = time.monotonic()
+        replayed = 0
+
+        for record in trace:
+            if self.m_args.speed > 0:
+                due = start + record["t"] / self.m_args.speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+            op_start = time.monotonic()
+            error = None
+
+            try:
+                if not self._replayRecord(record):
+                    continue
+            except OSError as e:
+                error = e.errno
+
+            duration = time.monotonic() - op_start
+            self.m_timings.setdefault(record["op"], []).append(duration)
+            replayed += 1
+
+            if error != record.get("err"):
+                self.m_mismatches += 1
+                eprint("Outcome mismatch for {} {}: recorded {}, got {}".format(
+                    record["op"], record["path"],
+                    errno.errorcode.get(record.get("err"), "success"),
+                    errno.errorcode.get(error, "success")
+                ))
+
+        for fd in self.m_fds.values():
+            os.close(fd)
+        self.m_fds = {}
+
+        return replayed, time.monotonic() - start
+
+    def summarize(self, replayed, total):
+
+        def percentile(values, pct):
+            return values[min(len(values) - 1, int(len(values) * pct))]
+
+        ops = {}
+
+        for op, durations in sorted(self.m_timings.items()):
+            durations = sorted(durations)
+            ops[op] = {
+                "count": len(durations),
+                "total": sum(durations),
+                "p50": percentile(durations, 0.5),
+                "p95": percentile(durations, 0.95),
+                "max": durations[-1],
+            }
+            fprint("{:>10}: {count:7d} ops total {total:9.4f}s p50 {p50:8.5f}s p95 {p95:8.5f}s max {max:8.5f}s".format(
+                op, **ops[op]
+            ))
+
+        with urllib.request.urlopen(self.m_server.getUrl() + "/_mock/stats") as resp:
+            requests = json.loads(resp.read())
+
+        fprint(f"replayed {replayed} operations in {total:.4f}s, {sum(requests.values())} OBS requests, {self.m_mismatches} mismatches")
+
+        return {
+            "total": total,
+            "replayed": replayed,
+            "mismatches": self.m_mismatches,
+            "ops": ops,
+            "requests": requests,
+        }
+
+    def run(self):
+
+        self.m_args = self.m_parser.parse_args()
+        trace = readTrace(self.m_args.trace)
+
+        self.m_server = mockobs.createServer(self.m_args)
+        self._registerNames(self.m_server.m_obs, trace)
+        self.m_server.start()
+        self.m_mount = mockobs.OscFsMount(self.m_server)
+        fprint("Replaying", len(trace), "records against mock OBS at", self.m_server.getUrl())
+
+        try:
+            self.m_mount.mount(self.m_args.oscfs_arg)
+            self.m_server.resetStats()
+            replayed, total = self.replay(trace)
+            results = self.summarize(replayed, total)
+        finally:
+            self.m_mount.cleanup()
+            self.m_server.stop()
+
+        if self.m_args.output:
+            with open(self.m_args.output, 'w') as fd:
+                json.dump(results, fd, indent=4)
+
+
+osc_fs_replay = OscFsReplay()
+try:
+    osc_fs_replay.run()
+except Exception as e:
+    eprint("Error:", e)
+    sys.exit(1)
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+
+import argparse
+import datetime
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import baseline
+
+# make the oscfs modules of this source tree available
+dn = os.path.dirname
+sys.path.insert(0, dn(dn(os.path.realpath(__file__))))
+
+import oscfs.fs  # noqa: E402
+import oscfs.obs  # noqa: E402
+import oscfs.root  # noqa: E402
+import oscfs.types  # noqa: E402
+
+
+def eprint(*args, **kwargs):
+    kwargs["file"] = sys.stderr
+    print(*args, **kwargs)
+
+
+def fprint(*args, **kwargs):
+    kwargs['flush'] = True
+    print(*args, **kwargs)
+
+
+class StubObs(oscfs.obs.Obs):
+    """An Obs instance that returns synthetic in-memory data instantly,
+    to measure the node tree independently of any network access. All
+    data is precomputed so that only the cost of the tree itself is
+    measured."""
+
+    big_project = "big:project"
+
+    def __init__(self, projects, packages, revisions, files):
+        super().__init__()
+        self.m_projects = [self.big_project] + [
+            f"project:{nr:06d}" for nr in range(projects - 1)
+        ]
+        self.m_packages = [f"package{nr:06d}" for nr in range(packages)]
+        self.m_small_packages = self.m_packages[:10]
+        base = datetime.datetime(2020, 1, 1)
+        self.m_commit_infos = []
+        for rev in range(1, revisions + 1):
+            info = oscfs.obs.CommitInfo(rev)
+            info.setAuthor(f"user{rev % 97}")
+            info.setDate(base + datetime.timedelta(hours=rev))
+            info.setReqId(str(100000 + rev))
+            info.setMessage(f"Update to version 1.{rev}")
+            self.m_commit_infos.append(info)
+        self.m_files = [
+            (oscfs.types.FileType.regular, f"file{nr}.tar.xz", 1024 * 1024, 1500000000, None)
+            for nr in range(files)
+        ]
+        self.m_prj_meta = (
+            '<project name="big:project"><title>big</title><description/>'
+            '<person userid="bench" role="maintainer"/>'
+            '<repository name="standard"><arch>x86_64</arch></repository>'
+            '</project>'
+        )
+
+    def configure(self, apiurl):
+        pass
+
+    def getUser(self):
+        return "bench"
+
+    def getProjectList(self):
+        return self.m_projects
+
+    def getProjectMeta(self, project):
+        return self.m_prj_meta
+
+    def getPackageList(self, project):
+        if project == self.big_project:
+            return self.m_packages
+        return self.m_small_packages
+
+    def getPackageMeta(self, project, package):
+        return (
+            f'<package name="{package}" project="{project}"><title/><description/>'
+            '<person userid="bench" role="maintainer"/></package>'
+        )
+
+    def getPackageFileList(self, project, package, revision=None):
+        return self.m_files
+
+    def getCommitInfos(self, project, package):
+        return self.m_commit_infos
+
+    def getCommitLog(self, project, package):
+        return ""
+
+    def getPackageRequestList(self, project, package, states=None):
+        return []
+
+    def getBinaryList(self, project, package, repo, arch):
+        return []
+
+
+class OscFsTreeBenchmark:
+    """This program builds large synthetic node trees against a stub Obs
+    instance and measures the memory footprint per node as well as the
+    throughput of central node operations. This documents the scaling
+    limits of the file system daemon."""
+
+    def __init__(self):
+
+        self.m_parser = argparse.ArgumentParser(
+            description="Memory footprint and throughput benchmarks for the oscfs node tree"
+        )
+
+        self.m_parser.add_argument(
+            "--projects", type=int, default=100000,
+            help="Number of projects in the root directory"
+        )
+        self.m_parser.add_argument(
+            "--packages", type=int, default=50000,
+            help="Number of packages in the big project"
+        )
+        self.m_parser.add_argument(
+            "--revisions", type=int, default=5000,
+            help="Number of revisions of each package"
+        )
+        self.m_parser.add_argument(
+            "--files", type=int, default=20,
+            help="Number of files in each package"
+        )
+        self.m_parser.add_argument(
+            "--api-dirs", type=int, default=1000,
+            help="Number of package .oscfs directories to populate"
+        )
+        self.m_parser.add_argument(
+            "--lookups", type=int, default=100000,
+            help="Number of operations performed for throughput measurements"
+        )
+        baseline.addBaselineArguments(self.m_parser, tolerance=0.15)
+
+        self.m_results = {}
+
+    def _report(self, name, **metrics):
+        self.m_results[name] = metrics
+        text = ", ".join(
+            f"{key} {value:,.1f}" if isinstance(value, float) else f"{key} {value:,}"
+            for key, value in metrics.items()
+        )
+        fprint(f"{name:>22}: {text}")
+
+    def _measureBuild(self, name, func):
+        """Runs func() once for timing and once for measuring memory
+        via tracemalloc on a fresh tree. func() needs to return the
+        number of nodes created."""
+
+        gc.collect()
+        start = time.perf_counter()
+        count = func(self._createRoot())
+        seconds = time.perf_counter() - start
+
+        root = self._createRoot()
+        gc.collect()
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        func(root)
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self._report(
+            name,
+            nodes=count,
+            seconds=seconds,
+            bytes_per_node=(after - before) / max(count, 1),
+            peak_mib=(peak - before) / 1024 / 1024
+        )
+
+    def _measureRate(self, name, func, count):
+        gc.collect()
+        start = time.perf_counter()
+        func(count)
+        seconds = time.perf_counter() - start
+        self._report(name, ops_per_sec=count / seconds)
+
+    def _createRoot(self):
+        return oscfs.root.Root(self.m_obs, self.m_oscfs_args)
+
+    def _bigProject(self):
+        return f"/{StubObs.big_project}"
+
+    def benchRoot(self, root):
+        root.updateIfNeeded()
+        return len(root.getEntries())
+
+    def benchProject(self, root):
+        project = root.getNode(self._bigProject())
+        project.updateIfNeeded()
+        return len(project.getEntries())
+
+    def benchPkgApiDirs(self, root):
+        count = 0
+        for package in self.m_obs.m_packages[:self.m_args.api_dirs]:
+            api_dir = root.getNode(f"{self._bigProject()}/{package}/.oscfs")
+            api_dir.updateIfNeeded()
+            count += 1
+        return count
+
+    def benchRevisions(self, root):
+        package = self.m_obs.m_packages[0]
+        revisions = root.getNode(f"{self._bigProject()}/{package}/.oscfs/revisions")
+        revisions.updateIfNeeded()
+        commits = root.getNode(f"{self._bigProject()}/{package}/.oscfs/commits")
+        commits.updateIfNeeded()
+        return len(revisions.getEntries()) + len(commits.getEntries())
+
+    def run(self):
+
+        self.m_args = self.m_parser.parse_args()
+        self.m_obs = StubObs(
+            self.m_args.projects, self.m_args.packages,
+            self.m_args.revisions, self.m_args.files
+        )
+        # use the actual oscfs argument parser to get all defaults
+        self.m_oscfs_args = oscfs.fs.OscFs().m_parser.parse_args(
+            ["--homes", "--maintenance", "--ptf", "/nonexistent"]
+        )
+
+        self._measureBuild("root projects", self.benchRoot)
+        self._measureBuild("project packages", self.benchProject)
+        self._measureBuild("package .oscfs dirs", self.benchPkgApiDirs)
+        self._measureBuild("revisions and commits", self.benchRevisions)
+
+        # throughput measurements on a fully populated tree
+        root = self._createRoot()
+        self.benchProject(root)
+        self.benchRevisions(root)
+        lookups = self.m_args.lookups
+        rand = random.Random(0)
+        packages = self.m_obs.m_packages
+        package_paths = [
+            f"{self._bigProject()}/{rand.choice(packages)}" for _ in range(lookups)
+        ]
+        revision_paths = [
+            f"{self._bigProject()}/{packages[0]}/.oscfs/revisions/{rand.randint(1, self.m_args.revisions)}"
+            for _ in range(lookups)
+        ]
+
+        def getNodePackages(count):
+            for path in package_paths[:count]:
+                root.getNode(path)
+
+        def getNodeRevisions(count):
+            for path in revision_paths[:count]:
+                root.getNode(path)
+
+        def getNamesRoot(count):
+            for _ in range(count):
+                root.getNames()
+
+        project = root.getNode(self._bigProject())
+
+        def getNamesProject(count):
+            for _ in range(count):
+                project.getNames()
+
+        stats = [node.getStat() for node in project.getEntries().values()]
+
+        def toDict(count):
+            for nr in range(count):
+                stats[nr % len(stats)].toDict()
+
+        self._measureRate("getNode package", getNodePackages, lookups)
+        self._measureRate("getNode revision", getNodeRevisions, lookups)
+        self._measureRate("getNames root", getNamesRoot, max(1, lookups // 1000))
+        self._measureRate("getNames project", getNamesProject, max(1, lookups // 1000))
+        self._measureRate("Stat.toDict", toDict, lookups)
+
+        if self.m_args.save_baseline:
+            config = {
+                key: value for key, value in vars(self.m_args).items()
+                if key not in ("save_baseline", "compare")
+            }
+            baseline.saveBaseline(self.m_args.save_baseline, self.m_results, config)
+
+        if self.m_args.compare:
+            regressions = baseline.compareBaseline(
+                self.m_args.compare, self.m_results, self.m_args.tolerance,
+                higher_is_better=("ops_per_sec",)
+            )
+            if regressions:
+                raise Exception(f"{regressions} performance regression(s) found")
+
+
+osc_fs_tree_benchmark = OscFsTreeBenchmark()
+try:
+    osc_fs_tree_benchmark.run()
+except Exception as e:
+    eprint("Error:", e)
+    sys.exit(1)